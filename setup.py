@@ -24,6 +24,9 @@ setup(
             'ipdb',
             'requests==2.32.4',
             'nose',
+        ],
+        'orjson': [
+            'orjson',
         ]
     },
     entry_points="""
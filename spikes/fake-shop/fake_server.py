@@ -0,0 +1,836 @@
+#!/usr/bin/env python
+"""
+A local stand-in for the Shopify Admin API serving a synthetic shop from
+`shop_generator.py`, to run and benchmark full syncs offline.
+
+It implements what the tap's streams use:
+
+- `POST /admin/api/<version>/graphql.json` resolves any query against the
+  shop: connections with `first`, `after` cursors, `sortKey`, `reverse` and
+  the `query:` filters the tap sends (`updated_at:>='...' AND
+  updated_at:<'...'`, `id:123`), `edges`/`nodes`/`pageInfo`, inline
+  fragments on `__typename`, `node(id:)`, `<resource>Count`, `shop` and
+  `currentAppInstallation`. Fields the shop has no value for are null.
+- Every response carries `extensions.cost` with the requested cost of the
+  query, estimated like Shopify from the `first` of its connections, the
+  actual cost of what was returned and the `throttleStatus` of a leaky
+  bucket. A query above the maximum cost fails with MAX_COST_EXCEEDED, a
+  query the bucket can not afford with THROTTLED.
+- The bulk operation lifecycle: `bulkOperationRunQuery` writes the JSONL
+  result file in the background, nested connection nodes on their own lines
+  with the `__parentId` of their parent, `node(id:)` reports it CREATED,
+  RUNNING with a growing `objectCount`, then COMPLETED with its `url`,
+  `bulkOperationCancel` cancels it and a second operation is refused while
+  one runs. Result files are served with Range request support.
+- `GET /admin/api/<version>/shop.json` for `shopify.Shop.current()`.
+- API requests without the shop's `X-Shopify-Access-Token` are answered
+  401 like a real shop, result file downloads need no token.
+
+    python spikes/fake-shop/fake_server.py --port 8080 --orders 10000
+
+The tap builds its URLs from `shopify.Session`, `run_sync.py` points them
+at the server and runs a sync in process.
+"""
+import argparse
+import base64
+import datetime
+import functools
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from graphql import GraphQLError, parse
+from graphql.language import FieldNode, InlineFragmentNode, OperationType
+from graphql.utilities import value_from_ast_untyped
+
+from shop_generator import add_arguments, money_bag, shop_from_arguments
+
+# Limits of the GraphQL Admin API on a standard plan
+MAX_QUERY_COST = 1000
+MAX_PAGE_SIZE = 250
+BUCKET_SIZE = 2000
+RESTORE_RATE = 100
+
+# Cost of a mutation
+MUTATION_COST = 10
+
+# Access token the requests to the API must carry
+ACCESS_TOKEN = "fake-token"
+
+FILTER_TERM = re.compile(r"(\w+):(>=|<=|>|<)?(?:'([^']*)'|\"([^\"]*)\"|(\S+))")
+
+SORT_FIELDS = {"UPDATED_AT": "updatedAt", "CREATED_AT": "createdAt", "PROCESSED_AT": "processedAt",
+               "TITLE": "title", "NAME": "name"}
+
+ACCESS_SCOPES = ["read_orders", "read_all_orders", "read_customers", "read_products",
+                 "read_inventory", "read_locations", "read_users", "read_fulfillments"]
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def now():
+    return datetime.datetime.now(datetime.timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+@functools.lru_cache(maxsize=65536)
+def parse_time(value):
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def legacy_id(value):
+    return int(value.rsplit("/", 1)[-1])
+
+
+def camel_case(name):
+    head, *tail = name.split("_")
+    return head + "".join(part.title() for part in tail)
+
+
+def encode_cursor(obj):
+    return base64.b64encode(obj["id"].encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    return base64.b64decode(cursor.encode("ascii")).decode("utf-8")
+
+
+def response_key(field):
+    return field.alias.value if field.alias else field.name.value
+
+
+def get_arguments(field, variables):
+    return {argument.name.value: value_from_ast_untyped(argument.value, variables)
+            for argument in field.arguments or ()}
+
+
+def find_selection(selection_set, name):
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode) and selection.name.value == name:
+            return selection
+    return None
+
+
+def is_connection(field):
+    """A field selecting `edges`, `nodes` or `pageInfo` is a connection."""
+    if field.selection_set is None:
+        return False
+    return any(isinstance(selection, FieldNode)
+               and selection.name.value in ("edges", "nodes", "pageInfo")
+               for selection in field.selection_set.selections)
+
+
+def get_node_selection_set(field):
+    """The selections of the records of the connection `field`."""
+    nodes = find_selection(field.selection_set, "nodes")
+    if nodes is not None:
+        return nodes.selection_set
+    edges = find_selection(field.selection_set, "edges")
+    node = find_selection(edges.selection_set, "node") if edges is not None else None
+    return node.selection_set if node is not None else None
+
+
+def matches_term(obj, name, operator, value):
+    if name == "id":
+        if not obj.get("id"):
+            return False
+        actual, value = legacy_id(obj["id"]), int(value)
+    else:
+        actual = obj.get(camel_case(name))
+        if actual is None:
+            return False
+        if isinstance(actual, str) and name.endswith("_at"):
+            actual, value = parse_time(actual), parse_time(value)
+        elif isinstance(actual, (int, float)):
+            value = type(actual)(value)
+        elif not operator:
+            return str(actual).lower() == value.lower()
+    if operator == ">=":
+        return actual >= value
+    if operator == "<=":
+        return actual <= value
+    if operator == ">":
+        return actual > value
+    if operator == "<":
+        return actual < value
+    return actual == value
+
+
+def parse_filter(query):
+    """The `(field, operator, value)` terms of a `query:` filter joined by AND."""
+    terms = []
+    for term in re.split(r"\s+AND\s+", (query or "").strip()):
+        match = FILTER_TERM.fullmatch(term.strip())
+        if match:
+            name, operator, *values = match.groups()
+            terms.append((name, operator, next(value for value in values if value is not None)))
+    return terms
+
+
+def filter_and_sort(items, arguments):
+    terms = parse_filter(arguments.get("query"))
+    if terms:
+        items = [obj for obj in items
+                 if all(matches_term(obj, *term) for term in terms)]
+    sort_field = SORT_FIELDS.get(arguments.get("sortKey"))
+    if sort_field:
+        items = sorted(items, key=lambda obj: (obj.get(sort_field) or "", legacy_id(obj["id"])))
+    else:
+        items = sorted(items, key=lambda obj: legacy_id(obj["id"]))
+    if arguments.get("reverse"):
+        items.reverse()
+    return items
+
+
+def merge(result, key, value):
+    """Adds a field to `result`, merging the objects selected by several fragments."""
+    if isinstance(value, dict) and isinstance(result.get(key), dict):
+        for child_key, child_value in value.items():
+            merge(result[key], child_key, child_value)
+    else:
+        result[key] = value
+
+
+class QueryError(Exception):
+    pass
+
+
+class Execution():
+    """The variables and actual cost of a query being resolved."""
+
+    def __init__(self, variables):
+        self.variables = variables or {}
+        self.cost = 0
+
+
+class BulkOperation():
+
+    def __init__(self, number, query, path):
+        self.id = "gid://shopify/BulkOperation/{}".format(number)
+        self.query = query
+        self.path = path
+        self.status = "CREATED"
+        self.error_code = None
+        self.created_at = now()
+        self.completed_at = None
+        self.object_count = 0
+        self.root_object_count = 0
+        self.file_size = 0
+        self.url = None
+        self.done = threading.Event()
+
+    @property
+    def running(self):
+        return self.status in ("CREATED", "RUNNING")
+
+    def to_node(self):
+        return {
+            "__typename": "BulkOperation",
+            "id": self.id,
+            "type": "QUERY",
+            "status": self.status,
+            "errorCode": self.error_code,
+            "createdAt": self.created_at,
+            "completedAt": self.completed_at,
+            "objectCount": str(self.object_count),
+            "rootObjectCount": str(self.root_object_count),
+            "fileSize": str(self.file_size) if self.url else None,
+            "url": self.url,
+            "partialDataUrl": None,
+            "query": self.query,
+        }
+
+
+class FakeShop():
+    """
+    Resolves GraphQL queries and runs bulk operations against the objects of
+    a generated shop. Safe to use from the threads of the HTTP server.
+    """
+
+    def __init__(self, shop, max_cost=MAX_QUERY_COST, bucket_size=BUCKET_SIZE,
+                 restore_rate=RESTORE_RATE, bulk_duration=0.0, bulk_dir=None,
+                 access_token=ACCESS_TOKEN):
+        self.roots = shop
+        self.access_token = access_token
+        self.max_cost = max_cost
+        self.bucket_size = bucket_size
+        self.restore_rate = restore_rate
+        self.bulk_duration = bulk_duration
+        self.bulk_dir = bulk_dir or tempfile.mkdtemp(prefix="fake-shop-bulk-")
+        self.base_url = None
+        self.info = {"id": 1, "name": "Fake Shop", "myshopify_domain": "fake-shop.myshopify.com",
+                     "currency": "USD", "iana_timezone": "UTC"}
+
+        self.lock = threading.Lock()
+        self.available = float(bucket_size)
+        self.restored_at = time.monotonic()
+        self.bulk_operations = {}
+        self.sorted_roots = {}
+        self.stats = {"graphql_requests": 0, "unauthorized": 0, "throttled": 0,
+                      "max_cost_exceeded": 0,
+                      "bulk_operations": 0, "bulk_bytes_served": 0, "requested_cost": 0,
+                      "actual_cost": 0}
+
+        self.nodes = {}
+        for objects in shop.values():
+            for obj in objects:
+                self.nodes.setdefault(obj["id"], obj)
+        for objects in shop.values():
+            for obj in objects:
+                self.index(obj)
+
+    def index(self, value):
+        """Adds the nested objects with an id to the objects `node(id:)` finds."""
+        if isinstance(value, dict):
+            if "id" in value and "__typename" in value:
+                self.nodes.setdefault(value["id"], value)
+            for child in value.values():
+                if isinstance(child, (dict, list)):
+                    self.index(child)
+        elif isinstance(value, list):
+            for child in value:
+                self.index(child)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.stats[name] += value
+
+    # Cost and throttling
+
+    def estimate_cost(self, selection_set, variables):
+        """The requested cost: 1 per object, 2 plus the page of records per connection."""
+        cost = 0
+        for selection in selection_set.selections:
+            if selection.selection_set is None:
+                continue
+            if isinstance(selection, InlineFragmentNode):
+                cost += self.estimate_cost(selection.selection_set, variables)
+                continue
+            if selection.name.value == "pageInfo":
+                continue
+            if is_connection(selection):
+                arguments = get_arguments(selection, variables)
+                size = arguments.get("first") or arguments.get("last")
+                node_selection_set = get_node_selection_set(selection)
+                node_cost = (1 + self.estimate_cost(node_selection_set, variables)
+                             if node_selection_set else 0)
+                cost += 2 + (size or 0) * node_cost
+            else:
+                # Plain lists, even truncated with `first`, cost like a single object
+                cost += 1 + self.estimate_cost(selection.selection_set, variables)
+        return cost
+
+    def restore(self):
+        current = time.monotonic()
+        self.available = min(self.bucket_size, self.available
+                             + (current - self.restored_at) * self.restore_rate)
+        self.restored_at = current
+
+    def throttle_status(self):
+        return {"maximumAvailable": float(self.bucket_size),
+                "currentlyAvailable": int(self.available),
+                "restoreRate": float(self.restore_rate)}
+
+    def cost_extensions(self, requested, actual):
+        return {"cost": {"requestedQueryCost": requested, "actualQueryCost": actual,
+                         "throttleStatus": self.throttle_status()}}
+
+    # GraphQL
+
+    def execute(self, body):
+        """The response to a GraphQL request body."""
+        self.count("graphql_requests")
+        try:
+            document = parse(body.get("query") or "")
+        except GraphQLError as exc:
+            return {"errors": [{"message": exc.message}]}
+        operations = [definition for definition in document.definitions
+                      if getattr(definition, "operation", None) is not None]
+        name = body.get("operationName")
+        operation = next((op for op in operations if name and op.name and op.name.value == name),
+                         operations[0] if operations else None)
+        if operation is None:
+            return {"errors": [{"message": "No operation in the document"}]}
+        execution = Execution(body.get("variables"))
+
+        if operation.operation == OperationType.MUTATION:
+            requested = MUTATION_COST
+        else:
+            requested = self.estimate_cost(operation.selection_set, execution.variables)
+
+        with self.lock:
+            self.restore()
+            if requested > self.max_cost:
+                self.stats["max_cost_exceeded"] += 1
+                return {"errors": [{
+                    "message": "Query cost is {}, which exceeds the single query max cost limit "
+                               "({}).".format(requested, self.max_cost),
+                    "extensions": {"code": "MAX_COST_EXCEEDED", "cost": requested,
+                                   "maxCost": self.max_cost}}],
+                        "extensions": self.cost_extensions(requested, None)}
+            if requested > self.available:
+                self.stats["throttled"] += 1
+                return {"errors": [{"message": "Throttled",
+                                    "extensions": {"code": "THROTTLED"}}],
+                        "extensions": self.cost_extensions(requested, None)}
+            self.available -= requested
+
+        try:
+            if operation.operation == OperationType.MUTATION:
+                data = self.execute_mutation(operation, execution)
+            else:
+                data = self.resolve_root(operation.selection_set, execution)
+            errors = None
+        except QueryError as exc:
+            data, errors = None, [{"message": str(exc)}]
+
+        actual = min(execution.cost, requested) if operation.operation != OperationType.MUTATION \
+            else requested
+        with self.lock:
+            self.available = min(self.bucket_size, self.available + requested - actual)
+            self.stats["requested_cost"] += requested
+            self.stats["actual_cost"] += actual
+            extensions = self.cost_extensions(requested, actual)
+        response = {"data": data, "extensions": extensions}
+        if errors:
+            response["errors"] = errors
+        return response
+
+    def resolve_root(self, selection_set, execution):
+        data = {}
+        for field in selection_set.selections:
+            name = field.name.value
+            arguments = get_arguments(field, execution.variables)
+            if name == "node":
+                value = self.resolve_node(arguments.get("id"), field, execution)
+            elif name == "nodes":
+                value = [self.resolve_node(node_id, field, execution)
+                         for node_id in arguments.get("ids") or []]
+            elif name.endswith("Count") and name[:-len("Count")] in self.roots:
+                items = filter_and_sort(self.roots[name[:-len("Count")]], arguments)
+                value = self.resolve_object({"count": len(items), "precision": "EXACT"},
+                                            field.selection_set, execution)
+            elif name == "shop":
+                value = self.resolve_object(
+                    {"__typename": "Shop", "id": "gid://shopify/Shop/{}".format(self.info["id"]),
+                     "name": self.info["name"], "myshopifyDomain": self.info["myshopify_domain"],
+                     "currencyCode": self.info["currency"],
+                     "ianaTimezone": self.info["iana_timezone"]},
+                    field.selection_set, execution)
+            elif name == "currentAppInstallation":
+                value = self.resolve_object(
+                    {"accessScopes": [{"handle": handle} for handle in ACCESS_SCOPES]},
+                    field.selection_set, execution)
+            elif name == "currentBulkOperation":
+                with self.lock:
+                    operations = list(self.bulk_operations.values())
+                value = (self.resolve_object(operations[-1].to_node(), field.selection_set,
+                                             execution) if operations else None)
+            elif is_connection(field):
+                value = self.resolve_connection(self.roots.get(name, []), field, execution,
+                                                root=name)
+            else:
+                value = None
+            merge(data, response_key(field), value)
+        return data
+
+    def resolve_node(self, node_id, field, execution):
+        obj = self.nodes.get(node_id)
+        if obj is None:
+            with self.lock:
+                operation = self.bulk_operations.get(node_id)
+            obj = operation.to_node() if operation else None
+        return self.resolve_object(obj, field.selection_set, execution) if obj else None
+
+    def get_sorted_root(self, root, arguments):
+        """The filtered and sorted records of a root connection, cached for the next pages."""
+        key = (root, arguments.get("query"), arguments.get("sortKey"),
+               bool(arguments.get("reverse")))
+        with self.lock:
+            cached = self.sorted_roots.get(key)
+        if cached is None:
+            items = filter_and_sort(self.roots.get(root, []), arguments)
+            cached = (items, {obj["id"]: index for index, obj in enumerate(items)})
+            with self.lock:
+                if len(self.sorted_roots) >= 64:
+                    self.sorted_roots.clear()
+                self.sorted_roots[key] = cached
+        return cached
+
+    def resolve_connection(self, items, field, execution, root=None):
+        arguments = get_arguments(field, execution.variables)
+        if root is not None:
+            items, positions = self.get_sorted_root(root, arguments)
+        else:
+            items = filter_and_sort(items, arguments)
+            positions = {obj["id"]: index for index, obj in enumerate(items)}
+
+        size = arguments.get("first") or arguments.get("last")
+        if not size:
+            raise QueryError("you must provide one of first or last")
+        if size > MAX_PAGE_SIZE:
+            raise QueryError("The connection {} requests {} records, more than the limit of "
+                             "{}".format(field.name.value, size, MAX_PAGE_SIZE))
+        start = 0
+        if arguments.get("after"):
+            try:
+                start = positions[decode_cursor(arguments["after"])] + 1
+            except (KeyError, ValueError) as exc:
+                raise QueryError("Invalid cursor for {}".format(field.name.value)) from exc
+        page = items[start:start + size]
+        execution.cost += 2
+
+        result = {}
+        for selection in field.selection_set.selections:
+            name = selection.name.value
+            if name == "edges":
+                value = []
+                for obj in page:
+                    edge = {}
+                    for edge_field in selection.selection_set.selections:
+                        if edge_field.name.value == "cursor":
+                            edge[response_key(edge_field)] = encode_cursor(obj)
+                        elif edge_field.name.value == "node":
+                            edge[response_key(edge_field)] = self.resolve_object(
+                                obj, edge_field.selection_set, execution)
+                    value.append(edge)
+            elif name == "nodes":
+                value = [self.resolve_object(obj, selection.selection_set, execution)
+                         for obj in page]
+            elif name == "pageInfo":
+                info = {"hasNextPage": start + len(page) < len(items),
+                        "hasPreviousPage": start > 0,
+                        "startCursor": encode_cursor(page[0]) if page else None,
+                        "endCursor": encode_cursor(page[-1]) if page else None}
+                value = {response_key(info_field): info.get(info_field.name.value)
+                         for info_field in selection.selection_set.selections}
+            else:
+                value = None
+            result[response_key(selection)] = value
+        return result
+
+    def resolve_object(self, obj, selection_set, execution, children=None):
+        """
+        The selected fields of `obj`. With `children`, connections are not
+        resolved but added to it as `(field, records)` for a bulk operation.
+        """
+        if obj is None:
+            return None
+        if obj.keys() == {"__typename", "id"}:
+            # A reference to another object of the shop
+            obj = self.nodes.get(obj["id"], obj)
+        execution.cost += 1
+        result = {}
+        for selection in selection_set.selections:
+            if isinstance(selection, InlineFragmentNode):
+                type_condition = selection.type_condition
+                if type_condition is None or type_condition.name.value == obj.get("__typename"):
+                    fragment = self.resolve_object(obj, selection.selection_set, execution,
+                                                   children)
+                    execution.cost -= 1
+                    for key, value in fragment.items():
+                        merge(result, key, value)
+                continue
+            if not isinstance(selection, FieldNode):
+                continue
+            key = response_key(selection)
+            name = selection.name.value
+            if name == "__typename":
+                merge(result, key, obj.get("__typename"))
+                continue
+            value = obj.get(name)
+            if selection.selection_set is None:
+                merge(result, key, value)
+            elif is_connection(selection):
+                if children is not None:
+                    children.append((selection, value or []))
+                else:
+                    merge(result, key, self.resolve_connection(value or [], selection,
+                                                               execution))
+            elif isinstance(value, list):
+                size = get_arguments(selection, execution.variables).get("first")
+                merge(result, key, [self.resolve_object(item, selection.selection_set,
+                                                        execution, children)
+                                    for item in value[:size]])
+            else:
+                if value is None and name.endswith("Set"):
+                    # Money amounts the generator leaves out
+                    value = money_bag(0)
+                merge(result, key, self.resolve_object(value, selection.selection_set,
+                                                       execution, children))
+        return result
+
+    # Bulk operations
+
+    def execute_mutation(self, operation, execution):
+        data = {}
+        for field in operation.selection_set.selections:
+            arguments = get_arguments(field, execution.variables)
+            name = field.name.value
+            if name == "bulkOperationRunQuery":
+                operation_node, user_errors = self.run_bulk_operation(arguments.get("query"))
+            elif name == "bulkOperationCancel":
+                operation_node, user_errors = self.cancel_bulk_operation(arguments.get("id"))
+            else:
+                raise QueryError("Mutation {} is not supported".format(name))
+            result = {"bulkOperation": operation_node, "userErrors": user_errors}
+            data[response_key(field)] = self.resolve_object(result, field.selection_set,
+                                                            execution)
+        return data
+
+    def run_bulk_operation(self, query):
+        try:
+            document = parse(query or "")
+        except GraphQLError as exc:
+            return None, [{"field": ["query"], "message": "Invalid bulk query: " + exc.message}]
+        with self.lock:
+            running = next((op for op in self.bulk_operations.values() if op.running), None)
+            if running is not None:
+                return None, [{"field": None, "message":
+                               "A bulk query operation for this app and shop is already in "
+                               "progress: {}.".format(running.id)}]
+            number = len(self.bulk_operations) + 1
+            operation = BulkOperation(number, query,
+                                      os.path.join(self.bulk_dir, "{}.jsonl".format(number)))
+            self.bulk_operations[operation.id] = operation
+            self.stats["bulk_operations"] += 1
+        threading.Thread(target=self.write_bulk_result, args=(operation, document),
+                         daemon=True).start()
+        return operation.to_node(), []
+
+    def cancel_bulk_operation(self, operation_id):
+        with self.lock:
+            operation = self.bulk_operations.get(operation_id)
+            if operation is None:
+                return None, [{"field": ["id"], "message": "Bulk operation does not exist"}]
+            if not operation.running:
+                return operation.to_node(), [{
+                    "field": None, "message": "A bulk operation cannot be canceled when it is "
+                                              + operation.status.lower()}]
+            operation.status = "CANCELED"
+            operation.completed_at = now()
+            return operation.to_node(), []
+
+    def write_bulk_lines(self, out, obj, selection_set, execution, parent_id=None):
+        children = []
+        record = self.resolve_object(obj, selection_set, execution, children)
+        if parent_id is not None:
+            record["__parentId"] = parent_id
+        out.write(json.dumps(record, separators=(",", ":")) + "\n")
+        lines = 1
+        for field, items in children:
+            node_selection_set = get_node_selection_set(field)
+            if node_selection_set is None:
+                continue
+            for item in filter_and_sort(items, get_arguments(field, execution.variables)):
+                lines += self.write_bulk_lines(out, item, node_selection_set, execution,
+                                               obj.get("id"))
+        return lines
+
+    def write_bulk_result(self, operation, document):
+        """Writes the JSONL result file of a bulk operation, one root record at a time."""
+        started = time.monotonic()
+        execution = Execution({})
+        with self.lock:
+            operation.status = "RUNNING"
+        try:
+            with open(operation.path, "w", encoding="utf-8") as out:
+                for definition in document.definitions:
+                    for field in definition.selection_set.selections:
+                        node_selection_set = (get_node_selection_set(field)
+                                              if is_connection(field) else None)
+                        if node_selection_set is None:
+                            continue
+                        arguments = get_arguments(field, {})
+                        items, _ = self.get_sorted_root(field.name.value, arguments)
+                        for obj in items:
+                            lines = self.write_bulk_lines(out, obj, node_selection_set,
+                                                          execution)
+                            with self.lock:
+                                if operation.status == "CANCELED":
+                                    return
+                                operation.object_count += lines
+                                operation.root_object_count += 1
+            # Takes at least `bulk_duration` seconds, like a shop under load
+            time.sleep(max(0.0, self.bulk_duration - (time.monotonic() - started)))
+            with self.lock:
+                if operation.status == "CANCELED":
+                    return
+                operation.file_size = os.path.getsize(operation.path)
+                if operation.object_count:
+                    operation.url = "{}/bulk/{}".format(self.base_url,
+                                                        os.path.basename(operation.path))
+                operation.status = "COMPLETED"
+                operation.completed_at = now()
+        except Exception: # pylint: disable=broad-except
+            with self.lock:
+                operation.status = "FAILED"
+                operation.error_code = "INTERNAL_SERVER_ERROR"
+                operation.completed_at = now()
+            raise
+        finally:
+            operation.done.set()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeShopify/1.0"
+
+    @property
+    def shop(self):
+        return self.server.fake_shop
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, value, status=200):
+        body = json.dumps(value).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Request-ID", "fake-{}".format(time.monotonic_ns()))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def authorized(self):
+        """Answers 401 like Shopify unless the request carries the shop's access token."""
+        if self.headers.get("X-Shopify-Access-Token") == self.shop.access_token:
+            return True
+        self.shop.count("unauthorized")
+        self.send_json({"errors": "[API] Invalid API key or access token "
+                                  "(unrecognized login or wrong password)"}, 401)
+        return False
+
+    def do_POST(self): # pylint: disable=invalid-name
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not urlparse(self.path).path.endswith("/graphql.json"):
+            self.send_json({"errors": "Not Found"}, 404)
+            return
+        if not self.authorized():
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        try:
+            request = json.loads(body)
+        except ValueError:
+            self.send_json({"errors": "Invalid JSON"}, 400)
+            return
+        self.send_json(self.shop.execute(request))
+
+    def do_GET(self): # pylint: disable=invalid-name
+        path = urlparse(self.path).path
+        if path.endswith("/shop.json"):
+            if self.authorized():
+                self.send_json({"shop": self.shop.info})
+        elif path.startswith("/bulk/"):
+            self.send_file(os.path.join(self.shop.bulk_dir, os.path.basename(path)))
+        else:
+            self.send_json({"errors": "Not Found"}, 404)
+
+    def send_file(self, path):
+        if not os.path.isfile(path):
+            self.send_json({"errors": "Not Found"}, 404)
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */{}".format(size))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes {}-{}/{}".format(start, end, size))
+        else:
+            self.send_response(200)
+        length = end - start + 1
+        self.send_header("Content-Type", "application/jsonl")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+        with open(path, "rb") as result_file:
+            result_file.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = result_file.read(min(remaining, 1 << 16))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+        self.shop.count("bulk_bytes_served", length)
+
+
+def start_server(fake_shop, host="127.0.0.1", port=0, latency=0.0, verbose=False):
+    """Serves `fake_shop` from a background thread, returns the server."""
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.fake_shop = fake_shop
+    server.latency = latency
+    server.verbose = verbose
+    fake_shop.base_url = "http://{}:{}".format(host, server.server_address[1])
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_server_arguments(parser):
+    parser.add_argument("--shop", help="shop file from shop_generator.py, generated otherwise")
+    parser.add_argument("--max-cost", type=int, default=MAX_QUERY_COST)
+    parser.add_argument("--bucket-size", type=int, default=BUCKET_SIZE)
+    parser.add_argument("--restore-rate", type=float, default=RESTORE_RATE,
+                        help="cost points restored per second")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every GraphQL request")
+    parser.add_argument("--bulk-duration", type=float, default=0.0,
+                        help="least seconds a bulk operation runs")
+    parser.add_argument("--access-token", default=ACCESS_TOKEN,
+                        help="token the API requests must carry")
+
+
+def fake_shop_from_arguments(args):
+    if args.shop:
+        with open(args.shop, encoding="utf-8") as shop_file:
+            shop = json.load(shop_file)
+    else:
+        shop = shop_from_arguments(args)
+    return FakeShop(shop, max_cost=args.max_cost, bucket_size=args.bucket_size,
+                    restore_rate=args.restore_rate, bulk_duration=args.bulk_duration,
+                    access_token=args.access_token)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    add_server_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    fake_shop = fake_shop_from_arguments(args)
+    server = start_server(fake_shop, args.host, args.port, args.latency, args.verbose)
+    sizes = {name: len(objects) for name, objects in fake_shop.roots.items()}
+    print("Serving {} at {}".format(sizes, fake_shop.base_url))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        shutil.rmtree(fake_shop.bulk_dir, ignore_errors=True)
+        print(fake_shop.stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+"""
+Runs a full sync of the tap against `fake_server.py` serving a generated
+shop, in this process, and reports the time it took, the records of every
+stream and what the server saw: requests, unauthorized, throttled and too
+costly queries, bulk operations and bytes downloaded.
+
+    python spikes/fake-shop/run_sync.py --orders 5000 --line-items 10
+    python spikes/fake-shop/run_sync.py --streams orders customers \
+        --config '{"stream_workers": 4, "bulk_streams": "customers"}'
+
+The tap's URLs come from `shopify.Session`, which is pointed at the local
+server: the shop `127` on the domain `0.0.1` and the server's port. The
+Singer messages are counted, not written, pass `--out` to keep them.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import shopify
+from singer import metadata
+
+import tap_shopify
+from tap_shopify.context import Context
+
+from fake_server import add_server_arguments, fake_shop_from_arguments, start_server
+from shop_generator import add_arguments
+
+# The streams the generated shop has records for. `order_refunds` also has records but
+# needs a higher `--max-cost`, its query nests two connections in the refunds of each order
+DEFAULT_STREAMS = ["orders", "customers", "products", "product_variants", "transactions",
+                   "order_shipping_lines", "metafields_orders", "metafields_customers",
+                   "metafields_products"]
+
+
+class CountingOutput():
+    """Stands in for stdout, counting the Singer messages written to it."""
+
+    def __init__(self, out=None):
+        self.out = out
+        self.bytes = 0
+        self.lines = 0
+
+    def write(self, text):
+        self.bytes += len(text)
+        self.lines += text.count("\n")
+        if self.out:
+            self.out.write(text)
+        return len(text)
+
+    def flush(self):
+        if self.out:
+            self.out.flush()
+
+
+def select_streams(catalog, stream_names):
+    for entry in catalog["streams"]:
+        mdata = metadata.to_map(entry["metadata"])
+        selected = entry["tap_stream_id"] in stream_names
+        # Every field, like a full sync selects them
+        for breadcrumb in mdata:
+            mdata = metadata.write(mdata, breadcrumb, "selected", selected)
+        entry["metadata"] = metadata.to_list(mdata)
+    return catalog
+
+
+def run_sync(config, stream_names, out):
+    Context.config = config
+    Context.state = {}
+    Context.catalog = select_streams(tap_shopify.discover(), stream_names)
+    Context.tap_start = tap_shopify.utils.now()
+
+    stdout, sys.stdout = sys.stdout, out
+    start = time.perf_counter()
+    try:
+        tap_shopify.sync()
+    finally:
+        sys.stdout = stdout
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    add_server_arguments(parser)
+    parser.add_argument("--streams", nargs="+", default=DEFAULT_STREAMS)
+    parser.add_argument("--config", default="{}", help="JSON of more tap config options")
+    parser.add_argument("--out", help="file to write the Singer messages to")
+    args = parser.parse_args()
+
+    generated = time.perf_counter()
+    fake_shop = fake_shop_from_arguments(args)
+    print("Generated {} in {:.1f}s".format(
+        {name: len(objects) for name, objects in fake_shop.roots.items()},
+        time.perf_counter() - generated), file=sys.stderr)
+    server = start_server(fake_shop, latency=args.latency)
+    shopify.Session.setup(protocol="http", myshopify_domain="0.0.1",
+                          port=server.server_address[1])
+
+    config = {"shop": "127", "api_key": fake_shop.access_token, "start_date": args.start,
+              "request_timeout": 60, **json.loads(args.config)}
+    with open(args.out or os.devnull, "w", encoding="utf-8") as out_file:
+        out = CountingOutput(out_file if args.out else None)
+        try:
+            elapsed = run_sync(config, args.streams, out)
+        finally:
+            server.shutdown()
+            shutil.rmtree(fake_shop.bulk_dir, ignore_errors=True)
+
+    print("Synced in {:.2f}s, {} messages, {} bytes".format(elapsed, out.lines, out.bytes),
+          file=sys.stderr)
+    for stream_name, count in sorted(Context.counts.items()):
+        print("  {:<24} {:>9} records".format(stream_name, count), file=sys.stderr)
+    for name, value in fake_shop.stats.items():
+        print("  {:<24} {:>9}".format(name, value), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
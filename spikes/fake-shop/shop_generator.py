@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+"""
+Generates a synthetic shop for `fake_server.py`: orders with line items,
+transactions, refunds, shipping lines and metafields, customers and
+products with their variants and metafields.
+
+Objects are shaped like the GraphQL Admin API returns them, with the same
+field names, `gid://shopify/...` ids and a `__typename`, and are created and
+updated at times spread over the date range, so the `query:` date filters of
+every date window select some of them. The same arguments always generate
+the same shop.
+
+    python spikes/fake-shop/shop_generator.py [--orders N] [--line-items N]
+        [--customers N] [--products N] [--metafields N] [--out shop.json]
+"""
+import argparse
+import datetime
+import json
+import random
+import sys
+
+CURRENCY = "USD"
+
+FINANCIAL_STATUSES = ["PAID", "PAID", "PAID", "PARTIALLY_REFUNDED", "REFUNDED", "PENDING"]
+FULFILLMENT_STATUSES = ["FULFILLED", "FULFILLED", "UNFULFILLED", "PARTIALLY_FULFILLED"]
+GATEWAYS = ["shopify_payments", "paypal", "manual"]
+VENDORS = ["Acme", "Globex", "Initech", "Umbrella", "Hooli"]
+PRODUCT_TYPES = ["Shirts", "Shoes", "Hats", "Bags", "Accessories"]
+CITIES = [("Ottawa", "ON", "CA"), ("Denver", "CO", "US"), ("Berlin", "BE", "DE"),
+          ("Lyon", "ARA", "FR"), ("Austin", "TX", "US")]
+
+
+def gid(resource, number):
+    return "gid://shopify/{}/{}".format(resource, number)
+
+
+def timestamp(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def money(amount):
+    amount = "{:.2f}".format(amount)
+    return {"amount": amount, "currencyCode": CURRENCY}
+
+
+def money_bag(amount):
+    return {"shopMoney": money(amount), "presentmentMoney": money(amount)}
+
+
+class ShopGenerator():
+    """
+    Builds the resources of a shop of the given size. Ids are numbered per
+    resource type from 1, a shop of more orders contains the orders of a
+    smaller one with the same seed.
+    """
+
+    def __init__(self, start, end, seed=0):
+        self.start = start
+        self.span = (end - start).total_seconds()
+        self.random = random.Random(seed)
+        self.next_ids = {}
+
+    def next_id(self, resource):
+        self.next_ids[resource] = self.next_ids.get(resource, 0) + 1
+        return self.next_ids[resource]
+
+    def times(self, created_after=None):
+        """A creation time and a later update time within the date range."""
+        start = created_after or self.start
+        offset = (start - self.start).total_seconds()
+        created = start + datetime.timedelta(
+            seconds=self.random.uniform(0, max(self.span - offset, 0)))
+        remaining = (self.start - created).total_seconds() + self.span
+        updated = created + datetime.timedelta(
+            seconds=self.random.uniform(0, max(remaining, 0)) * self.random.random())
+        return created, updated
+
+    def address(self, first_name, last_name):
+        city, province, country = self.random.choice(CITIES)
+        return {
+            "__typename": "MailingAddress",
+            "firstName": first_name,
+            "lastName": last_name,
+            "address1": "{} Main Street".format(self.random.randint(1, 999)),
+            "address2": None,
+            "city": city,
+            "provinceCode": province,
+            "countryCodeV2": country,
+            "zip": "{:05d}".format(self.random.randint(0, 99999)),
+            "phone": None,
+        }
+
+    def metafields(self, owner, owner_type, count, created_after):
+        metafields = []
+        for index in range(count):
+            created, updated = self.times(created_after)
+            metafields.append({
+                "__typename": "Metafield",
+                "id": gid("Metafield", self.next_id("Metafield")),
+                "namespace": "custom",
+                "key": "field_{}".format(index),
+                "type": "single_line_text_field",
+                "value": "value {}".format(self.random.randint(0, 10 ** 6)),
+                "description": None,
+                "ownerType": owner_type,
+                "createdAt": timestamp(created),
+                "updatedAt": timestamp(updated),
+                "owner": {"__typename": owner["__typename"], "id": owner["id"]},
+            })
+        return metafields
+
+    def product(self, variant_count, metafield_count):
+        number = self.next_id("Product")
+        created, updated = self.times()
+        title = "Product {}".format(number)
+        product = {
+            "__typename": "Product",
+            "id": gid("Product", number),
+            "legacyResourceId": str(number),
+            "title": title,
+            "handle": "product-{}".format(number),
+            "description": "The {} in every size.".format(title.lower()),
+            "descriptionHtml": "<p>The {} in every size.</p>".format(title.lower()),
+            "vendor": self.random.choice(VENDORS),
+            "productType": self.random.choice(PRODUCT_TYPES),
+            "status": "ACTIVE",
+            "tags": ["synthetic"],
+            "createdAt": timestamp(created),
+            "updatedAt": timestamp(updated),
+            "publishedAt": timestamp(created),
+            "totalInventory": 0,
+            "tracksInventory": True,
+            "isGiftCard": False,
+            "hasOnlyDefaultVariant": variant_count == 1,
+        }
+        variants = []
+        for position in range(1, variant_count + 1):
+            variant_number = self.next_id("ProductVariant")
+            variant_created, variant_updated = self.times(created)
+            quantity = self.random.randint(0, 100)
+            variants.append({
+                "__typename": "ProductVariant",
+                "id": gid("ProductVariant", variant_number),
+                "title": "Size {}".format(position),
+                "displayName": "{} - Size {}".format(title, position),
+                "sku": "SKU-{}-{}".format(number, position),
+                "barcode": None,
+                "price": "{:.2f}".format(self.random.uniform(5, 200)),
+                "compareAtPrice": None,
+                "position": position,
+                "inventoryQuantity": quantity,
+                "inventoryPolicy": "DENY",
+                "availableForSale": quantity > 0,
+                "taxable": True,
+                "createdAt": timestamp(variant_created),
+                "updatedAt": timestamp(variant_updated),
+                "product": {"__typename": "Product", "id": product["id"]},
+            })
+            product["totalInventory"] += quantity
+        product["variants"] = variants
+        product["metafields"] = self.metafields(product, "PRODUCT", metafield_count, created)
+        return product
+
+    def customer(self, metafield_count):
+        number = self.next_id("Customer")
+        created, updated = self.times()
+        first_name, last_name = "Customer", str(number)
+        address = self.address(first_name, last_name)
+        customer = {
+            "__typename": "Customer",
+            "id": gid("Customer", number),
+            "legacyResourceId": str(number),
+            "firstName": first_name,
+            "lastName": last_name,
+            "displayName": "{} {}".format(first_name, last_name),
+            "email": "customer{}@example.com".format(number),
+            "phone": None,
+            "note": None,
+            "state": "ENABLED",
+            "verifiedEmail": True,
+            "validEmailAddress": True,
+            "taxExempt": False,
+            "taxExemptions": [],
+            "tags": [],
+            "locale": "en",
+            "numberOfOrders": "0",
+            "amountSpent": money(0),
+            "createdAt": timestamp(created),
+            "updatedAt": timestamp(updated),
+            "defaultAddress": address,
+            "addresses": [address],
+        }
+        customer["metafields"] = self.metafields(customer, "CUSTOMER", metafield_count, created)
+        return customer
+
+    def line_items(self, count, variants):
+        line_items = []
+        for _ in range(count):
+            variant = self.random.choice(variants)
+            quantity = self.random.randint(1, 5)
+            price = float(variant["price"])
+            line_items.append({
+                "__typename": "LineItem",
+                "id": gid("LineItem", self.next_id("LineItem")),
+                "name": variant["displayName"],
+                "title": variant["displayName"].split(" - ")[0],
+                "variantTitle": variant["title"],
+                "sku": variant["sku"],
+                "vendor": None,
+                "quantity": quantity,
+                "currentQuantity": quantity,
+                "fulfillableQuantity": 0,
+                "requiresShipping": True,
+                "taxable": True,
+                "isGiftCard": False,
+                "originalUnitPriceSet": money_bag(price),
+                "discountedUnitPriceSet": money_bag(price),
+                "originalTotalSet": money_bag(price * quantity),
+                "discountedTotalSet": money_bag(price * quantity),
+                "totalDiscountSet": money_bag(0),
+                "taxLines": [],
+                "variant": {"__typename": "ProductVariant", "id": variant["id"]},
+            })
+        return line_items
+
+    def order(self, customer, variants, line_item_count, metafield_count):
+        number = self.next_id("Order")
+        created, updated = self.times()
+        order_id = gid("Order", number)
+        order_ref = {"__typename": "Order", "id": order_id}
+        line_items = self.line_items(line_item_count, variants)
+        subtotal = sum(float(line["originalTotalSet"]["shopMoney"]["amount"])
+                       for line in line_items)
+        shipping = self.random.choice([0, 5, 10])
+        total = subtotal + shipping
+        financial_status = self.random.choice(FINANCIAL_STATUSES)
+
+        transactions = [{
+            "__typename": "OrderTransaction",
+            "id": gid("OrderTransaction", self.next_id("OrderTransaction")),
+            "kind": "SALE",
+            "status": "SUCCESS",
+            "gateway": self.random.choice(GATEWAYS),
+            "test": False,
+            "amountSet": money_bag(total),
+            "createdAt": timestamp(created),
+            "processedAt": timestamp(created),
+            "order": order_ref,
+        }]
+
+        refunds = []
+        if financial_status in ("PARTIALLY_REFUNDED", "REFUNDED"):
+            refunded = total if financial_status == "REFUNDED" else total / 2
+            refund_created, refund_updated = self.times(created)
+            transactions.append({
+                **transactions[0],
+                "id": gid("OrderTransaction", self.next_id("OrderTransaction")),
+                "kind": "REFUND",
+                "amountSet": money_bag(refunded),
+                "createdAt": timestamp(refund_created),
+                "processedAt": timestamp(refund_created),
+            })
+            refund_number = self.next_id("Refund")
+            refunds.append({
+                "__typename": "Refund",
+                "id": gid("Refund", refund_number),
+                "legacyResourceId": str(refund_number),
+                "note": None,
+                "createdAt": timestamp(refund_created),
+                "updatedAt": timestamp(refund_updated),
+                "totalRefundedSet": money_bag(refunded),
+                "order": order_ref,
+                "refundLineItems": [{
+                    "__typename": "RefundLineItem",
+                    "id": gid("RefundLineItem", self.next_id("RefundLineItem")),
+                    "quantity": line["quantity"],
+                    "restockType": "RETURN",
+                    "restocked": True,
+                    "priceSet": line["originalUnitPriceSet"],
+                    "subtotalSet": line["originalTotalSet"],
+                    "totalTaxSet": money_bag(0),
+                    "lineItem": {"__typename": "LineItem", "id": line["id"]},
+                } for line in line_items[:1]],
+                "orderAdjustments": [],
+            })
+
+        shipping_lines = [{
+            "__typename": "ShippingLine",
+            "id": gid("ShippingLine", self.next_id("ShippingLine")),
+            "title": "Standard",
+            "code": "STANDARD",
+            "source": "shopify",
+            "carrierIdentifier": None,
+            "originalPriceSet": money_bag(shipping),
+            "discountedPriceSet": money_bag(shipping),
+            "updatedAt": timestamp(updated),
+        }]
+
+        order = {
+            "__typename": "Order",
+            "id": order_id,
+            "legacyResourceId": str(number),
+            "name": "#{}".format(1000 + number),
+            "number": number,
+            "email": customer["email"] if customer else None,
+            "phone": None,
+            "note": None,
+            "test": False,
+            "confirmed": True,
+            "closed": False,
+            "edited": False,
+            "unpaid": financial_status == "PENDING",
+            "fullyPaid": financial_status != "PENDING",
+            "currencyCode": CURRENCY,
+            "presentmentCurrencyCode": CURRENCY,
+            "displayFinancialStatus": financial_status,
+            "displayFulfillmentStatus": self.random.choice(FULFILLMENT_STATUSES),
+            "paymentGatewayNames": [transactions[0]["gateway"]],
+            "tags": [],
+            "discountCodes": [],
+            # Lists the API never returns as null
+            "additionalFees": [],
+            "disputes": [],
+            "taxLines": [],
+            "fulfillments": [],
+            "sourceName": "web",
+            "taxesIncluded": False,
+            "taxExempt": False,
+            "requiresShipping": True,
+            "subtotalLineItemsQuantity": sum(line["quantity"] for line in line_items),
+            "totalWeight": "0",
+            "createdAt": timestamp(created),
+            "updatedAt": timestamp(updated),
+            "processedAt": timestamp(created),
+            "subtotalPriceSet": money_bag(subtotal),
+            "totalShippingPriceSet": money_bag(shipping),
+            "totalPriceSet": money_bag(total),
+            "currentTotalPriceSet": money_bag(total),
+            "totalTaxSet": money_bag(0),
+            "totalDiscountsSet": money_bag(0),
+            "customer": {"__typename": "Customer", "id": customer["id"]} if customer else None,
+            "billingAddress": customer["defaultAddress"] if customer else None,
+            "shippingAddress": customer["defaultAddress"] if customer else None,
+            "lineItems": line_items,
+            "transactions": transactions,
+            "refunds": refunds,
+            "shippingLines": shipping_lines,
+            "shippingLine": shipping_lines[0],
+            "fulfillmentsCount": {"count": 0, "precision": "EXACT"},
+            "transactionsCount": {"count": len(transactions), "precision": "EXACT"},
+        }
+        order["metafields"] = self.metafields(order, "ORDER", metafield_count, created)
+        if customer:
+            customer["numberOfOrders"] = str(int(customer["numberOfOrders"]) + 1)
+        return order
+
+
+def generate_shop(orders=1000, line_items=5, customers=200, products=50, variants=3,
+                  metafields=2, start="2024-01-01T00:00:00Z", end="2025-01-01T00:00:00Z",
+                  seed=0):
+    """
+    Returns the shop as a dict of its root connections, e.g. `orders`, each a
+    list of objects sorted by id. `line_items` and `metafields` are per order,
+    customer or product, `variants` per product.
+    """
+    generator = ShopGenerator(datetime.datetime.strptime(start, "%Y-%m-%dT%H:%M:%SZ"),
+                              datetime.datetime.strptime(end, "%Y-%m-%dT%H:%M:%SZ"), seed)
+    shop_products = [generator.product(variants, metafields) for _ in range(max(products, 1))]
+    shop_customers = [generator.customer(metafields) for _ in range(customers)]
+    shop_variants = [variant for product in shop_products for variant in product["variants"]]
+    shop_orders = [generator.order(generator.random.choice(shop_customers) if shop_customers
+                                   else None, shop_variants, line_items, metafields)
+                   for _ in range(orders)]
+    return {
+        "orders": shop_orders,
+        "customers": shop_customers,
+        "products": shop_products,
+        "productVariants": shop_variants,
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--line-items", type=int, default=5, help="line items per order")
+    parser.add_argument("--customers", type=int, default=200)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--variants", type=int, default=3, help="variants per product")
+    parser.add_argument("--metafields", type=int, default=2,
+                        help="metafields per order, customer and product")
+    parser.add_argument("--start", default="2024-01-01T00:00:00Z",
+                        help="earliest creation time of the generated objects")
+    parser.add_argument("--end", default="2025-01-01T00:00:00Z",
+                        help="latest update time of the generated objects")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def shop_from_arguments(args):
+    return generate_shop(orders=args.orders, line_items=args.line_items,
+                         customers=args.customers, products=args.products,
+                         variants=args.variants, metafields=args.metafields,
+                         start=args.start, end=args.end, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument("--out", help="file to write the shop to, stdout by default")
+    args = parser.parse_args()
+
+    shop = shop_from_arguments(args)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as out:
+            json.dump(shop, out)
+    else:
+        json.dump(shop, sys.stdout)
+    print({name: len(objects) for name, objects in shop.items()}, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
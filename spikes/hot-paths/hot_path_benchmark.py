@@ -0,0 +1,390 @@
+#!/usr/bin/env python
+"""
+Measures the throughput of the CPU hot paths of a sync on recorded payloads
+sized like production, and fails when a change makes them slower than a
+saved baseline.
+
+The stages run in the order a record goes through them:
+
+    bulk_jsonl        BulkOperation.parse_jsonl rebuilding orders from a bulk result file
+    transform_object  each stream's transform_object on the records of its pages
+    query_plan        remove_fields_from_query pruning every stream query, cache cold
+    record_transform  the RecordTransformer of write_records with the catalog metadata
+    write_record      output.write_record serializing and buffering the Singer messages
+
+Every stage reports records/s and bytes/s of its input and its peak memory
+traced with tracemalloc in one more run. The throughput is the CPU time of
+the stage, so other processes of a shared machine barely count, averaged over
+as many runs as take `--min-time` seconds, best of `--repeat` such samples.
+
+    python spikes/hot-paths/hot_path_benchmark.py --save-baseline
+    python spikes/hot-paths/hot_path_benchmark.py --check [--tolerance 0.2]
+
+The payloads are recorded into `fixtures/` on first use from the fake shop of
+`spikes/fake-shop`, resolving the tap's own queries: the orders bulk result
+file and 250 record pages of customers, products and product variants. The
+shop is generated from a fixed seed, so every machine records the same
+payloads and they are not committed.
+
+Baselines depend on the machine and are not committed either. The
+`run_benchmark` CI job saves one running this benchmark against the tap at
+the merge base of the branch and master, then runs `--check` against it on
+the same executor. A stage slower than the tolerance is measured again
+before it counts as a regression. Small stages still vary by about 15%
+between runs, so the job reports regressions without blocking `build`.
+"""
+import argparse
+import concurrent.futures
+import copy
+import json
+import logging
+import pickle
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from graphql import parse
+import singer
+from singer import metadata
+
+import tap_shopify.streams # pylint: disable=unused-import
+from tap_shopify import output
+from tap_shopify.context import Context
+from tap_shopify.query_plan import QueryPlanCache
+from tap_shopify.streams.bulk import BulkOperation
+from tap_shopify.transform import RecordTransformer
+
+HERE = Path(__file__).resolve().parent
+SCHEMAS = HERE.parents[1] / "tap_shopify" / "schemas"
+sys.path.insert(0, str(HERE.parent / "fake-shop"))
+
+# pylint: disable=wrong-import-position,wrong-import-order
+from fake_server import Execution, FakeShop, get_node_selection_set
+from shop_generator import generate_shop
+
+STAGES = ["bulk_jsonl", "transform_object", "query_plan", "record_transform", "write_record"]
+
+PAGE_STREAMS = ["customers", "products", "product_variants"]
+
+SDC_FIELDS = {"_sdc_shop_id": 1, "_sdc_shop_name": "shop", "_sdc_shop_myshopify_domain": "shop"}
+
+PAGE_SIZE = 250
+
+# Peak memory grown by less than this many bytes is not a regression, the peaks
+# of a few hundred KB move with the output buffer flushes
+MEMORY_SLACK = 1 << 20
+
+# Seed of the generated shop, the fixtures recorded on any machine are the same
+FIXTURE_SEED = 0
+
+
+class NullOutput():
+    """Stands in for stdout, discarding what is written."""
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class FixtureBulkOperation(BulkOperation):
+    """Reads the result file from the recorded lines instead of downloading it."""
+
+    lines = []
+
+    @staticmethod
+    def iter_lines(url, offset=0):
+        position = 0
+        for line in FixtureBulkOperation.lines:
+            position += len(line) + 1
+            if position > offset:
+                yield line, position
+
+
+def get_stream(name):
+    return Context.stream_objects[name]()
+
+
+def get_catalog_entry(name):
+    schema = json.loads((SCHEMAS / "{}.json".format(name)).read_text())
+    schema["properties"].update({key: {"type": ["null", "integer" if key.endswith("id")
+                                                else "string"]}
+                                 for key in SDC_FIELDS})
+    stream = get_stream(name)
+    mdata = metadata.to_map(metadata.get_standard_metadata(
+        schema, key_properties=stream.key_properties,
+        valid_replication_keys=[stream.replication_key],
+        replication_method=stream.replication_method))
+    # Every field selected, like a full sync
+    for breadcrumb in mdata:
+        mdata = metadata.write(mdata, breadcrumb, "selected", True)
+    return schema, mdata
+
+
+def record_fixtures(directory, orders, line_items):
+    """Resolves the tap's queries against a generated shop and saves the payloads."""
+    shop = generate_shop(orders=orders, line_items=line_items, customers=PAGE_SIZE,
+                         products=PAGE_SIZE, variants=3, seed=FIXTURE_SEED)
+    fake_shop = FakeShop(shop)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    orders_stream = get_stream("orders")
+    builder = FixtureBulkOperation(orders_stream).get_builder(orders_stream.get_query())
+    root = parse(builder.build("")).definitions[0].selection_set.selections[0]
+    execution = Execution({})
+    with open(directory / "orders.jsonl", "w", encoding="utf-8") as out:
+        for order in shop["orders"]:
+            fake_shop.write_bulk_lines(out, order, get_node_selection_set(root), execution)
+
+    for name in PAGE_STREAMS:
+        stream = get_stream(name)
+        operation = parse(stream.get_query()).definitions[0]
+        page = fake_shop.resolve_root(operation.selection_set,
+                                      Execution({"first": PAGE_SIZE, "query": None}))
+        (directory / "{}.json".format(name)).write_text(json.dumps({"data": page}))
+
+
+def load_fixtures(directory):
+    with open(directory / "orders.jsonl", "rb") as jsonl:
+        lines = jsonl.read().splitlines()
+    pages = {}
+    for name in PAGE_STREAMS:
+        stream = get_stream(name)
+        response = json.loads((directory / "{}.json".format(name)).read_text())
+        pages[name] = [edge["node"] for edge in response["data"][stream.data_key]["edges"]]
+    return lines, pages
+
+
+# Stages, each consuming its input and yielding its output one record at a time
+
+def run_bulk_jsonl(lines):
+    FixtureBulkOperation.lines = lines
+    bulk_operation = FixtureBulkOperation(get_stream("orders"))
+    builder = bulk_operation.get_builder(bulk_operation.stream.get_query())
+    for rec, _offset in bulk_operation.parse_jsonl("fixture", builder.plan):
+        yield "orders", rec
+
+
+def run_transform_object(records):
+    streams = {}
+    for stream_name, obj in records:
+        if stream_name not in streams:
+            streams[stream_name] = get_stream(stream_name)
+        yield stream_name, streams[stream_name].transform_object(obj)
+
+
+def run_query_plan(queries):
+    Context.query_plans = QueryPlanCache()
+    for stream_name, fields_to_remove, paths_to_remove in queries:
+        yield stream_name, get_stream(stream_name).remove_fields_from_query(fields_to_remove,
+                                                                            paths_to_remove)
+
+
+def run_record_transform(records, transformers):
+    for stream_name, rec in records:
+        rec.update(SDC_FIELDS)
+        yield stream_name, transformers[stream_name].transform_record(rec)
+
+
+def run_write_record(records):
+    stdout, sys.stdout = sys.stdout, NullOutput()
+    try:
+        for stream_name, rec in records:
+            output.write_record(stream_name, rec)
+            yield stream_name, rec
+        output.flush()
+    finally:
+        sys.stdout = stdout
+
+
+def get_queries():
+    """Every stream query with every other field of its schema deselected."""
+    queries = []
+    for path in sorted(SCHEMAS.glob("*.json")):
+        if path.stem not in Context.stream_objects:
+            continue
+        schema = json.loads(path.read_text())
+        fields = list(schema["properties"])
+        stream = get_stream(path.stem)
+        automatic = set(stream.key_properties) | {stream.replication_key}
+        queries.append((path.stem, [field for field in fields[1::2] if field not in automatic],
+                        ()))
+    return queries
+
+
+def measure(run, inputs, input_bytes, repeat, min_time):
+    """
+    The best throughput of `repeat` samples, each the CPU time per run over
+    runs lasting `min_time` seconds together, and the peak memory of one more.
+    """
+    # Each run gets its own copy of the inputs, unpickling is cheaper than deepcopy
+    payload = pickle.dumps(inputs, pickle.HIGHEST_PROTOCOL)
+    best = None
+    for _ in range(repeat):
+        runs, elapsed = 0, 0.0
+        while elapsed < min_time or not runs:
+            data = pickle.loads(payload)
+            start = time.process_time()
+            count = sum(1 for _ in run(data))
+            elapsed += time.process_time() - start
+            runs += 1
+        best = elapsed / runs if best is None else min(best, elapsed / runs)
+
+    data = pickle.loads(payload)
+    tracemalloc.start()
+    try:
+        sum(1 for _ in run(data))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"records": count, "bytes": input_bytes, "seconds": best,
+            "records_per_second": count / best, "bytes_per_second": input_bytes / best,
+            "peak_memory": peak}
+
+
+def json_size(records):
+    return sum(len(json.dumps(rec)) for _stream_name, rec in records)
+
+
+def run_stages(lines, pages, stages, repeat, min_time):
+    Context.config = {"start_date": "2024-01-01T00:00:00Z"}
+    results = {}
+
+    # The output of each stage is the input of the next
+    bulk_bytes = sum(len(line) + 1 for line in lines)
+    if "bulk_jsonl" in stages:
+        results["bulk_jsonl"] = measure(run_bulk_jsonl, lines, bulk_bytes, repeat, min_time)
+    records = list(run_bulk_jsonl(lines))
+    records += [(name, obj) for name in PAGE_STREAMS for obj in pages[name]]
+
+    if "transform_object" in stages:
+        results["transform_object"] = measure(run_transform_object, records,
+                                              json_size(records), repeat, min_time)
+    records = list(run_transform_object(copy.deepcopy(records)))
+
+    if "query_plan" in stages:
+        queries = get_queries()
+        query_bytes = sum(len(get_stream(name).get_query()) for name, _, _ in queries)
+        results["query_plan"] = measure(run_query_plan, queries, query_bytes, repeat, min_time)
+
+    transformers = {}
+    for name in ["orders"] + PAGE_STREAMS:
+        schema, mdata = get_catalog_entry(name)
+        transformers[name] = RecordTransformer(schema, mdata,
+                                               singer.UNIX_SECONDS_INTEGER_DATETIME_PARSING)
+    if "record_transform" in stages:
+        results["record_transform"] = measure(
+            lambda data: run_record_transform(data, transformers), records,
+            json_size(records), repeat, min_time)
+    records = list(run_record_transform(copy.deepcopy(records), transformers))
+
+    if "write_record" in stages:
+        results["write_record"] = measure(run_write_record, records, json_size(records),
+                                          repeat, min_time)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """The regressions of `results` beyond `tolerance` from the baseline."""
+    regressions = []
+    for stage, result in results.items():
+        base = baseline["stages"].get(stage)
+        if base is None:
+            continue
+        if result["records_per_second"] < base["records_per_second"] * (1 - tolerance):
+            regressions.append("{}: {:.0f} records/s, baseline {:.0f}".format(
+                stage, result["records_per_second"], base["records_per_second"]))
+        if result["peak_memory"] > base["peak_memory"] * (1 + tolerance) + MEMORY_SLACK:
+            regressions.append("{}: peak memory {} bytes, baseline {}".format(
+                stage, result["peak_memory"], base["peak_memory"]))
+    return regressions
+
+
+def report(results, baseline=None):
+    print("{:<17} {:>8} {:>12} {:>10} {:>12} {:>9}".format(
+        "stage", "records", "records/s", "MB/s", "peak MB", "vs base"))
+    for stage, result in results.items():
+        base = (baseline or {}).get("stages", {}).get(stage)
+        change = ("{:+.1%}".format(result["records_per_second"] / base["records_per_second"] - 1)
+                  if base else "")
+        print("{:<17} {:>8} {:>12.0f} {:>10.1f} {:>12.2f} {:>9}".format(
+            stage, result["records"], result["records_per_second"],
+            result["bytes_per_second"] / 1e6, result["peak_memory"] / 1e6, change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=100, help="orders in the bulk result file")
+    parser.add_argument("--line-items", type=int, default=10, help="line items per order")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="CPU seconds of the runs of each sample")
+    parser.add_argument("--fixtures", type=Path, default=HERE / "fixtures")
+    parser.add_argument("--record", action="store_true",
+                        help="record the fixtures again even if they exist")
+    parser.add_argument("--baseline", type=Path, default=HERE / "baseline.json")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="save the results as the baseline")
+    parser.add_argument("--check", action="store_true",
+                        help="exit with 1 when a stage regressed beyond the tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slower throughput or larger peak memory allowed, 0.2 for 20%%")
+    args = parser.parse_args()
+
+    # Query plan reports and transform warnings would be timed with the stages
+    logging.getLogger().setLevel(logging.WARNING)
+    singer.get_logger().setLevel(logging.WARNING)
+
+    fixture = {"orders": args.orders, "line_items": args.line_items}
+    directory = args.fixtures / "{orders}x{line_items}".format(**fixture)
+    if args.record or not (directory / "orders.jsonl").exists():
+        print("Recording fixtures in {}".format(directory), file=sys.stderr)
+        # In a child process, the caches it fills would make the stages of this one faster
+        with concurrent.futures.ProcessPoolExecutor(1) as executor:
+            executor.submit(record_fixtures, directory, args.orders, args.line_items).result()
+    lines, pages = load_fixtures(directory)
+
+    results = run_stages(lines, pages, args.stages, args.repeat, args.min_time)
+
+    baseline = None
+    if args.check or (args.baseline.exists() and not args.save_baseline):
+        if not args.baseline.exists():
+            parser.error("no baseline at {}, save one with --save-baseline".format(args.baseline))
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["fixture"] != fixture:
+            parser.error("the baseline was measured on the fixture {}".format(baseline["fixture"]))
+    report(results, baseline)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({"fixture": fixture,
+                                             "python": platform.python_version(),
+                                             "stages": results}, indent=2) + "\n")
+        print("Saved the baseline to {}".format(args.baseline))
+
+    if args.check:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            # Once more for the stages that regressed, keeping their faster run
+            stages = [stage for stage in args.stages if compare({stage: results[stage]},
+                                                                baseline, args.tolerance)]
+            print("Measuring {} again".format(", ".join(stages)))
+            for stage, result in run_stages(lines, pages, stages, args.repeat,
+                                             args.min_time).items():
+                if result["records_per_second"] > results[stage]["records_per_second"]:
+                    results[stage] = result
+            report(results, baseline)
+            regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+        print("No stage regressed beyond {:.0%}".format(args.tolerance))
+
+
+if __name__ == "__main__":
+    main()
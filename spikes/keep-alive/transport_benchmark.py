@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Compares the per-request latency of the old `urlopen` based GraphQL call
+(one new connection per request) with the pooled keep-alive session in
+`tap_shopify.transport`, against a local fake GraphQL endpoint.
+
+    python spikes/keep-alive/transport_benchmark.py [requests] [delay_ms]
+
+`delay_ms` is added to every new connection accept to approximate the
+TCP + TLS handshake cost of a remote shop (defaults to 0, pure localhost).
+"""
+import json
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tap_shopify import transport
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+HANDSHAKE_DELAY = (float(sys.argv[2]) if len(sys.argv) > 2 else 0) / 1000
+
+BODY = json.dumps({
+    "data": {"locations": {"edges": [], "pageInfo": {"hasNextPage": False, "endCursor": None}}},
+    "extensions": {"cost": {"requestedQueryCost": 2, "actualQueryCost": 2}},
+}).encode("utf-8")
+
+
+class GraphQLHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        time.sleep(HANDSHAKE_DELAY)
+        # headers and body are written separately, avoid Nagle/delayed ACK stalls
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().setup()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *_args):
+        pass
+
+
+def urlopen_call(url, payload, headers):
+    req = urllib.request.Request(url, json.dumps(payload).encode("utf-8"), headers)
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return response.read().decode("utf-8")
+
+
+def pooled_call(url, payload, headers):
+    return transport.post_json(url, payload, headers, timeout=30).content.decode("utf-8")
+
+
+def measure(name, call, url):
+    payload = {"query": "{ locations(first: 250) { edges { node { id } } } }"}
+    headers = {"Accept": "application/json", "Content-Type": "application/json"}
+    call(url, payload, headers) # warm up
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        call(url, payload, headers)
+    elapsed = time.perf_counter() - start
+    per_request_ms = elapsed / REQUESTS * 1000
+    print("{:<10} {:>6} requests in {:>7.3f}s ({:.3f} ms/request)".format(
+        name, REQUESTS, elapsed, per_request_ms))
+    return per_request_ms
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GraphQLHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:{}/admin/api/2025-07/graphql.json".format(server.server_port)
+
+    try:
+        urlopen_ms = measure("urlopen", urlopen_call, url)
+        pooled_ms = measure("pooled", pooled_call, url)
+    finally:
+        server.shutdown()
+        transport.close_session()
+
+    print("Saved {:.3f} ms/request ({:.1f}%)".format(
+        urlopen_ms - pooled_ms, (urlopen_ms - pooled_ms) / urlopen_ms * 100))
+
+
+if __name__ == "__main__":
+    main()
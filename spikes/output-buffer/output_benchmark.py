@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Compares writing RECORD messages one at a time with `singer.write_message`
+against `tap_shopify.output`, buffered with simplejson and with orjson, and
+checks every writer produces the same messages.
+
+    python spikes/output-buffer/output_benchmark.py [records] > /dev/null
+
+stdout gets the messages, the timings are printed to stderr.
+"""
+import io
+import json
+import sys
+import time
+from unittest.mock import patch
+
+import singer
+from singer.messages import RecordMessage
+
+from tap_shopify import output
+from tap_shopify.context import Context
+
+RECORDS = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+
+def sample_record(index):
+    # Shaped like an inventory_levels record
+    return {"id": "gid://shopify/InventoryLevel/{}?inventory_item_id={}".format(index, index * 7),
+            "canDeactivate": index % 2 == 0,
+            "createdAt": "2025-01-10T10:20:30.000000Z",
+            "updatedAt": "2025-02-10T10:20:30.000000Z",
+            "quantities": [{"name": "available", "quantity": index % 100},
+                           {"name": "on_hand", "quantity": index % 120}],
+            "_sdc_shop_id": 1, "_sdc_shop_name": "shop"}
+
+
+def run_singer(records):
+    for record in records:
+        singer.write_message(RecordMessage(stream="inventory_levels", record=record))
+
+
+def run_output(records):
+    for record in records:
+        output.write_record("inventory_levels", record)
+    output.flush()
+
+
+def measure(name, run, records, config):
+    Context.config = config
+    captured = io.StringIO()
+    start = time.perf_counter()
+    run(records)
+    elapsed = time.perf_counter() - start
+    # The same messages once more, captured for the comparison
+    with patch("sys.stdout", captured):
+        run(records[:1000])
+    print("  {:<20} {:>7} records in {:>7.3f}s ({:.2f} us/record)".format(
+        name, len(records), elapsed, elapsed / len(records) * 1e6), file=sys.stderr)
+    return elapsed, [json.loads(line) for line in captured.getvalue().splitlines()]
+
+
+def main():
+    records = [sample_record(index) for index in range(RECORDS)]
+    unbuffered, expected = measure("singer.write_message", run_singer, records, {})
+    for name, config in (("buffered simplejson", {}),
+                         ("buffered orjson", {"output_json_encoder": "orjson"})):
+        elapsed, messages = measure(name, run_output, records, config)
+        assert messages == expected, "{} messages differ".format(name)
+        print("  {:.2f}x faster, same messages".format(unbuffered / elapsed), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+Compares singer's generic `Transformer.transform` with the compiled
+`tap_shopify.transform.RecordTransformer` on synthetic records generated from
+the tap's schemas, and checks both write byte for byte the same records.
+
+    python spikes/record-transform/transform_benchmark.py [records] [stream ...]
+
+Every stream is checked, the timings are for `orders` unless streams are named.
+"""
+import copy
+import json
+import sys
+import time
+from pathlib import Path
+
+import singer
+from singer import metadata, Transformer
+
+from tap_shopify.transform import RecordTransformer
+
+RECORDS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+TIMED_STREAMS = sys.argv[2:] or ["orders"]
+SCHEMAS = Path(__file__).resolve().parents[2] / "tap_shopify" / "schemas"
+SDC_FIELDS = {"_sdc_shop_id": 1, "_sdc_shop_name": "shop", "_sdc_shop_myshopify_domain": "shop"}
+
+
+def sample_value(schema, index):
+    """A value of `schema` shaped like the API returns it, varied with `index`."""
+    if "anyOf" in schema:
+        return sample_value(schema["anyOf"][index % len(schema["anyOf"])], index)
+    types = schema.get("type", ["string"])
+    types = types if isinstance(types, list) else [types]
+    typ = next((typ for typ in types if typ != "null"), "null")
+    if typ == "null" or (index % 7 == 0 and "null" in types):
+        return None
+    if schema.get("format") == "singer.decimal":
+        return "{}.{}0".format(index, index % 10)
+    if schema.get("format") == "date-time":
+        return "2025-0{}-1{}T10:2{}:00Z".format(index % 9 + 1, index % 10, index % 10)
+    if typ == "object":
+        return sample_object(schema.get("properties", {}), index)
+    if typ == "array":
+        return [sample_value(schema.get("items", {}), index + i) for i in range(2)]
+    if typ == "integer":
+        return index * 1000 + 7
+    if typ == "number":
+        return "{}.50".format(index)
+    if typ == "boolean":
+        return index % 2 == 0
+    return "value {}".format(index)
+
+
+def sample_object(properties, index):
+    return {key: sample_value(subschema, index + i)
+            for i, (key, subschema) in enumerate(properties.items())}
+
+
+def sample_records(schema, count):
+    records = []
+    for index in range(count):
+        record = sample_object(schema["properties"], index)
+        # A field missing from the schema, removed by both transformers
+        record["unknownField"] = index
+        records.append(record)
+    return records
+
+
+def get_metadata(schema):
+    mdata = metadata.get_standard_metadata(schema, key_properties=["id"],
+                                           valid_replication_keys=["updatedAt"],
+                                           replication_method="INCREMENTAL")
+    mdata = metadata.to_map(mdata)
+    mdata = metadata.write(mdata, (), "selected", True)
+    # One unselected field, filtered by both transformers
+    unselected = next(field for field in schema["properties"] if field != "id")
+    return metadata.write(mdata, ("properties", unselected), "selected", False)
+
+
+def run_generic(records, schema, mdata):
+    with Transformer(singer.UNIX_SECONDS_INTEGER_DATETIME_PARSING) as transformer:
+        return [json.dumps(transformer.transform({**rec, **SDC_FIELDS}, schema, mdata))
+                for rec in records]
+
+
+def run_compiled(records, schema, mdata):
+    transformer = RecordTransformer(schema, mdata, singer.UNIX_SECONDS_INTEGER_DATETIME_PARSING)
+    lines = []
+    for rec in records:
+        rec.update(SDC_FIELDS)
+        lines.append(json.dumps(transformer.transform_record(rec)))
+    return lines
+
+
+def measure(name, run, records, schema, mdata):
+    records = copy.deepcopy(records)
+    start = time.perf_counter()
+    lines = run(records, schema, mdata)
+    elapsed = time.perf_counter() - start
+    print("  {:<9} {:>6} records in {:>7.3f}s ({:.1f} us/record)".format(
+        name, len(records), elapsed, elapsed / len(records) * 1e6))
+    return elapsed, lines
+
+
+def main():
+    for path in sorted(SCHEMAS.glob("*.json")):
+        schema = json.loads(path.read_text())
+        schema["properties"].update({key: {"type": ["null", "integer" if key.endswith("id")
+                                                    else "string"]}
+                                     for key in SDC_FIELDS})
+        mdata = get_metadata(schema)
+        timed = path.stem in TIMED_STREAMS
+        records = sample_records(schema, RECORDS if timed else 50)
+
+        print(path.stem)
+        generic, generic_lines = measure("generic", run_generic, records,
+                                         copy.deepcopy(schema), mdata)
+        compiled, compiled_lines = measure("compiled", run_compiled, records,
+                                           copy.deepcopy(schema), mdata)
+        assert generic_lines == compiled_lines, "{} records differ".format(path.stem)
+        if timed:
+            print("  {:.2f}x faster, identical output".format(generic / compiled))
+
+
+if __name__ == "__main__":
+    main()
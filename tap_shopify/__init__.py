@@ -5,17 +5,23 @@ import json
 import time
 import math
 import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import pyactiveresource
 import shopify
 import singer
 from singer import utils
 from singer import metadata
-from singer import Transformer
+from singer import metrics
+from tap_shopify import output
 from tap_shopify.context import Context
 from tap_shopify.client import ShopifyClient
-from tap_shopify.exceptions import ShopifyError, ShopifyAPIError, ShopifyUnauthorizedError
+from tap_shopify.exceptions import (ShopifyError, ShopifyAPIError, ShopifyUnauthorizedError,
+                                    SyncStoppedError)
 from tap_shopify.streams.base import shopify_error_handling, get_request_timeout
+from tap_shopify.streams.order_scan import OrdersScan, get_order_scan_streams
+from tap_shopify.transform import RecordTransformer
 
 REQUIRED_CONFIG_KEYS = ["shop"]
 LOGGER = singer.get_logger()
@@ -81,6 +87,15 @@ def load_schemas():
     return schemas
 
 
+def get_nested_breadcrumbs(schema, breadcrumb):
+    """Yields the breadcrumbs of the properties nested in an object or array of objects."""
+    if 'items' in schema:
+        schema, breadcrumb = schema['items'], breadcrumb + ('items',)
+    for field_name, field_schema in schema.get('properties', {}).items():
+        field_breadcrumb = breadcrumb + ('properties', field_name)
+        yield field_breadcrumb
+        yield from get_nested_breadcrumbs(field_schema, field_breadcrumb)
+
 def get_discovery_metadata(stream, schema):
     mdata = metadata.new()
     mdata = metadata.write(mdata, (), 'table-key-properties', stream.key_properties)
@@ -98,6 +113,12 @@ def get_discovery_metadata(stream, schema):
         else:
             mdata = metadata.write(mdata, ('properties', field_name), 'inclusion', 'available')
 
+    # Nested fields can be deselected too, they are pruned from the query
+    if Context.config.get('discover_nested_fields') in (True, "true", "True"):
+        for field_name, field_schema in schema['properties'].items():
+            for breadcrumb in get_nested_breadcrumbs(field_schema, ('properties', field_name)):
+                mdata = metadata.write(mdata, breadcrumb, 'inclusion', 'available')
+
     return metadata.to_list(mdata)
 
 def add_synthetic_key_to_schema(schema):
@@ -145,70 +166,229 @@ def shuffle_streams(stream_name):
     bottom_half = Context.catalog["streams"][:matching_index]
     Context.catalog["streams"] = top_half + bottom_half
 
-# pylint: disable=too-many-locals
+def prioritize_streams(stream_names):
+    '''
+    Moves the streams that were syncing concurrently when the previous sync
+    stopped to the top of the catalog, in the order they were started
+    '''
+    first = [catalog_entry for stream_name in stream_names
+             for catalog_entry in Context.catalog["streams"]
+             if catalog_entry["tap_stream_id"] == stream_name]
+    Context.catalog["streams"] = first + [catalog_entry
+                                          for catalog_entry in Context.catalog["streams"]
+                                          if catalog_entry not in first]
+
+def get_stream_workers():
+    stream_workers = 1
+    stream_workers_from_config = Context.config.get('stream_workers')
+    if stream_workers_from_config and int(stream_workers_from_config):
+        stream_workers = int(stream_workers_from_config)
+    return stream_workers
+
+def set_currently_syncing(stream_id, syncing):
+    '''
+    Adds or removes `stream_id` from the streams in flight. `currently_sync_stream`
+    is the oldest stream in flight and `currently_sync_streams` lists all of them
+    when more than one stream syncs at a time
+    '''
+    with output.state_lock:
+        bookmarks = Context.state.setdefault('bookmarks', {})
+        in_flight = [name for name in bookmarks.get('currently_sync_streams')
+                     or [bookmarks.get('currently_sync_stream')] if name and name != stream_id]
+        if syncing:
+            in_flight.append(stream_id)
+
+        if in_flight:
+            bookmarks['currently_sync_stream'] = in_flight[0]
+        else:
+            bookmarks.pop('currently_sync_stream', None)
+        if len(in_flight) > 1:
+            bookmarks['currently_sync_streams'] = in_flight
+        else:
+            bookmarks.pop('currently_sync_streams', None)
+        output.write_state(Context.state)
+
+def write_records(stream_records, catalog_entries, sdc_fields, stop_event=None):
+    '''
+    Transforms and writes the (stream_id, record) pairs of `stream_records`.
+    Returns False when another stream failed before they were all written
+    '''
+    # some fields have epoch-time as date, hence transform into UTC date
+    transformers = {catalog_entry['tap_stream_id']: RecordTransformer(
+        catalog_entry['schema'],
+        metadata.to_map(catalog_entry['metadata']),
+        singer.UNIX_SECONDS_INTEGER_DATETIME_PARSING) for catalog_entry in catalog_entries}
+    try:
+        for stream_id, rec in stream_records:
+            if stop_event is not None and stop_event.is_set():
+                LOGGER.info('Stopping stream %s, another stream failed', stream_id)
+                return False
+            extraction_time = singer.utils.now()
+            rec.update(sdc_fields)
+            rec = transformers[stream_id].transform_record(rec)
+            output.write_record(stream_id,
+                                rec,
+                                time_extracted=extraction_time)
+            Context.counts[stream_id] += 1
+    finally:
+        for transformer in transformers.values():
+            transformer.log_warning()
+    return True
+
+def sync_stream(catalog_entry, sdc_fields, stop_event=None):
+    '''
+    Syncs the records of one selected stream. Returns True when the stream
+    requires the connection to be re-authorized
+    '''
+    stream_id = catalog_entry['tap_stream_id']
+    if stop_event is not None and stop_event.is_set():
+        return False
+    stream = Context.stream_objects[stream_id]()
+    # Bulk polls and date windows stop as soon as another stream fails
+    stream.stop_event = stop_event
+
+    LOGGER.info('Syncing stream: %s', stream_id)
+    set_currently_syncing(stream_id, True)
+
+    try:
+        if not write_records(((stream_id, rec) for rec in stream.sync()),
+                             [catalog_entry], sdc_fields, stop_event):
+            return False
+    except SyncStoppedError as exc:
+        LOGGER.info('%s', exc)
+        return False
+    except ShopifyAPIError as e:
+        if stream_id == 'fulfillment_orders' and 'Access denied' in str(e.__cause__):
+            set_currently_syncing(stream_id, False)
+            return True
+        raise e
+
+    set_currently_syncing(stream_id, False)
+    return False
+
+def sync_order_scan(catalog_entries, sdc_fields, stop_event=None):
+    '''
+    Syncs the streams derived from orders from a single scan of orders
+    '''
+    if stop_event is not None and stop_event.is_set():
+        return False
+    stream_ids = [catalog_entry['tap_stream_id'] for catalog_entry in catalog_entries]
+    scan = OrdersScan([Context.stream_objects[stream_id]() for stream_id in stream_ids])
+    scan.stop_event = stop_event
+
+    LOGGER.info('Syncing streams from a single scan of orders: %s', ', '.join(stream_ids))
+    for stream_id in stream_ids:
+        set_currently_syncing(stream_id, True)
+
+    try:
+        if not write_records(scan.sync(), catalog_entries, sdc_fields, stop_event):
+            return False
+    except SyncStoppedError as exc:
+        LOGGER.info('%s', exc)
+        return False
+
+    for stream_id in stream_ids:
+        set_currently_syncing(stream_id, False)
+    return False
+
+def get_sync_jobs(catalog_entries):
+    '''
+    Returns the (function, argument) jobs syncing the selected streams, the
+    streams sharing a scan of orders are synced by a single job
+    '''
+    scan_stream_ids = get_order_scan_streams([catalog_entry['tap_stream_id']
+                                              for catalog_entry in catalog_entries])
+    scan_entries = [catalog_entry for catalog_entry in catalog_entries
+                    if catalog_entry['tap_stream_id'] in scan_stream_ids]
+    jobs = []
+    for catalog_entry in catalog_entries:
+        if catalog_entry not in scan_entries:
+            jobs.append((sync_stream, catalog_entry))
+        elif catalog_entry is scan_entries[0]:
+            jobs.append((sync_order_scan, scan_entries))
+    return jobs
+
+def sync_streams_concurrently(jobs, sdc_fields, stream_workers):
+    '''
+    Syncs the streams in a pool of `stream_workers` threads, their messages
+    are written by a single output thread. The first error stops the other
+    streams and is raised once they stopped
+    '''
+    LOGGER.info('Syncing %d streams with %d workers', len(jobs), stream_workers)
+    stop_event = threading.Event()
+    require_reauth = False
+    output.start_writer()
+    try:
+        with ThreadPoolExecutor(stream_workers, thread_name_prefix='stream') as executor:
+            futures = [executor.submit(function, argument, sdc_fields, stop_event)
+                       for function, argument in jobs]
+            try:
+                for future in as_completed(futures):
+                    require_reauth = future.result() or require_reauth
+            except BaseException:
+                stop_event.set()
+                for future in futures:
+                    future.cancel()
+                raise
+    finally:
+        output.stop_writer()
+    return require_reauth
+
 def sync():
     shop_attributes = initialize_shopify_client()
     sdc_fields = {"_sdc_shop_" + x: shop_attributes[x] for x in SDC_KEYS}
     require_reauth = False
 
-    # If there is a currently syncing stream bookmark, shuffle the
-    # stream order so it gets sync'd first
-    currently_sync_stream_name = Context.state.get('bookmarks', {}).get('currently_sync_stream')
-    if currently_sync_stream_name:
+    # If there are currently syncing stream bookmarks, reorder the
+    # streams so they get sync'd first
+    bookmarks = Context.state.get('bookmarks', {})
+    currently_sync_stream_name = bookmarks.get('currently_sync_stream')
+    if bookmarks.get('currently_sync_streams'):
+        prioritize_streams(bookmarks['currently_sync_streams'])
+    elif currently_sync_stream_name:
         shuffle_streams(currently_sync_stream_name)
+    # The streams now run first, the next STATE message lists the ones in flight
+    with output.state_lock:
+        bookmarks.pop('currently_sync_stream', None)
+        bookmarks.pop('currently_sync_streams', None)
 
     # Emit all schemas first so we have them for child streams
     for stream in Context.catalog["streams"]:
         if Context.is_selected(stream["tap_stream_id"]):
-            singer.write_schema(stream["tap_stream_id"],
+            output.write_schema(stream["tap_stream_id"],
                                 stream["schema"],
                                 stream["key_properties"],
                                 bookmark_properties=stream["replication_key"])
             Context.counts[stream["tap_stream_id"]] = 0
 
-    # Loop over streams in catalog
+    catalog_entries = []
     for catalog_entry in Context.catalog['streams']:
-        stream_id = catalog_entry['tap_stream_id']
-        stream = Context.stream_objects[stream_id]()
-
-        if not Context.is_selected(stream_id):
-            LOGGER.info('Skipping stream: %s', stream_id)
-            continue
-
-        LOGGER.info('Syncing stream: %s', stream_id)
-
-        if not Context.state.get('bookmarks'):
-            Context.state['bookmarks'] = {}
-        Context.state['bookmarks']['currently_sync_stream'] = stream_id
-        singer.write_state(Context.state)
+        if Context.is_selected(catalog_entry['tap_stream_id']):
+            catalog_entries.append(catalog_entry)
+        else:
+            LOGGER.info('Skipping stream: %s', catalog_entry['tap_stream_id'])
 
+    jobs = get_sync_jobs(catalog_entries)
+    stream_workers = min(get_stream_workers(), len(jobs))
+    if stream_workers > 1:
+        require_reauth = sync_streams_concurrently(jobs, sdc_fields, stream_workers)
+    else:
         try:
-            # some fields have epoch-time as date, hence transform into UTC date
-            with Transformer(singer.UNIX_SECONDS_INTEGER_DATETIME_PARSING) as transformer:
-                for rec in stream.sync():
-                    extraction_time = singer.utils.now()
-                    record_schema = catalog_entry['schema']
-                    record_metadata = metadata.to_map(catalog_entry['metadata'])
-                    rec = transformer.transform({**rec, **sdc_fields},
-                                                record_schema,
-                                                record_metadata)
-                    singer.write_record(stream_id,
-                                        rec,
-                                        time_extracted=extraction_time)
-                    Context.counts[stream_id] += 1
-        except ShopifyAPIError as e:
-            if stream_id == 'fulfillment_orders' and 'Access denied' in str(e.__cause__):
-                require_reauth = True
-                continue
-            raise e
-
-        Context.state['bookmarks'].pop('currently_sync_stream')
-        singer.write_state(Context.state)
+            for function, argument in jobs:
+                require_reauth = function(argument, sdc_fields) or require_reauth
+        finally:
+            output.flush()
 
     LOGGER.info('----------------------')
     for stream_id, stream_count in Context.counts.items():
         LOGGER.info('%s: %d', stream_id, stream_count)
     LOGGER.info('----------------------')
+    for stream_id in Context.counts:
+        throttle_wait = Context.throttle.get_wait_time(stream_id)
+        LOGGER.info('%s: waited %.2f seconds for query cost throttling', stream_id, throttle_wait)
+        metrics.log(LOGGER, metrics.Point('timer', 'throttle_wait_duration',
+                                          throttle_wait, {'endpoint': stream_id}))
+    LOGGER.info('----------------------')
 
     if require_reauth:
         raise ShopifyAPIError("Required scopes are missing for the `fulfillment_orders` stream. " \
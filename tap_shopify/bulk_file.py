@@ -0,0 +1,256 @@
+import collections
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import requests
+import singer
+from tap_shopify import transport
+from tap_shopify.exceptions import BulkDownloadInterruptedError
+
+LOGGER = singer.get_logger()
+
+# Bytes read from the result file per network read
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Consecutive failed attempts without any progress before giving up
+MAX_DOWNLOAD_TRIES = 6
+
+# Exponential backoff between attempts, in seconds
+DOWNLOAD_BACKOFF_FACTOR = 2
+MAX_DOWNLOAD_BACKOFF = 120
+
+DOWNLOAD_READ_TIMEOUT = 60
+
+# Size of the byte ranges fetched in parallel into the spool file
+SPOOL_RANGE_SIZE = 64 * 1024 * 1024
+
+# Approximate size of the pieces of the spool file parsed by each worker process
+SPOOL_PARSE_SIZE = 8 * 1024 * 1024
+
+
+def get_parse_context():
+    """
+    The start method of the parsing processes. Forking copies the locks of
+    the other threads of the tap, held or not, so workers are started from a
+    fork server, or spawned where there is none.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+RETRYABLE_DOWNLOAD_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+    BulkDownloadInterruptedError,
+)
+
+
+def wait_before_retry(tries, offset, exc):
+    """Sleeps before the next download attempt, raises `exc` when out of tries."""
+    if tries >= MAX_DOWNLOAD_TRIES:
+        raise exc
+    wait = min(DOWNLOAD_BACKOFF_FACTOR ** tries, MAX_DOWNLOAD_BACKOFF)
+    LOGGER.warning("Bulk result download interrupted at byte %d (%s), "
+                   "resuming in %d seconds, attempt %d of %d",
+                   offset, exc, wait, tries + 1, MAX_DOWNLOAD_TRIES)
+    time.sleep(wait)
+
+
+def check_status(response):
+    if response.status_code == 429 or response.status_code >= 500:
+        raise BulkDownloadInterruptedError("HTTP {}".format(response.status_code))
+    response.raise_for_status()
+
+
+def parse_lines(path, start, end):
+    """
+    Parses the JSONL lines of `path` between two line boundaries, runs in a
+    worker process. Returns each record with the offset of the end of its line.
+    """
+    with open(path, "rb") as spool:
+        spool.seek(start)
+        data = spool.read(end - start)
+    records = []
+    end_offset = start
+    for line in data.split(b"\n"):
+        end_offset += len(line) + 1
+        if line.strip():
+            records.append((json.loads(line), min(end_offset, end)))
+    return records
+
+
+class BulkResultFile():
+    """
+    Streams the lines of a bulk operation JSONL result file.
+
+    `offset` is the number of bytes of the complete lines already yielded.
+    When the connection fails the download resumes from `offset` with an HTTP
+    Range request, retrying with exponential backoff, so a reset in the middle
+    of a multi-GB file neither restarts the bulk operation nor yields a line
+    twice. The partial line read before the failure is discarded and read
+    again from its first byte.
+    """
+
+    def __init__(self, url, offset=0):
+        self.url = url
+        self.offset = offset
+
+    def iter_lines(self):
+        tries = 0
+        while True:
+            start_offset = self.offset
+            try:
+                yield from self.read_lines()
+                return
+            except RETRYABLE_DOWNLOAD_ERRORS as exc:
+                # Only consecutive attempts that made no progress count
+                tries = 1 if self.offset > start_offset else tries + 1
+                wait_before_retry(tries, self.offset, exc)
+
+    def read_lines(self):
+        """Reads the file from `offset`, yielding each non empty line."""
+        headers = {"Range": "bytes={}-".format(self.offset)} if self.offset else {}
+        with transport.get_session().get(self.url, headers=headers, stream=True,
+                                         timeout=transport.get_timeout(DOWNLOAD_READ_TIMEOUT)
+                                         ) as response:
+            if response.status_code == 416:
+                # The offset is already at the end of the file
+                return
+            check_status(response)
+
+            # A server ignoring the Range header sends the whole file again
+            skip = self.offset if self.offset and response.status_code != 206 else 0
+            buffer = b""
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                if skip:
+                    skipped = min(skip, len(chunk))
+                    skip -= skipped
+                    chunk = chunk[skipped:]
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    self.offset += len(line) + 1
+                    if line.strip():
+                        yield line
+
+            # The last line may not end with a newline
+            if buffer:
+                self.offset += len(buffer)
+                if buffer.strip():
+                    yield buffer
+
+
+class SpooledBulkResultFile():
+    """
+    Downloads a bulk operation result file in parallel byte ranges into a
+    local spool file, then parses it in a process pool.
+
+    The spool is split into pieces ending at line boundaries and each worker
+    process parses whole lines only. The parsed records are returned in file
+    order, with at most `workers + 1` pieces parsed ahead of the consumer, so
+    the reassembly of nested connections across pieces is unchanged. Servers
+    that do not support Range requests are read with `BulkResultFile`.
+    """
+
+    def __init__(self, url, workers, spool_dir=None, offset=0):
+        self.url = url
+        self.workers = workers
+        self.spool_dir = spool_dir
+        self.offset = offset
+
+    def get(self, start, end):
+        return transport.get_session().get(
+            self.url, headers={"Range": "bytes={}-{}".format(start, end - 1)}, stream=True,
+            timeout=transport.get_timeout(DOWNLOAD_READ_TIMEOUT))
+
+    def get_size(self):
+        """Total size of the file, or None if the server does not serve byte ranges."""
+        with self.get(0, 1) as response:
+            check_status(response)
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if response.status_code != 206 or not total.isdigit():
+                return None
+            return int(total)
+
+    def download_range(self, path, start, end):
+        """Writes the bytes [start, end) of the file at the same position of the spool."""
+        position = start
+        tries = 0
+        while position < end:
+            start_position = position
+            try:
+                with self.get(position, end) as response, open(path, "r+b") as spool:
+                    check_status(response)
+                    if response.status_code != 206:
+                        raise BulkDownloadInterruptedError("Range request ignored")
+                    spool.seek(position)
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        chunk = chunk[:end - position]
+                        spool.write(chunk)
+                        position += len(chunk)
+                        if position >= end:
+                            break
+                    if position < end:
+                        raise BulkDownloadInterruptedError(
+                            "Range ended at byte {}".format(position))
+            except RETRYABLE_DOWNLOAD_ERRORS as exc:
+                tries = 1 if position > start_position else tries + 1
+                wait_before_retry(tries, position, exc)
+
+    @staticmethod
+    def split_lines(path, size, piece_size=SPOOL_PARSE_SIZE, offset=0):
+        """
+        Returns (start, end) pieces of about `piece_size` bytes from `offset`
+        to `size`, each ending after a newline.
+        """
+        boundaries = [offset]
+        with open(path, "rb") as spool:
+            for position in range(offset + piece_size, size, piece_size):
+                if position <= boundaries[-1]:
+                    # The previous piece ended on a line longer than piece_size
+                    continue
+                spool.seek(position - 1)
+                spool.readline()
+                if spool.tell() >= size:
+                    break
+                boundaries.append(spool.tell())
+        boundaries.append(size)
+        return list(zip(boundaries, boundaries[1:]))
+
+    def iter_records(self):
+        size = self.get_size()
+        if size is None:
+            LOGGER.info("Bulk result file does not support Range requests, "
+                        "downloading it over a single connection")
+            result_file = BulkResultFile(self.url, self.offset)
+            for line in result_file.iter_lines():
+                yield json.loads(line), result_file.offset
+            return
+
+        with tempfile.TemporaryDirectory(dir=self.spool_dir) as spool_dir:
+            path = os.path.join(spool_dir, "bulk_result.jsonl")
+            with open(path, "wb") as spool:
+                spool.truncate(size)
+
+            start_time = time.monotonic()
+            ranges = [(start, min(start + SPOOL_RANGE_SIZE, size))
+                      for start in range(self.offset, size, SPOOL_RANGE_SIZE)]
+            with ThreadPoolExecutor(self.workers) as pool:
+                for _ in pool.map(lambda byte_range: self.download_range(path, *byte_range),
+                                  ranges):
+                    pass
+            LOGGER.info("Downloaded %d bytes of bulk results in %d ranges in %.1f seconds",
+                        size - self.offset, len(ranges), time.monotonic() - start_time)
+
+            with ProcessPoolExecutor(self.workers, mp_context=get_parse_context()) as pool:
+                pending = collections.deque()
+                for start, end in self.split_lines(path, size, offset=self.offset):
+                    pending.append(pool.submit(parse_lines, path, start, end))
+                    if len(pending) > self.workers:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
@@ -5,6 +5,7 @@ import requests
 import shopify
 import singer
 from tap_shopify.streams.base import get_request_timeout
+from tap_shopify.transport import get_session
 from tap_shopify.exceptions import ShopifyError
 
 LOGGER = singer.get_logger()
@@ -48,9 +49,9 @@ class ShopifyClient:
         }
 
         LOGGER.info("Requesting new access token via client credentials grant")
-        response = requests.post(token_url, json=payload,
-                                 headers={"Accept": "application/json"},
-                                 timeout=30)
+        response = get_session().post(token_url, json=payload,
+                                      headers={"Accept": "application/json"},
+                                      timeout=30)
 
         if response.status_code != 200:
             try:
@@ -1,5 +1,7 @@
 import singer
 from singer import metadata
+from tap_shopify.query_plan import QueryPlanCache
+from tap_shopify.rate_limit import CostThrottle
 
 LOGGER = singer.get_logger()
 
@@ -11,6 +13,8 @@ class Context():
     stream_objects = {}
     counts = {}
     client = None  # ShopifyClient instance for token management
+    throttle = CostThrottle()  # GraphQL query cost bucket shared by all streams
+    query_plans = QueryPlanCache()  # Pruned stream queries shared by all streams
 
     @classmethod
     def get_catalog_entry(cls, stream_name):
@@ -42,6 +46,32 @@ class Context():
 
         return list(all_fields - selected_fields)
 
+    @classmethod
+    def get_unselected_paths(cls, stream_name):
+        """
+        The field names down to each nested field deselected in the catalog,
+        e.g. `("billingAddress", "city")` for the breadcrumb
+        `("properties", "billingAddress", "properties", "city")`.
+        """
+        stream = cls.get_catalog_entry(stream_name)
+        stream_metadata = metadata.to_map(stream['metadata'])
+
+        paths = []
+        for breadcrumb, data in stream_metadata.items():
+            if len(breadcrumb) <= 2 or data.get('inclusion') == 'automatic':
+                continue
+            if data.get('selected') is False or data.get('inclusion') == 'unsupported':
+                path, index = [], 0
+                while index < len(breadcrumb):
+                    if breadcrumb[index] == 'properties':
+                        path.append(breadcrumb[index + 1])
+                        index += 2
+                    else:
+                        # 'items' of an array
+                        index += 1
+                paths.append(tuple(path))
+        return paths
+
     @classmethod
     def get_all_fields(cls, stream_name):
         stream = cls.get_catalog_entry(stream_name)
@@ -65,3 +95,11 @@ class Context():
                         Context.config['results_per_page'],
                         default_results_per_page)
         return results_per_page
+
+    @classmethod
+    def get_bulk_streams(cls):
+        """Stream names opted into bulk operations, as a list or a comma separated string."""
+        bulk_streams = cls.config.get("bulk_streams") or []
+        if isinstance(bulk_streams, str):
+            bulk_streams = bulk_streams.split(",")
+        return {stream_name.strip() for stream_name in bulk_streams}
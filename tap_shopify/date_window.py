@@ -0,0 +1,186 @@
+from datetime import timedelta
+import singer
+from singer import utils
+
+LOGGER = singer.get_logger()
+
+# Bounds of an adaptive date window, in days
+DEFAULT_MIN_DATE_WINDOW = 1 / 24
+DEFAULT_MAX_DATE_WINDOW = 365
+
+# Records aimed for in each date window, 20 pages of 250 records
+DEFAULT_WINDOW_TARGET_RECORDS = 5000
+
+# Fraction of the target aimed for when splitting a window
+WINDOW_TARGET_HEADROOM = 0.9
+
+# Queries spent looking for gaps between the first and the last record
+MAX_PRESCAN_PROBES = 32
+
+PRESCAN_QUERY = """
+    query Prescan($query: String, $reverse: Boolean) {{
+        {root}(first: 1, query: $query, sortKey: {sort_key}, reverse: $reverse) {{
+            edges {{
+                node {{
+                    {field}
+                }}
+            }}
+        }}
+    }}
+"""
+
+
+class DateWindowSizer():
+    """
+    Sizes the date windows of a stream from the density of its records.
+
+    After each window the next one is sized to hold about `target_records` at
+    the density (records per day) just observed, at most doubling per window,
+    so quiet periods are merged into few windows. Before a window is fetched
+    `split` shrinks it when a count probe shows it holds more than
+    `target_records`, so busy periods are split into many small windows.
+    Sizes are in days, between `min_size` and `max_size`.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, stream_name, size,
+                 min_size=DEFAULT_MIN_DATE_WINDOW,
+                 max_size=DEFAULT_MAX_DATE_WINDOW,
+                 target_records=DEFAULT_WINDOW_TARGET_RECORDS):
+        self.stream_name = stream_name
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self.target_records = target_records
+        self.size = self.clamp(size)
+
+    def clamp(self, size):
+        return max(self.min_size, min(size, self.max_size))
+
+    def set_size(self, size, reason):
+        size = self.clamp(size)
+        if size != self.size:
+            LOGGER.info("Changing date window of %s from %.3f to %.3f days (%s)",
+                        self.stream_name, self.size, size, reason)
+            self.size = size
+
+    def observe(self, days, records):
+        """Sizes the next window from the `records` of a window of `days`."""
+        if days <= 0:
+            return self.size
+
+        if records:
+            size = min(self.target_records * days / records, self.size * 2)
+        else:
+            size = self.size * 2
+        self.set_size(size, "{} records in {:.3f} days".format(records, days))
+        return self.size
+
+    def split(self, days, count):
+        """
+        Returns the smaller size of a window of `days` holding `count` records,
+        or None when the window fits the target or can not get any smaller.
+        """
+        if count is None or count <= self.target_records or days <= self.min_size:
+            return None
+
+        size = days * self.target_records / count * WINDOW_TARGET_HEADROOM
+        self.set_size(min(size, days / 2), "{} records counted in {:.3f} days".format(
+            count, days))
+        return self.size
+
+
+class PopulatedRangeScanner():
+    """
+    Finds the parts of a sync range that hold records of a stream.
+
+    Each probe is a `first: 1` query of the stream's root connection sorted by
+    its replication key, returning the earliest (or, reversed, the latest)
+    record of a range. The first two probes bound the records of the whole
+    range, then the widest segment is bisected: the latest record before the
+    middle and the earliest one after it show whether the middle is a gap at
+    least `min_gap` days long. Segments are not split further once their
+    middle has no such gap, and at most MAX_PRESCAN_PROBES queries are sent.
+    Records never move back in time, so a range empty when scanned is still
+    empty when its windows would have been fetched.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        rkey = stream.camel_to_snake(stream.replication_key)
+        self.query = PRESCAN_QUERY.format(root=stream.data_key, sort_key=rkey.upper(),
+                                          field=stream.replication_key)
+        self.supported = True
+        self.probes = 0
+
+    def probe(self, start, end, reverse=False):
+        """
+        Replication value of the earliest record of [start, end), the latest
+        one with `reverse`, or None when there is none.
+        """
+        self.probes += 1
+        response = self.stream.call_query(
+            self.query,
+            {"query": self.stream.build_query_filter(start, end), "reverse": reverse})
+        if response.get("errors"):
+            LOGGER.info("Stream '%s' can not be pre-scanned, syncing its whole range: %s",
+                        self.stream.name, response["errors"])
+            self.supported = False
+            return None
+
+        edges = ((response.get("data") or {}).get(self.stream.data_key) or {}).get("edges") or []
+        if not edges:
+            return None
+        return utils.strptime_to_utc(edges[0]["node"][self.stream.replication_key])
+
+    def get_segments(self, start, end, min_gap):
+        """
+        Returns the (start, end) segments of [start, end) holding records, in
+        order, or None when the stream can not be pre-scanned. A probe still
+        failing after its retries skips the pre-scan rather than the sync.
+        """
+        try:
+            return self.scan(start, end, min_gap)
+        except Exception as exc: # pylint: disable=broad-except
+            LOGGER.warning("Pre-scan of '%s' failed, syncing its whole range: %s",
+                           self.stream.name, exc)
+            return None
+
+    def scan(self, start, end, min_gap):
+        self.probes = 0
+        earliest = self.probe(start, end)
+        if earliest is None:
+            return None if not self.supported else []
+        latest = self.probe(earliest, end, reverse=True)
+        if latest is None:
+            return None
+
+        min_gap = timedelta(days=min_gap)
+        segments, dense = [(earliest, latest)], []
+        while segments and self.probes + 2 <= MAX_PRESCAN_PROBES:
+            segments.sort(key=lambda segment: segment[1] - segment[0])
+            segment_start, segment_end = segments.pop()
+            if segment_end - segment_start <= min_gap:
+                dense.append((segment_start, segment_end))
+                continue
+
+            middle = segment_start + (segment_end - segment_start) / 2
+            before = self.probe(segment_start, middle, reverse=True)
+            after = self.probe(middle, segment_end + timedelta(seconds=1))
+            if not self.supported:
+                return None
+            # Records updated since the first probes may have left the range
+            if before is None or after is None or after - before < min_gap:
+                dense.append((segment_start, segment_end))
+            else:
+                segments += [(segment_start, before), (after, segment_end)]
+
+        segments = sorted(segments + dense)
+        # The filters exclude the end, the last segment runs to the end of the range
+        segments = [(segment_start, segment_end + timedelta(seconds=1))
+                    for segment_start, segment_end in segments[:-1]] + [(segments[-1][0], end)]
+        LOGGER.info("Pre-scan of '%s' found records in %d segments covering %.1f of %.1f days "
+                    "with %d queries", self.stream.name, len(segments),
+                    sum((segment_end - segment_start) / timedelta(days=1)
+                        for segment_start, segment_end in segments),
+                    (end - start) / timedelta(days=1), self.probes)
+        return segments
@@ -9,8 +9,26 @@ class ShopifyUnauthorizedError(Exception):
 class ShopifyAPIError(Exception):
     """Raised for any unexpected api error without a valid status code"""
 
+class SyncStoppedError(Exception):
+    """Raised in a stream synced concurrently once another stream failed"""
+
 class BulkOperationInProgressError(Exception):
     """Raised when a bulk operation is already in progress"""
     def __init__(self, message, bulk_op_id=None):
         super().__init__(message)
         self.bulk_op_id = bulk_op_id
+
+class BulkQueryNotSupportedError(Exception):
+    """Raised when a stream query can not be run as a bulk operation"""
+
+class BulkRecordClosedError(Exception):
+    """Raised when a line of a bulk result file belongs to a record already completed"""
+
+class BulkDownloadInterruptedError(Exception):
+    """Raised when the bulk result file server answers with a retryable status code"""
+
+class BulkOperationFailedError(ShopifyAPIError):
+    """Raised when a bulk operation is rejected, fails or does not complete in time"""
+    def __init__(self, message, bulk_op_id=None):
+        super().__init__(message)
+        self.bulk_op_id = bulk_op_id
@@ -0,0 +1,238 @@
+import queue
+import sys
+import threading
+import time
+import singer
+from singer.messages import RecordMessage, SchemaMessage, StateMessage, format_message
+from tap_shopify.context import Context
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LOGGER = singer.get_logger()
+
+# Messages waiting to be written before the streams producing them block
+DEFAULT_QUEUE_SIZE = 10000
+
+# Characters of serialized messages held before they are written to stdout
+DEFAULT_BUFFER_SIZE = 65536
+
+# Seconds a message is held at most before the buffer is written
+DEFAULT_FLUSH_INTERVAL = 1
+
+# Held while Context.state is changed or written so a STATE message is never
+# serialized while another stream updates its bookmark
+state_lock = threading.RLock()
+
+_WRITER = None
+_BUFFER = None
+
+
+def get_buffer_size():
+    buffer_size = DEFAULT_BUFFER_SIZE
+    buffer_size_from_config = Context.config.get('output_buffer_size')
+    if buffer_size_from_config and int(buffer_size_from_config):
+        buffer_size = int(buffer_size_from_config)
+    return buffer_size
+
+
+def get_flush_interval():
+    flush_interval = DEFAULT_FLUSH_INTERVAL
+    flush_interval_from_config = Context.config.get('output_flush_interval')
+    if flush_interval_from_config and float(flush_interval_from_config):
+        flush_interval = float(flush_interval_from_config)
+    return flush_interval
+
+
+def format_message_orjson(message):
+    try:
+        return orjson.dumps(message.asdict()).decode("utf-8") # pylint: disable=no-member
+    except TypeError:
+        # Values orjson does not serialize, such as Decimals or integers above
+        # 64 bits, are written by singer's encoder
+        return format_message(message)
+
+
+def get_encoder():
+    """The function serializing a message, singer's unless `output_json_encoder` is orjson."""
+    encoder = Context.config.get('output_json_encoder')
+    if encoder == 'orjson':
+        if orjson is not None:
+            return format_message_orjson
+        LOGGER.warning('orjson is not installed, messages are serialized with simplejson')
+    elif encoder not in (None, '', 'simplejson'):
+        LOGGER.warning('Unknown output_json_encoder %s, messages are serialized with simplejson',
+                       encoder)
+    return format_message
+
+
+class OutputBuffer(): # pylint: disable=too-many-instance-attributes
+    """
+    Serialized messages written to stdout together, `encoder` serializes
+    each message to a line.
+
+    The buffer is written and stdout flushed once it holds `buffer_size`
+    characters, once its oldest message waited `flush_interval` seconds and
+    with every STATE message, so a target never receives a STATE message
+    before the records it bookmarks. A `timed` buffer starts a timer with
+    its oldest message, so the buffer is also written while the tap sleeps
+    or waits for a response and no other message comes.
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 encoder=format_message, timed=False):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.encoder = encoder
+        self.timed = timed
+        self.lines = []
+        self.size = 0
+        self.flush_at = None
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def write(self, line, flush_buffer=False):
+        with self.lock:
+            if not self.lines:
+                self.flush_at = time.monotonic() + self.flush_interval
+                if self.timed:
+                    self.start_timer()
+            self.lines.append(line)
+            self.size += len(line)
+            if flush_buffer or self.size >= self.buffer_size or time.monotonic() >= self.flush_at:
+                self.write_lines()
+
+    def flush(self):
+        with self.lock:
+            self.write_lines()
+
+    def start_timer(self):
+        self.timer = threading.Timer(self.flush_interval, self.flush)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def write_lines(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.lines:
+            lines, self.lines, self.size = self.lines, [], 0
+            sys.stdout.write("".join(lines))
+        sys.stdout.flush()
+
+
+class OutputWriter():
+    """
+    Writes the Singer messages of streams synced concurrently from a single
+    thread.
+
+    Each message is serialized by the stream thread producing it and queued,
+    the writer thread buffers the lines and writes them to stdout in queue
+    order, an idle buffer is written after its flush interval. A stream
+    queues its records before the STATE message bookmarking them, so every
+    STATE message is written after the records it covers, whichever stream
+    wrote it. If stdout fails the remaining messages are discarded so the
+    stream threads never block, and the error is raised by `stop`.
+    """
+
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE, buffer=None):
+        self.queue = queue.Queue(queue_size)
+        self.buffer = buffer or OutputBuffer()
+        self.thread = threading.Thread(target=self.run, name="singer-output", daemon=True)
+        self.error = None
+
+    def run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=self.buffer.flush_interval)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                return
+            if self.error is not None:
+                continue
+            try:
+                if item:
+                    self.buffer.write(*item)
+                elif self.buffer.lines:
+                    self.buffer.flush()
+            except Exception as exc: # pylint: disable=broad-except
+                self.error = exc
+
+    def put(self, line, flush_buffer=False):
+        self.queue.put((line, flush_buffer))
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """Writes the queued messages, stops the thread and raises its error, if any."""
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        self.buffer.flush()
+
+
+def start_writer(queue_size=DEFAULT_QUEUE_SIZE):
+    """Routes the messages of every thread through a new OutputWriter."""
+    global _WRITER # pylint: disable=global-statement
+    flush()
+    _WRITER = OutputWriter(queue_size, OutputBuffer(get_buffer_size(), get_flush_interval(),
+                                                    get_encoder()))
+    _WRITER.start()
+
+
+def stop_writer():
+    global _WRITER # pylint: disable=global-statement
+    writer, _WRITER = _WRITER, None
+    if writer is not None:
+        writer.stop()
+
+
+def flush():
+    """Writes the messages buffered outside of an OutputWriter."""
+    global _BUFFER # pylint: disable=global-statement
+    output_buffer, _BUFFER = _BUFFER, None
+    if output_buffer is not None:
+        output_buffer.flush()
+
+
+def get_buffer():
+    """The buffer of the messages written outside of an OutputWriter."""
+    global _BUFFER # pylint: disable=global-statement
+    if _BUFFER is None:
+        _BUFFER = OutputBuffer(get_buffer_size(), get_flush_interval(), get_encoder(),
+                               timed=True)
+    return _BUFFER
+
+
+def write_message(message):
+    writer = _WRITER
+    output_buffer = writer.buffer if writer is not None else get_buffer()
+    line = output_buffer.encoder(message) + "\n"
+    # Everything written before a STATE message reaches the target with it
+    flush_buffer = isinstance(message, StateMessage)
+    if writer is not None:
+        writer.put(line, flush_buffer)
+    else:
+        output_buffer.write(line, flush_buffer)
+
+
+def write_schema(stream_name, schema, key_properties, bookmark_properties=None):
+    write_message(SchemaMessage(stream=stream_name,
+                                schema=schema,
+                                key_properties=key_properties,
+                                bookmark_properties=bookmark_properties))
+
+
+def write_record(stream_name, record, time_extracted=None):
+    write_message(RecordMessage(stream=stream_name, record=record, time_extracted=time_extracted))
+
+
+def write_state(state):
+    # The message is serialized under the lock, it is a snapshot of the state
+    with state_lock:
+        write_message(StateMessage(value=state))
@@ -0,0 +1,244 @@
+import collections
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import singer
+from graphql import parse, print_ast, visit
+from graphql.language import (REMOVE, Visitor, FieldNode, IntValueNode, OperationDefinitionNode,
+                              VariableNode)
+from tap_shopify.rate_limit import MAX_RESULTS_PER_PAGE
+
+LOGGER = singer.get_logger()
+
+# Part of the key of the queries cached on disk, bump it when prune_query
+# changes the queries it returns or the cached files change
+QUERY_PLAN_VERSION = 3
+
+# Connection fields wrapping the records of a connection, left out of field paths
+WRAPPER_FIELDS = {"edges", "node", "nodes"}
+
+# Assumed size of a scalar value in the response, for the payload estimates
+SCALAR_VALUE_BYTES = 16
+
+# A pruned query and the estimates of the full and pruned query for the report
+QueryPlan = collections.namedtuple("QueryPlan", ["query", "full_cost", "cost",
+                                                 "full_bytes", "bytes"])
+
+
+def get_variable_names(node):
+    names = set()
+
+    class VariableCollector(Visitor):
+        def enter_variable(self, variable, *_args):
+            names.add(variable.name.value)
+
+    visit(node, VariableCollector())
+    return names
+
+
+def get_field_path(node, ancestors):
+    """The names of `node` and the fields above it, without the connection wrappers."""
+    names = [ancestor.name.value for ancestor in ancestors if isinstance(ancestor, FieldNode)]
+    names.append(node.name.value)
+    return tuple(name for name in names if name not in WRAPPER_FIELDS)
+
+
+def prune_document(document, fields_to_remove, paths_to_remove=()):
+    """
+    Returns `document` without the fields named in `fields_to_remove`, at any
+    depth, and the fields at one of `paths_to_remove`, the full path from the
+    root of the query, e.g. `("orders", "billingAddress", "city")`. Fields
+    left without any subfield are removed as well, and the variable
+    definitions no remaining field uses.
+    """
+    paths_to_remove = {tuple(path) for path in paths_to_remove}
+
+    class FieldRemover(Visitor):
+        def enter_field(self, node, _key, _parent, _path, ancestors):
+            if node.name.value in fields_to_remove:
+                return REMOVE
+            if paths_to_remove and get_field_path(node, ancestors) in paths_to_remove:
+                return REMOVE
+            return None
+
+        def leave_field(self, node, *_):
+            if node.selection_set is not None and not node.selection_set.selections:
+                return REMOVE
+            return None
+
+        def leave_operation_definition(self, node, *_):
+            # Keep only variable definitions that are used
+            used_variable_names = get_variable_names(node.selection_set)
+            new_var_defs = [
+                var_def for var_def in node.variable_definitions or []
+                if var_def.variable.name.value in used_variable_names
+            ]
+            return OperationDefinitionNode(
+                operation=node.operation,
+                name=node.name,
+                variable_definitions=new_var_defs,
+                directives=node.directives,
+                selection_set=node.selection_set
+            )
+
+    return visit(document, FieldRemover())
+
+
+def prune_query(query, fields_to_remove, paths_to_remove=()):
+    return print_ast(prune_document(parse(query), fields_to_remove, paths_to_remove))
+
+
+def get_connection_size(field):
+    """The number of records a connection field requests, full pages for variables."""
+    for argument in field.arguments or ():
+        if argument.name.value in ("first", "last"):
+            if isinstance(argument.value, IntValueNode):
+                return int(argument.value.value)
+            if isinstance(argument.value, VariableNode):
+                return MAX_RESULTS_PER_PAGE
+    return None
+
+
+def get_key_bytes(field):
+    """The size of the quoted key, colon and comma of `field` in the JSON response."""
+    name = field.alias.value if field.alias else field.name.value
+    return len(name) + 4
+
+
+def estimate_selection_set(selection_set):
+    """
+    Returns the estimated query cost and response bytes of `selection_set`,
+    following the GraphQL Admin API cost rules: an object costs 1, a scalar
+    nothing, a connection 2 plus its records. A scalar value is counted as
+    `SCALAR_VALUE_BYTES` along with its key.
+    """
+    cost = size_bytes = 0
+    for selection in selection_set.selections:
+        if selection.selection_set is None:
+            size_bytes += get_key_bytes(selection) + SCALAR_VALUE_BYTES
+            continue
+        child_cost, child_bytes = estimate_selection_set(selection.selection_set)
+        if not isinstance(selection, FieldNode):
+            # Inline fragment
+            cost, size_bytes = cost + child_cost, size_bytes + child_bytes
+            continue
+        # Key and braces of the object, or brackets of the list
+        size_bytes += get_key_bytes(selection) + 2
+        if selection.name.value in WRAPPER_FIELDS:
+            # The records of the connection above, counted by it
+            cost, size_bytes = cost + child_cost, size_bytes + child_bytes
+        else:
+            size = get_connection_size(selection)
+            if size is None:
+                cost, size_bytes = cost + 1 + child_cost, size_bytes + child_bytes
+            else:
+                cost = cost + 2 + size * (1 + child_cost)
+                size_bytes += size * child_bytes
+    return cost, size_bytes
+
+
+def estimate_query(document):
+    """The estimated cost and response bytes of the full pages of a query."""
+    cost = size_bytes = 0
+    for definition in document.definitions:
+        definition_cost, definition_bytes = estimate_selection_set(definition.selection_set)
+        cost, size_bytes = cost + definition_cost, size_bytes + definition_bytes
+    return cost, size_bytes
+
+
+def plan_query(query, fields_to_remove, paths_to_remove=()):
+    """The pruned `query`, along with the estimates of both queries."""
+    document = parse(query)
+    pruned = prune_document(document, fields_to_remove, paths_to_remove)
+    full_cost, full_bytes = estimate_query(document)
+    cost, size_bytes = estimate_query(pruned)
+    return QueryPlan(print_ast(pruned), full_cost, cost, full_bytes, size_bytes)
+
+
+def get_cache_key(query, fields_to_remove, paths_to_remove=()):
+    """The hash of the query text and the removed fields naming the query in the cache directory."""
+    text = "\n".join([str(QUERY_PLAN_VERSION), query] + sorted(fields_to_remove)
+                     + sorted("/".join(path) for path in paths_to_remove))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def log_query_plan(name, plan):
+    """Reports how much the catalog selection reduced the estimated cost and payload of a query."""
+    def reduction(full, pruned):
+        return 100.0 * (full - pruned) / full if full else 0.0
+
+    LOGGER.info("Query for stream '%s' estimated at full pages: cost %d instead of %d (-%.0f%%), "
+                "%d bytes instead of %d (-%.0f%%, %d bytes saved)", name,
+                plan.cost, plan.full_cost, reduction(plan.full_cost, plan.cost),
+                plan.bytes, plan.full_bytes, reduction(plan.full_bytes, plan.bytes),
+                plan.full_bytes - plan.bytes)
+
+
+class QueryPlanCache():
+    """
+    Pruned queries by query text and sets of removed fields and paths.
+
+    Each query is parsed, pruned and printed once per run, its callers get
+    the same plan back and `report` logs the estimated reduction of its cost
+    and payload bytes once per stream. With a `directory`
+    the query plans are also kept across runs, one file per hash of the
+    query text and removed fields. A file that can not be read or written
+    only costs the pruning.
+
+    A single instance is shared by all streams (`Context.query_plans`).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.plans = {}
+        self.reported = set()
+
+    def get(self, query, fields_to_remove, paths_to_remove=(), directory=None):
+        key = (query, frozenset(fields_to_remove), frozenset(map(tuple, paths_to_remove)))
+        with self.lock:
+            plan = self.plans.get(key)
+        if plan is not None:
+            return plan
+
+        path = (os.path.join(directory, get_cache_key(*key) + ".json") if directory else None)
+        plan = self.read(path) if path else None
+        if plan is None:
+            plan = plan_query(*key)
+            if path:
+                self.write(path, plan)
+
+        with self.lock:
+            return self.plans.setdefault(key, plan)
+
+    def report(self, name, plan):
+        with self.lock:
+            if name in self.reported:
+                return
+            self.reported.add(name)
+        log_query_plan(name, plan)
+
+    @staticmethod
+    def read(path):
+        try:
+            with open(path, encoding="utf-8") as cached:
+                return QueryPlan(**json.load(cached))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as exc:
+            LOGGER.warning("Could not read the cached query %s: %s", path, exc)
+            return None
+
+    @staticmethod
+    def write(path, plan):
+        # Written under a temporary name first, a concurrent run never reads a partial plan
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory,
+                                             suffix=".tmp", delete=False) as cached:
+                json.dump(plan._asdict(), cached)
+            os.replace(cached.name, path)
+        except OSError as exc:
+            LOGGER.warning("Could not cache the query in %s: %s", directory, exc)
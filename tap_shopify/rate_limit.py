@@ -0,0 +1,154 @@
+import threading
+import time
+import singer
+
+LOGGER = singer.get_logger()
+
+# Standard plan bucket, the real values are read from the first response
+DEFAULT_MAXIMUM_AVAILABLE = 2000.0
+DEFAULT_RESTORE_RATE = 100.0
+
+# Single query cost limit of the GraphQL Admin API
+MAX_QUERY_COST = 1000
+
+# Largest `first:` accepted by the GraphQL Admin API
+MAX_RESULTS_PER_PAGE = 250
+
+# Fraction of MAX_QUERY_COST targeted when growing a page
+QUERY_COST_HEADROOM = 0.9
+
+
+class CostThrottle():
+    """
+    Client side model of the GraphQL Admin API leaky bucket.
+
+    Every GraphQL response carries `extensions.cost` with the query's
+    `requestedQueryCost` and the bucket's `throttleStatus`. The throttle keeps
+    the last observed bucket level and restore rate, estimates the cost of the
+    next query from the previous response for the same query and sleeps just
+    long enough for the bucket to refill before the request is sent.
+
+    A single instance is shared by all streams (`Context.throttle`) so
+    concurrent callers reserve their cost from the same bucket.
+    """
+
+    def __init__(self,
+                 maximum_available=DEFAULT_MAXIMUM_AVAILABLE,
+                 restore_rate=DEFAULT_RESTORE_RATE):
+        self.lock = threading.Lock()
+        self.maximum_available = maximum_available
+        self.restore_rate = restore_rate
+        self.available = maximum_available
+        self.updated_at = time.monotonic()
+        self.query_costs = {}
+        self.wait_times = {}
+
+    def restored_available(self, now):
+        """Bucket level at `now`, refilled at the restore rate up to the maximum."""
+        elapsed = max(0, now - self.updated_at)
+        return min(self.maximum_available, self.available + elapsed * self.restore_rate)
+
+    def estimate_cost(self, key):
+        """Last requested cost of the query, or the most expensive query seen so far."""
+        return self.query_costs.get(key, max(self.query_costs.values(), default=0))
+
+    def acquire(self, stream_name, key):
+        """
+        Reserves the estimated cost of the query identified by `key` and sleeps
+        until the bucket holds enough points for it. Returns the seconds waited.
+        """
+        with self.lock:
+            now = time.monotonic()
+            available = self.restored_available(now)
+            cost = min(self.estimate_cost(key), self.maximum_available)
+            wait = max(0.0, (cost - available) / self.restore_rate)
+
+            # Reserve the points now so concurrent callers queue up behind this request
+            self.available = available - cost
+            self.updated_at = now
+            self.wait_times[stream_name] = self.wait_times.get(stream_name, 0.0) + wait
+
+        if wait:
+            LOGGER.info("Throttling %s for %.2f seconds to stay within the query cost limit",
+                        stream_name, wait)
+            time.sleep(wait)
+        return wait
+
+    def update(self, key, cost):
+        """Records the `extensions.cost` of a response."""
+        if not cost:
+            return
+
+        with self.lock:
+            requested_cost = cost.get("requestedQueryCost")
+            if requested_cost is not None:
+                self.query_costs[key] = requested_cost
+
+            throttle_status = cost.get("throttleStatus")
+            if throttle_status:
+                self.maximum_available = float(throttle_status.get("maximumAvailable")
+                                               or self.maximum_available)
+                self.restore_rate = float(throttle_status.get("restoreRate")
+                                          or self.restore_rate)
+                self.available = float(throttle_status.get("currentlyAvailable",
+                                                           self.available))
+                self.updated_at = time.monotonic()
+
+    def get_wait_time(self, stream_name):
+        return self.wait_times.get(stream_name, 0.0)
+
+
+class PageSizer():
+    """
+    Tunes the `first:` page size of a stream from the observed query cost.
+
+    Shopify rejects any single query whose `requestedQueryCost` is above
+    `MAX_QUERY_COST`, and the requested cost grows with the page size. After
+    each page the size is moved toward the largest page that fits the budget
+    (at most doubling per page, nested connections grow faster than linearly),
+    and a MAX_COST_EXCEEDED error shrinks it below the size that failed.
+    """
+
+    def __init__(self, stream_name, size, max_size=MAX_RESULTS_PER_PAGE):
+        self.stream_name = stream_name
+        self.max_size = max(1, min(max_size, MAX_RESULTS_PER_PAGE))
+        self.size = max(1, min(size, self.max_size))
+
+    def set_size(self, size, reason):
+        if size != self.size:
+            LOGGER.info("Changing page size of %s from %d to %d (%s)",
+                        self.stream_name, self.size, size, reason)
+            self.size = size
+
+    def observe(self, page_size, cost):
+        """Adjusts the page size from the cost of a page requested with `first: page_size`."""
+        requested_cost = (cost or {}).get("requestedQueryCost")
+        if not page_size or not requested_cost:
+            return self.size
+
+        cost_per_record = requested_cost / page_size
+        fitting_size = int(MAX_QUERY_COST * QUERY_COST_HEADROOM / cost_per_record)
+        size = max(1, min(fitting_size, page_size * 2, self.max_size))
+        self.set_size(size, "requested cost {} actual cost {} for {} records".format(
+            requested_cost, cost.get("actualQueryCost"), page_size))
+        return self.size
+
+    def shrink(self, page_size, error):
+        """
+        Shrinks the page size after a MAX_COST_EXCEEDED `error` for `first: page_size`.
+        Returns the new size, or None when the page can not get any smaller.
+        """
+        if page_size <= 1:
+            return None
+
+        extensions = error.get("extensions") or {}
+        cost, max_cost = extensions.get("cost"), extensions.get("maxCost")
+        if cost and max_cost:
+            size = int(page_size * max_cost / cost * QUERY_COST_HEADROOM)
+        else:
+            size = page_size // 2
+
+        # Never grow back to a size known to exceed the limit
+        self.max_size = page_size - 1
+        self.set_size(max(1, min(size, self.max_size)), "query cost exceeded {}".format(cost))
+        return self.size
@@ -0,0 +1,152 @@
+import codecs
+import json
+import re
+
+# Bytes read from the socket at a time
+DEFAULT_CHUNK_SIZE = 65536
+
+# Characters read ahead of a value before it is decoded, so most values are
+# complete on the first attempt
+READ_AHEAD = 4 * DEFAULT_CHUNK_SIZE
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Stateless, shared by every reader
+DECODER = json.JSONDecoder()
+
+
+class ResponseReader():
+    """
+    Decodes a JSON response body read in chunks, yielding the items of the
+    array at `path` one by one as soon as each is complete.
+
+    For a GraphQL page `path` is `("data", <data_key>, "edges")`. Every other
+    value, such as `pageInfo`, `errors` or `extensions`, is decoded whole
+    into `response`, where the streamed array is left empty. Values after the
+    array are only known once every item was read. Only the text of the value
+    being decoded and the chunk after it are held, never the whole body, and
+    each item is decoded by the C scanner of the json module.
+    """
+
+    def __init__(self, chunks, path):
+        self.chunks = iter(chunks)
+        self.path = tuple(path)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+        self.response = {}
+
+    def __iter__(self):
+        self.skip_whitespace()
+        if self.peek() != "{":
+            # Not an object, e.g. `null`, nothing to stream
+            self.response = self.read_value()
+            return
+        yield from self.read_object(self.response, self.path)
+        self.skip_whitespace()
+        if self.peek() != "":
+            raise ValueError("Extra data after the response at position {}".format(self.pos))
+
+    def get(self, *keys):
+        """The value at `keys` of the decoded response, None if any is missing."""
+        value = self.response
+        for key in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+
+    def fill(self):
+        """Appends the next chunk to the text, returns False at the end of the body."""
+        if self.eof:
+            return False
+        # Only the text from the value being decoded on is kept
+        self.text, self.pos = self.text[self.pos:], 0
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            self.text += self.decoder.decode(b"", final=True)
+            return False
+        self.text += self.decoder.decode(chunk)
+        return True
+
+    def peek(self):
+        """The next character, or an empty string at the end of the body."""
+        while self.pos >= len(self.text):
+            if not self.fill():
+                return ""
+        return self.text[self.pos]
+
+    def skip_whitespace(self):
+        while True:
+            self.pos = WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text) or not self.fill():
+                return
+
+    def expect(self, characters):
+        self.skip_whitespace()
+        character = self.peek()
+        if character == "" or character not in characters:
+            raise ValueError("Expected one of '{}' at position {}, got '{}'".format(
+                characters, self.pos, character))
+        self.pos += 1
+        return character
+
+    def read_value(self):
+        """Decodes the complete JSON value at the current position."""
+        self.skip_whitespace()
+        while len(self.text) - self.pos < READ_AHEAD and self.fill():
+            pass
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                end = None
+            # A number or literal at the end of the text may go on in the next chunk
+            if end is not None and (end < len(self.text) or self.eof):
+                self.pos = end
+                return value
+            # Reads until the text of the value doubles, so a large value is scanned
+            # a logarithmic number of times
+            wanted = 2 * (len(self.text) - self.pos) + 1
+            while len(self.text) - self.pos < wanted and self.fill():
+                pass
+
+    def read_object(self, container, path):
+        """Decodes an object into `container`, yielding the items of the array at `path`."""
+        self.expect("{")
+        self.skip_whitespace()
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            self.skip_whitespace()
+            key = self.read_value()
+            self.expect(":")
+            self.skip_whitespace()
+            if path and key == path[0] and self.peek() == ("[" if len(path) == 1 else "{"):
+                if len(path) == 1:
+                    container[key] = []
+                    yield from self.read_array()
+                else:
+                    container[key] = {}
+                    yield from self.read_object(container[key], path[1:])
+            else:
+                # Anything else, including a null where the path goes on, is decoded whole
+                container[key] = self.read_value()
+            if self.expect(",}") == "}":
+                return
+
+    def read_array(self):
+        self.expect("[")
+        self.skip_whitespace()
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.read_value()
+            if self.expect(",]") == "]":
+                return
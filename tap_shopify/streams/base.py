@@ -1,9 +1,14 @@
 from datetime import timedelta
+import collections
 import functools
 import json
+import queue
 import re
 import socket
+import threading
+import time
 import urllib
+from concurrent.futures import ThreadPoolExecutor
 from urllib.error import URLError
 import http
 import backoff
@@ -13,10 +18,18 @@ import shopify
 import simplejson
 import singer
 from singer import metrics, utils
-from graphql import parse, print_ast, visit
-from graphql.language import Visitor, FieldNode, SelectionSetNode, OperationDefinitionNode, NameNode
 from tap_shopify.context import Context
-from tap_shopify.exceptions import ShopifyError, ShopifyAPIError, ShopifyUnauthorizedError
+from tap_shopify import output, transport
+from tap_shopify.date_window import (DateWindowSizer, PopulatedRangeScanner,
+                                     DEFAULT_MIN_DATE_WINDOW, DEFAULT_MAX_DATE_WINDOW,
+                                     DEFAULT_WINDOW_TARGET_RECORDS)
+from tap_shopify.exceptions import (ShopifyError, ShopifyAPIError, ShopifyUnauthorizedError,
+                                    BulkOperationFailedError, BulkQueryNotSupportedError,
+                                    SyncStoppedError)
+from tap_shopify.rate_limit import PageSizer
+from tap_shopify.response_reader import ResponseReader, DEFAULT_CHUNK_SIZE
+from tap_shopify.streams.bulk import (BulkOperation, DEFAULT_POLL_TIMEOUT,
+                                      SINGLE_OPERATION_POLL_TIMEOUT, COUNT_QUERY)
 
 LOGGER = singer.get_logger()
 
@@ -30,6 +43,10 @@ DEFAULT_DATE_WINDOW = 30
 # We will retry a 500 error a maximum of 5 times before giving up
 MAX_RETRIES = 5
 
+# Errors sending a streamed page or reading its body, the page is then fetched
+# again with `call_api`. A body that broke off fails to decode with a ValueError.
+STREAMED_PAGE_ERRORS = (OSError, http.client.IncompleteRead, ValueError)
+
 
 # function to return request timeout
 def get_request_timeout():
@@ -43,27 +60,105 @@ def get_request_timeout():
 
     return request_timeout
 
+def get_date_window_workers():
+    date_window_workers = 1
+    workers_from_config = Context.config.get('date_window_workers')
+    if workers_from_config and int(workers_from_config):
+        date_window_workers = int(workers_from_config)
+    return date_window_workers
+
+def get_date_window_sizer(stream_name, date_window_size):
+    """DateWindowSizer of the stream when `adaptive_date_window` is set, otherwise None."""
+    if Context.config.get('adaptive_date_window') not in (True, "true", "True"):
+        return None
+    return DateWindowSizer(
+        stream_name,
+        date_window_size,
+        min_size=float(Context.config.get('min_date_window_size') or DEFAULT_MIN_DATE_WINDOW),
+        max_size=float(Context.config.get('max_date_window_size') or DEFAULT_MAX_DATE_WINDOW),
+        target_records=int(Context.config.get('date_window_target_records')
+                           or DEFAULT_WINDOW_TARGET_RECORDS))
+
+def use_streaming_responses():
+    return Context.config.get('stream_responses') in (True, "true", "True")
+
+def use_prefetch():
+    return Context.config.get('prefetch_pages') not in (False, "false", "False")
+
+def prefetch_pages(pages, stream_name):
+    """
+    Iterates `pages` one page ahead of the consumer: the next page is fetched
+    in a background thread while the current one is transformed and emitted,
+    and no further until the consumer takes it. An error fetching a page is
+    raised where that page would have been yielded, so the bookmarks written
+    by the consumer only cover the pages it processed.
+    """
+    done = object()
+    executor = ThreadPoolExecutor(1, thread_name_prefix=stream_name + "-prefetch")
+    try:
+        future = executor.submit(next, pages, done)
+        while True:
+            page = future.result()
+            if page is done:
+                return
+            future = executor.submit(next, pages, done)
+            yield page
+    finally:
+        # Waits for the page in flight before the generator is closed
+        executor.shutdown(wait=True)
+        pages.close()
+
+def put_until_stopped(results, item, stop_event):
+    """Puts `item` on the bounded `results` queue, gives up once `stop_event` is set."""
+    while not stop_event.is_set():
+        try:
+            results.put(item, timeout=1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def get_auth_headers():
+    """
+    The access token header of the shop. ShopifyAPI keeps the session headers
+    per thread, so requests sent from prefetch, stream and date window worker
+    threads carry the token from the config instead.
+    """
+    access_token = Context.config.get("access_token") or Context.config.get("api_key")
+    return {"X-Shopify-Access-Token": access_token} if access_token else {}
+
 def execute_gql(self, query, variables=None, operation_name=None, timeout=None):
     """
-    This overrides the `execute` method from ShopifyAPI(v12.6.0) to remove the print statement
-    and also to explicitly pass the timeout value to the urlopen method.
+    This overrides the `execute` method from ShopifyAPI(v12.6.0) to remove the print statement,
+    to explicitly pass the timeout value, to send the access token from any thread and to send
+    the request over the pooled keep-alive session from `tap_shopify.transport` instead of
+    opening a new connection with urlopen.
     Ensure to check the original impl before making any changes or upgrading the SDK version,
     as this modification may affect future updates
     """
     default_headers = {"Accept": "application/json", "Content-Type": "application/json"}
-    headers = self.merge_headers(default_headers, self.headers)
+    headers = self.merge_headers(default_headers, self.headers, get_auth_headers())
     data = {"query": query, "variables": variables, "operationName": operation_name}
 
-    req = urllib.request.Request(self.endpoint, json.dumps(data).encode("utf-8"), headers)
-
-    try:
-        with urllib.request.urlopen(req, timeout=timeout) as response:
-            return response.read().decode("utf-8")
-    except urllib.error.HTTPError as http_error:
-        raise http_error
+    response = transport.post_json(self.endpoint, data, headers, timeout=timeout)
+    return response.content.decode("utf-8")
 
 shopify.GraphQL.execute  = execute_gql
 
+def execute_gql_stream(self, query, variables=None, operation_name=None, timeout=None):
+    """
+    Sends the request like `execute_gql` but yields the response body in chunks
+    as it is read from the socket instead of returning it decoded.
+    """
+    default_headers = {"Accept": "application/json", "Content-Type": "application/json"}
+    headers = self.merge_headers(default_headers, self.headers, get_auth_headers())
+    data = {"query": query, "variables": variables, "operationName": operation_name}
+
+    response = transport.post_json(self.endpoint, data, headers, timeout=timeout, stream=True)
+    return transport.iter_body(response, DEFAULT_CHUNK_SIZE)
+
+shopify.GraphQL.execute_stream = execute_gql_stream
+
 def is_not_status_code_fn(status_code):
     def gen_fn(exc):
         if getattr(exc, 'code', None) and exc.code not in status_code:
@@ -138,7 +233,7 @@ def shopify_error_handling(fnc):
         return fnc(*args, **kwargs)
     return wrapper
 
-class Stream():
+class Stream(): # pylint: disable=too-many-public-methods,too-many-instance-attributes
     # Used for bookmarking and stream identification. Is overridden by
     # subclasses to change the bookmark key.
     name = None
@@ -149,12 +244,35 @@ class Stream():
     date_window_size = None
     data_key = None
     results_per_page = None
+    # Page size of the first request, tuned from the query cost afterwards
+    initial_results_per_page = None
+    # Largest page size of the stream, whatever the query cost and the config allow
+    max_results_per_page = None
+    # Whether the stream query can be run as a bulk operation
+    bulk_supported = False
+    bulk_operation = None
+    # Whether the `<data_key>Count` query can size adaptive date windows
+    count_supported = True
+    range_scanner = None
+    # Set when streams sync concurrently, the first stream failing stops the others
+    stop_event = None
 
     def __init__(self):
-        self.results_per_page = Context.get_results_per_page(RESULTS_PER_PAGE)
+        # `results_per_page` from the config is the largest page size the stream may use
+        max_results_per_page = Context.get_results_per_page(RESULTS_PER_PAGE)
+        if self.max_results_per_page:
+            max_results_per_page = min(max_results_per_page, self.max_results_per_page)
+        self.page_sizer = PageSizer(self.name,
+                                    self.initial_results_per_page or max_results_per_page,
+                                    max_results_per_page)
+        self.results_per_page = self.page_sizer.size
         self.date_window_size = float(Context.config.get("date_window_size") or
                                       DEFAULT_DATE_WINDOW) or DEFAULT_DATE_WINDOW
 
+        self.window_sizer = get_date_window_sizer(self.name, self.date_window_size)
+        # Fetchers of the overflow pages of child connections, by connection name
+        self.child_pages = {}
+
         # set request timeout
         self.request_timeout = get_request_timeout()
 
@@ -170,6 +288,13 @@ class Stream():
         """
         return obj
 
+    def transform_page(self, edges):
+        """
+        Transforms the objects of a page, override it to work on the whole
+        page at once, e.g. to fetch the child pages of all its objects together
+        """
+        return [self.transform_object(edge.get("node")) for edge in edges]
+
     @classmethod
     def camel_to_snake(cls, name):
         """
@@ -220,50 +345,55 @@ class Stream():
         # NOTE: Bookmarking can never be updated to not get the most
         # recent thing it saw the next time you run, because the querying
         # only allows greater than or equal semantics.
-        singer.write_bookmark(
-            Context.state,
-            # name is overridden by some substreams
-            self.name,
-            bookmark_key or self.replication_key,
-            bookmark_value
-        )
-        singer.write_state(Context.state)
-
-    def remove_fields_from_query(self, fields_to_remove: list) -> str:
-        ast = parse(self.get_query())
-        used_variable_names = set()
-
-        class FieldRemover(Visitor):
-            def enter_selection_set(self, node, _key, _parent, _path, _ancestors):
-                new_selections = []
-                for selection in node.selections:
-                    if isinstance(selection, FieldNode):
-                        if selection.name.value in fields_to_remove:
-                            continue
-                        # Check field arguments for variable usage
-                        for arg in selection.arguments or []:
-                            if hasattr(arg.value, "name") and isinstance(arg.value.name, NameNode):
-                                used_variable_names.add(arg.value.name.value)
-                    new_selections.append(selection)
-                return SelectionSetNode(selections=new_selections)
-
-            def leave_operation_definition(self, node, *_):
-                # Keep only variable definitions that are used
-                new_var_defs = [
-                    var_def for var_def in node.variable_definitions or []
-                    if var_def.variable.name.value in used_variable_names
-                ]
-                return OperationDefinitionNode(
-                    operation=node.operation,
-                    name=node.name,
-                    variable_definitions=new_var_defs,
-                    directives=node.directives,
-                    selection_set=node.selection_set
-                )
+        with output.state_lock:
+            singer.write_bookmark(
+                Context.state,
+                # name is overridden by some substreams
+                self.name,
+                bookmark_key or self.replication_key,
+                bookmark_value
+            )
+            output.write_state(Context.state)
+
+    def get_record_path(self):
+        """The connection fields from the root of the query down to the records of the stream."""
+        return tuple(key for key in (self.data_key, getattr(self, "child_data_key", None)) if key)
+
+    def get_selected_query(self):
+        """The stream query without the fields and nested fields deselected in the catalog."""
+        record_path = self.get_record_path()
+        return self.remove_fields_from_query(
+            Context.get_unselected_fields(self.name),
+            [record_path + path for path in Context.get_unselected_paths(self.name)])
+
+    def remove_fields_from_query(self, fields_to_remove: list, paths_to_remove=()) -> str:
+        """
+        The stream query without `fields_to_remove` and the nested fields at
+        `paths_to_remove`, pruned once per run, or read from `query_cache_dir`
+        when configured.
+        """
+        plan = Context.query_plans.get(self.get_query(), fields_to_remove, paths_to_remove,
+                                       directory=Context.config.get('query_cache_dir'))
+        Context.query_plans.report(self.name, plan)
+        return plan.query
 
-        # Start visiting the AST and dynamically gather used variable names
-        modified_ast = visit(ast, FieldRemover())
-        return print_ast(modified_ast)
+    def shrink_page_size(self, query_params, errors):
+        """
+        Shrinks `first` in `query_params` if the request failed with MAX_COST_EXCEEDED.
+        Returns True when the request should be retried with the smaller page.
+        """
+        page_size = query_params.get("first")
+        if not page_size or not isinstance(errors, list):
+            return False
+
+        for error in errors:
+            if (error.get("extensions") or {}).get("code") == "MAX_COST_EXCEEDED":
+                new_size = self.page_sizer.shrink(page_size, error)
+                if not new_size:
+                    return False
+                self.results_per_page = query_params["first"] = new_size
+                return True
+        return False
 
     # This function can be overridden by subclasses for specialized API
     # interactions. If you override it you need to remember to decorate it
@@ -278,15 +408,29 @@ class Stream():
         try:
             query = query or self.get_query()
             data_key = data_key or self.data_key
-            LOGGER.info("Fetching %s %s", self.name, query_params)
-            response = shopify.GraphQL().execute(
-                query=query,
-                variables=query_params,
-                timeout=self.request_timeout
-            )
-            response = json.loads(response)
-            if "errors" in response.keys():
-                raise ShopifyAPIError(response["errors"])
+
+            while True:
+                page_size = query_params.get("first")
+                cost_key = (query, page_size)
+                Context.throttle.acquire(self.name, cost_key)
+                LOGGER.info("Fetching %s %s", self.name, query_params)
+                response = shopify.GraphQL().execute(
+                    query=query,
+                    variables=query_params,
+                    timeout=self.request_timeout
+                )
+                response = json.loads(response)
+                # Throttled responses also carry the cost, record it before raising
+                cost = response.get("extensions", {}).get("cost")
+                Context.throttle.update(cost_key, cost)
+                if "errors" not in response.keys():
+                    break
+                # Retry right away with a smaller page if the page was too expensive
+                if not self.shrink_page_size(query_params, response["errors"]):
+                    raise ShopifyAPIError(response["errors"])
+
+            if page_size:
+                self.results_per_page = self.page_sizer.observe(page_size, cost)
 
             data = response.get("data", {}).get(data_key, {})
             return data
@@ -296,29 +440,63 @@ class Stream():
             raise ShopifyAPIError("An error occurred with the GraphQL API.") from gql_error
 
         except urllib.error.HTTPError as http_error:
-            # Extract X-Request-ID from the error response headers
-            request_id = http_error.headers.get("X-Request-ID")
-            error_body = http_error.read().decode("utf-8") if http_error.fp else None
-            error_message = (
-                f"{http_error.reason} - {error_body}"
-                if error_body
-                else http_error.reason
-            )
-            if http_error.code == 401:
-                raise ShopifyUnauthorizedError(http_error,
-                    f"Unauthorized access - token may have expired with status {http_error.code} "
-                    f"and X-Request-ID '{request_id or 'N/A'}', Reason: {error_message}."
-                ) from http_error
-
-            raise ShopifyError(http_error,
-                f"GraphQL request failed for stream '{self.name}' with status {http_error.code} "
-                f"and X-Request-ID '{request_id or 'N/A'}', Reason: {error_message}."
-            ) from http_error
+            raise self.get_http_error(http_error) from http_error
 
         except Exception as exc:
             LOGGER.error("Unexpected error occurred.")
             raise exc
 
+    def get_http_error(self, http_error):
+        """
+        The error raised for an HTTP error response: ShopifyUnauthorizedError
+        for a 401 so the token is refreshed, otherwise ShopifyError, both
+        retried by `shopify_error_handling`.
+        """
+        # Extract X-Request-ID from the error response headers
+        request_id = http_error.headers.get("X-Request-ID")
+        error_body = http_error.read().decode("utf-8") if http_error.fp else None
+        error_message = (
+            f"{http_error.reason} - {error_body}"
+            if error_body
+            else http_error.reason
+        )
+        if http_error.code == 401:
+            return ShopifyUnauthorizedError(http_error,
+                f"Unauthorized access - token may have expired with status {http_error.code} "
+                f"and X-Request-ID '{request_id or 'N/A'}', Reason: {error_message}."
+            )
+
+        return ShopifyError(http_error,
+            f"GraphQL request failed for stream '{self.name}' with status {http_error.code} "
+            f"and X-Request-ID '{request_id or 'N/A'}', Reason: {error_message}."
+        )
+
+    # pylint: disable=E1123
+    @shopify_error_handling
+    def call_query(self, query, variables=None):
+        """
+        Returns the response of a query sent besides the stream's pages, like
+        a count, throttled and retried like `call_api`. Throttled responses
+        are retried, other GraphQL errors are left to the caller.
+        """
+        cost_key = (query, None)
+        Context.throttle.acquire(self.name, cost_key)
+        try:
+            response = json.loads(shopify.GraphQL().execute(
+                query=query,
+                variables=variables,
+                timeout=self.request_timeout
+            ))
+        except urllib.error.HTTPError as http_error:
+            raise self.get_http_error(http_error) from http_error
+
+        Context.throttle.update(cost_key, response.get("extensions", {}).get("cost"))
+        errors = response.get("errors")
+        if isinstance(errors, list) and any((error.get("extensions") or {}).get("code")
+                                            == "THROTTLED" for error in errors):
+            raise ShopifyAPIError(errors)
+        return response
+
     # pylint: disable=W0221
     def get_query_params(self, updated_at_min, updated_at_max, cursor=None):
         """
@@ -342,7 +520,247 @@ class Stream():
             params["after"] = cursor
         return params
 
-    # pylint: disable=too-many-locals
+    def build_query_filter(self, updated_at_min, updated_at_max):
+        """Returns the `query:` filter of the root connection for a date window."""
+        return self.get_query_params(updated_at_min, updated_at_max)["query"]
+
+    def use_bulk_operation(self):
+        """
+        Streams with `bulk_supported` run their query as a bulk operation when
+        they are listed in the `bulk_streams` config.
+        """
+        return self.bulk_supported and self.name in Context.get_bulk_streams()
+
+    def use_single_bulk_operation(self):
+        """
+        With `bulk_single_operation`, streams using bulk operations and the
+        default `get_objects` run one operation for the whole sync range.
+        """
+        return Context.config.get("bulk_single_operation") in (True, "true", "True")
+
+    def get_bulk_operation(self, query):
+        """
+        Returns the BulkOperation running `query` for this stream, or None when
+        the stream is paginated.
+        """
+        if self.bulk_operation is None and self.use_bulk_operation():
+            self.bulk_operation = BulkOperation(self)
+
+        if self.bulk_operation is not None:
+            try:
+                self.bulk_operation.get_builder(query)
+            except BulkQueryNotSupportedError as exc:
+                if not self.bulk_supported:
+                    raise
+                LOGGER.warning("Stream '%s' can not use a bulk operation, "
+                               "falling back to pagination: %s", self.name, exc)
+                self.bulk_supported = False
+                self.bulk_operation = None
+
+        return self.bulk_operation
+
+    def fetch_count(self, root, query_filter):
+        """
+        Number of `root` records matching `query_filter` from the `<root>Count`
+        query, or None when the connection has no count query.
+        """
+        response = self.call_query(COUNT_QUERY.format(root=root), {"query": query_filter})
+        if response.get("errors"):
+            return None
+        return ((response.get("data") or {}).get(root + "Count") or {}).get("count")
+
+    def count_objects(self, updated_at_min, updated_at_max):
+        """
+        Number of records of the date window from the `<data_key>Count` query,
+        or None when the stream has no count query.
+        """
+        if not self.count_supported:
+            return None
+        count = self.fetch_count(self.data_key,
+                                 self.build_query_filter(updated_at_min, updated_at_max))
+        if count is None:
+            LOGGER.info("Count of %s is not available, date windows of stream '%s' "
+                        "are sized from the records fetched", self.data_key, self.name)
+            self.count_supported = False
+        return count
+
+    def get_window_end(self, window_start, sync_start):
+        """
+        End of the date window starting at `window_start`, `date_window_size`
+        days later or, with `adaptive_date_window`, sized from the density of
+        the stream and split until its count fits the target.
+        """
+        if self.window_sizer is None:
+            return min(sync_start, window_start + timedelta(days=self.date_window_size))
+
+        days = self.window_sizer.size
+        while True:
+            window_end = min(sync_start, window_start + timedelta(days=days))
+            days = self.window_sizer.split((window_end - window_start) / timedelta(days=1),
+                                           self.count_objects(window_start, window_end))
+            if days is None:
+                return window_end
+
+    def get_segments(self, updated_at_min, sync_start):
+        """
+        Parts of [updated_at_min, sync_start) holding records. With
+        `skip_empty_date_windows` they are found by a pre-scan of the stream,
+        gaps shorter than a date window are not skipped.
+        """
+        if Context.config.get('skip_empty_date_windows') in (True, "true", "True"):
+            if self.range_scanner is None:
+                self.range_scanner = PopulatedRangeScanner(self)
+            if self.range_scanner.supported:
+                segments = self.range_scanner.get_segments(updated_at_min, sync_start,
+                                                           self.date_window_size)
+                if segments is not None:
+                    return segments
+        return [(updated_at_min, sync_start)]
+
+    def iter_windows(self, updated_at_min, sync_start):
+        """
+        Yields the (start, end) date windows of the populated parts of
+        [updated_at_min, sync_start). Each window is sized when the previous
+        one is consumed, so adaptive windows follow the density just observed.
+        """
+        for segment_start, segment_end in self.get_segments(updated_at_min, sync_start):
+            window_start = segment_start
+            while window_start < segment_end:
+                self.check_stopped()
+                window_end = self.get_window_end(window_start, segment_end)
+                yield window_start, window_end
+                window_start = window_end
+
+    def check_stopped(self):
+        """Raises SyncStoppedError once another stream synced concurrently failed."""
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SyncStoppedError(f"Stopping stream '{self.name}', another stream failed")
+
+    def wait(self, seconds):
+        """Sleeps `seconds`, or until another stream synced concurrently fails."""
+        if self.stop_event is None:
+            time.sleep(seconds)
+            return
+        self.stop_event.wait(seconds)
+        self.check_stopped()
+
+    def observe_window(self, window_start, window_end, records):
+        if self.window_sizer is not None:
+            self.window_sizer.observe((window_end - window_start) / timedelta(days=1), records)
+
+    def get_pages(self, query, updated_at_min, updated_at_max, prefetch=True):
+        """
+        Yields each page of the root connection for the date window, either
+        paginated through the API or reassembled from a bulk operation.
+        Paginated pages are fetched one page ahead of the consumer unless
+        `prefetch` is False or `prefetch_pages` is disabled.
+        """
+        if self.get_bulk_operation(query) is not None:
+            yield from self.bulk_operation.get_pages(
+                query, self.build_query_filter(updated_at_min, updated_at_max))
+            return
+
+        pages = self.paginate(query, updated_at_min, updated_at_max)
+        if prefetch and use_prefetch():
+            pages = prefetch_pages(pages, self.name)
+        yield from pages
+
+    def paginate(self, query, updated_at_min, updated_at_max):
+        has_next_page, cursor = True, None
+        while has_next_page:
+            self.check_stopped()
+            query_params = self.get_query_params(updated_at_min, updated_at_max, cursor)
+
+            with metrics.http_request_timer(self.name):
+                data = self.call_api(query_params, query=query)
+
+            yield data
+
+            page_info = data.get("pageInfo", {})
+            cursor, has_next_page = page_info.get("endCursor"), page_info.get("hasNextPage")
+
+    def use_streamed_pages(self, query):
+        """
+        With `stream_responses`, paginated streams that transform their pages
+        one object at a time hand each object on as soon as it is decoded from
+        the response. Streams batching the child pages of a whole page and bulk
+        operations need the complete page.
+        """
+        return (use_streaming_responses()
+                and type(self).transform_page is Stream.transform_page
+                and self.get_bulk_operation(query) is None)
+
+    def get_window_objects(self, query, updated_at_min, updated_at_max):
+        """Yields the transformed objects of the date window, page by page or streamed."""
+        if self.use_streamed_pages(query):
+            yield from self.stream_objects(query, updated_at_min, updated_at_max)
+            return
+
+        for data in self.get_pages(query, updated_at_min, updated_at_max):
+            yield from self.transform_page(data.get("edges"))
+
+    def stream_objects(self, query, updated_at_min, updated_at_max):
+        has_next_page, cursor = True, None
+        while has_next_page:
+            self.check_stopped()
+            query_params = self.get_query_params(updated_at_min, updated_at_max, cursor)
+
+            page_info = yield from self.stream_page_objects(query, query_params)
+
+            cursor, has_next_page = page_info.get("endCursor"), page_info.get("hasNextPage")
+
+    def stream_page_objects(self, query, query_params):
+        """
+        Yields the transformed objects of a page as each edge is decoded from
+        the response body and returns the pageInfo of the page.
+
+        Errors and the query cost are only known once the body was read. A
+        page with errors, e.g. MAX_COST_EXCEEDED, is fetched again with
+        `call_api` if no object was yielded yet, otherwise the errors are
+        raised. A page that failed to send or broke off is also fetched again
+        with `call_api`, which retries it, and its objects already yielded are
+        emitted a second time, targets upsert them by key.
+        """
+        page_size = query_params.get("first")
+        cost_key = (query, page_size)
+        reader, yielded = None, 0
+        try:
+            Context.throttle.acquire(self.name, cost_key)
+            LOGGER.info("Fetching %s %s", self.name, query_params)
+            with metrics.http_request_timer(self.name):
+                chunks = shopify.GraphQL().execute_stream(
+                    query=query,
+                    variables=query_params,
+                    timeout=self.request_timeout
+                )
+            reader = ResponseReader(chunks, ("data", self.data_key, "edges"))
+            for edge in reader:
+                yielded += 1
+                yield self.transform_object(edge.get("node"))
+        except STREAMED_PAGE_ERRORS as exc:
+            LOGGER.warning("Reading a page of stream '%s' failed after %d records, "
+                           "fetching it again: %s", self.name, yielded, exc)
+            reader = None
+
+        if reader is not None:
+            cost = reader.get("extensions", "cost")
+            Context.throttle.update(cost_key, cost)
+            errors = reader.get("errors")
+            if not errors:
+                if page_size:
+                    self.results_per_page = self.page_sizer.observe(page_size, cost)
+                return reader.get("data", self.data_key, "pageInfo") or {}
+            if yielded:
+                LOGGER.error("GraphQL Error: %s", errors)
+                raise ShopifyAPIError(errors)
+            # Fetches a page that was too expensive with fewer records right away
+            self.shrink_page_size(query_params, errors)
+
+        with metrics.http_request_timer(self.name):
+            data = self.call_api(query_params, query=query)
+        yield from self.transform_page(data.get("edges"))
+        return data.get("pageInfo", {})
+
     def get_objects(self):
         """
         Returns:
@@ -355,33 +773,140 @@ class Stream():
         last_updated_at = self.get_bookmark()
         current_bookmark = last_updated_at
         sync_start = utils.now().replace(microsecond=0)
-        query = self.remove_fields_from_query(Context.get_unselected_fields(self.name))
+        query = self.get_selected_query()
         LOGGER.info("GraphQL query for stream '%s': %s", self.name, ' '.join(query.split()))
 
-        while last_updated_at < sync_start:
-            date_window_end = last_updated_at + timedelta(days=self.date_window_size)
-            query_end = min(sync_start, date_window_end)
-            has_next_page, cursor = True, None
-
-            while has_next_page:
-                query_params = self.get_query_params(last_updated_at, query_end, cursor)
+        if (last_updated_at < sync_start and self.use_single_bulk_operation()
+                and self.get_bulk_operation(query) is not None):
+            try:
+                yield from self.get_objects_in_single_operation(query, last_updated_at, sync_start)
+                return
+            except BulkOperationFailedError as exc:
+                LOGGER.warning("Bulk operation for the full range of '%s' failed, "
+                               "falling back to date windows of %s days: %s",
+                               self.name, self.date_window_size, exc)
+                self.bulk_operation.cancel()
+                self.bulk_operation.poll_timeout = DEFAULT_POLL_TIMEOUT
+                last_updated_at = current_bookmark = self.get_bookmark()
+
+        if (last_updated_at < sync_start and get_date_window_workers() > 1
+                and self.get_bulk_operation(query) is None):
+            yield from self.get_objects_in_parallel_windows(query, last_updated_at, sync_start)
+            return
+
+        for last_updated_at, query_end in self.iter_windows(last_updated_at, sync_start):
+            window_records = 0
+
+            for obj in self.get_window_objects(query, last_updated_at, query_end):
+                replication_value = utils.strptime_to_utc(obj[self.replication_key])
+                current_bookmark = max(current_bookmark, replication_value)
+                window_records += 1
+                yield obj
+
+            self.observe_window(last_updated_at, query_end, window_records)
+            # Update bookmark to the latest value, but not beyond sync start time
+            max_bookmark_value = min(sync_start, current_bookmark)
+            self.update_bookmark(utils.strftime(max_bookmark_value))
 
-                with metrics.http_request_timer(self.name):
-                    data = self.call_api(query_params, query=query)
+    def get_objects_in_single_operation(self, query, updated_at_min, sync_start):
+        """
+        Yields the objects of the whole [updated_at_min, sync_start) range from
+        a single bulk operation. Shopify does not guarantee the order of the
+        records of a bulk result file, so the bookmark is only written once the
+        whole file was emitted. Until then an interrupted sync resumes from the
+        file offset saved by the bulk operation.
+        """
+        self.bulk_operation.poll_timeout = SINGLE_OPERATION_POLL_TIMEOUT
+        current_bookmark = updated_at_min
 
-                for edge in data.get("edges"):
-                    obj = self.transform_object(edge.get("node"))
-                    replication_value = utils.strptime_to_utc(obj[self.replication_key])
-                    current_bookmark = max(current_bookmark, replication_value)
-                    yield obj
+        for data in self.get_pages(query, updated_at_min, sync_start):
+            for obj in self.transform_page(data.get("edges")):
+                replication_value = utils.strptime_to_utc(obj[self.replication_key])
+                current_bookmark = max(current_bookmark, replication_value)
+                yield obj
 
-                page_info =  data.get("pageInfo")
-                cursor , has_next_page = page_info.get("endCursor"), page_info.get("hasNextPage")
+        self.bulk_operation.poll_timeout = DEFAULT_POLL_TIMEOUT
+        self.update_bookmark(utils.strftime(min(sync_start, current_bookmark)))
 
-            last_updated_at = query_end
-            # Update bookmark to the latest value, but not beyond sync start time
-            max_bookmark_value = min(sync_start, current_bookmark)
-            self.update_bookmark(utils.strftime(max_bookmark_value))
+    # pylint: disable=too-many-locals
+    def get_objects_in_parallel_windows(self, query, updated_at_min, sync_start):
+        """
+        Yields the objects of [updated_at_min, sync_start) with up to
+        `date_window_workers` date windows fetched at the same time, sharing
+        the query cost budget of the shop.
+
+        Pages are emitted as they arrive, whatever their window. The bookmark
+        is a low watermark: it only advances over the windows that completed
+        along with every window before them, to the latest replication value
+        emitted from those windows. The objects of a window still in flight
+        are at or after that bookmark, so an interrupted sync fetches them again.
+        """
+        workers = get_date_window_workers()
+        LOGGER.info("Fetching the date windows of stream '%s' with %d workers",
+                    self.name, workers)
+        windows = []
+        next_windows = self.iter_windows(updated_at_min, sync_start)
+        results = queue.Queue(workers * 2)
+        stop_event = threading.Event()
+        # Records and latest replication value emitted from each window
+        window_records = collections.Counter()
+        window_bookmarks = {}
+        completed = set()
+        watermark = 0
+        current_bookmark = updated_at_min
+
+        def fetch_window(index):
+            # Puts (index, page, None) for each page of the window, then
+            # (index, None, None) when it is complete or (index, None, error)
+            try:
+                # The queue already keeps each worker ahead of the consumer
+                for data in self.get_pages(query, *windows[index], prefetch=False):
+                    if not put_until_stopped(results, (index, data, None), stop_event):
+                        return
+                put_until_stopped(results, (index, None, None), stop_event)
+            except Exception as exc: # pylint: disable=broad-except
+                put_until_stopped(results, (index, None, exc), stop_event)
+
+        with ThreadPoolExecutor(workers, thread_name_prefix=self.name) as executor:
+            def submit_next_window():
+                window = next(next_windows, None)
+                if window is not None:
+                    windows.append(window)
+                    executor.submit(fetch_window, len(windows) - 1)
+
+            try:
+                for _ in range(workers):
+                    submit_next_window()
+
+                while watermark < len(windows):
+                    index, data, error = results.get()
+                    if error is not None:
+                        raise error
+
+                    if data is not None:
+                        for obj in self.transform_page(data.get("edges")):
+                            replication_value = utils.strptime_to_utc(obj[self.replication_key])
+                            window_bookmarks[index] = max(
+                                window_bookmarks.get(index, replication_value), replication_value)
+                            window_records[index] += 1
+                            yield obj
+                        continue
+
+                    completed.add(index)
+                    self.observe_window(*windows[index], window_records.pop(index, 0))
+                    submit_next_window()
+
+                    if watermark not in completed:
+                        continue
+                    while watermark in completed:
+                        completed.remove(watermark)
+                        current_bookmark = max(current_bookmark,
+                                               window_bookmarks.pop(watermark, current_bookmark))
+                        watermark += 1
+                    self.update_bookmark(utils.strftime(min(sync_start, current_bookmark)))
+            finally:
+                # Stops the workers when the sync fails or the generator is closed
+                stop_event.set()
 
     def sync(self):
         """
@@ -0,0 +1,905 @@
+import collections
+import json
+import re
+import threading
+import time
+import backoff
+import shopify
+import singer
+from singer import metrics
+from graphql import parse, print_ast
+from graphql.language import (FieldNode, InlineFragmentNode, SelectionSetNode, ArgumentNode,
+                              NameNode, StringValueNode, OperationDefinitionNode, OperationType,
+                              Visitor, visit)
+from tap_shopify.context import Context
+from tap_shopify import output, transport
+from tap_shopify.bulk_file import BulkResultFile, SpooledBulkResultFile
+from tap_shopify.exceptions import (ShopifyAPIError, BulkOperationInProgressError,
+                                    BulkOperationFailedError, BulkQueryNotSupportedError,
+                                    BulkRecordClosedError, SyncStoppedError)
+
+LOGGER = singer.get_logger()
+
+SHOPIFY_API_VERSION = '2025-07'
+
+# Bulk operation limits of the GraphQL Admin API
+MAX_BULK_CONNECTIONS = 5
+MAX_BULK_CONNECTION_DEPTH = 2
+
+PAGINATION_ARGUMENTS = {"first", "after", "last", "before"}
+
+# Nested connection nodes select `__typename` under this alias, the alias
+# tells which connection of the parent a JSONL child line belongs to.
+CONNECTION_MARKER = "_sdc_bulk_"
+
+# Root records kept open while waiting for their nested connection lines
+DEFAULT_MAX_OPEN_RECORDS = 100
+
+# Times the window of open records may double when a nested line comes late
+MAX_OPEN_RECORDS_DOUBLINGS = 4
+
+# Seconds between two saves of the position reached in a bulk result file
+BULK_CHECKPOINT_INTERVAL = 60
+
+# Seconds to wait for a bulk operation to complete
+DEFAULT_POLL_TIMEOUT = 82800
+
+# Seconds to wait for an operation over the whole sync range before using date windows
+SINGLE_OPERATION_POLL_TIMEOUT = 6 * 3600
+
+# A shop runs one bulk query operation at a time, streams synced concurrently
+# take turns and download their results while the next operation runs
+BULK_OPERATION_LOCK = threading.Lock()
+
+# Bounds of the interval between two polls of a running bulk operation, in seconds
+MIN_POLL_INTERVAL = 1
+MAX_POLL_INTERVAL = 60
+
+BULK_OPERATION_RUN_QUERY = """
+    mutation bulkOperationRunQuery($query: String!) {
+    bulkOperationRunQuery(query: $query) {
+        bulkOperation {
+        id
+        status
+        createdAt
+        }
+        userErrors {
+        field
+        message
+        }
+    }
+    }
+"""
+
+BULK_OPERATION_CANCEL = """
+    mutation bulkOperationCancel($id: ID!) {
+    bulkOperationCancel(id: $id) {
+        bulkOperation {
+        id
+        status
+        }
+        userErrors {
+        field
+        message
+        }
+    }
+    }
+"""
+
+COUNT_QUERY = """
+    query Count($query: String) {{
+        {root}Count(query: $query, limit: null) {{
+            count
+        }}
+    }}
+"""
+
+BULK_OPERATION_STATUS_QUERY = """
+    {{
+        node(id: "{op_id}") {{
+            ... on BulkOperation {{
+                id
+                status
+                errorCode
+                createdAt
+                completedAt
+                objectCount
+                fileSize
+                url
+            }}
+        }}
+    }}
+"""
+
+
+def get_max_open_records():
+    max_open_records = DEFAULT_MAX_OPEN_RECORDS
+    max_open_records_from_config = Context.config.get('bulk_max_open_records')
+    if max_open_records_from_config and int(max_open_records_from_config):
+        max_open_records = int(max_open_records_from_config)
+    return max_open_records
+
+
+def get_download_workers():
+    download_workers = 1
+    download_workers_from_config = Context.config.get('bulk_download_workers')
+    if download_workers_from_config and int(download_workers_from_config):
+        download_workers = int(download_workers_from_config)
+    return download_workers
+
+
+def field(name, selections=None, alias=None, arguments=None):
+    return FieldNode(alias=NameNode(value=alias) if alias else None,
+                     name=NameNode(value=name),
+                     arguments=arguments or [],
+                     directives=[],
+                     selection_set=SelectionSetNode(selections=selections)
+                     if selections is not None else None)
+
+
+def get_response_key(node):
+    return (node.alias or node.name).value
+
+
+def get_connection_style(node):
+    """Returns "edges" or "nodes" if the field is a connection, else None."""
+    if not isinstance(node, FieldNode) or not node.selection_set:
+        return None
+    for selection in node.selection_set.selections:
+        if isinstance(selection, FieldNode) and selection.name.value in ("edges", "nodes"):
+            return selection.name.value
+    return None
+
+
+def get_connection_node_selections(node, style):
+    """Returns the selections made on each node of a connection field."""
+    for selection in node.selection_set.selections:
+        if isinstance(selection, FieldNode) and selection.name.value == style:
+            if style == "nodes":
+                return selection.selection_set.selections
+            for edge_selection in selection.selection_set.selections:
+                if isinstance(edge_selection, FieldNode) and edge_selection.name.value == "node":
+                    return edge_selection.selection_set.selections
+    return []
+
+
+class BulkQueryPlan():
+    """
+    Describes where the nested connections of a bulk query live in a record.
+
+    `connections` maps the response key of each connection directly on the
+    object to its style ("edges" or "nodes") and the plan of its nodes.
+    `fields` maps nested objects (or lists of objects) that themselves contain
+    connections to their own plan.
+    """
+
+    def __init__(self):
+        self.connections = {}
+        self.fields = {}
+
+    def has_connections(self):
+        return bool(self.connections) or any(plan.has_connections()
+                                             for plan in self.fields.values())
+
+    def prepare(self, obj, register):
+        """
+        Adds an empty, fully paginated connection for each nested connection of
+        `obj`, in the shape the paginated API returns, and calls
+        `register(obj, plan)` for every object owning a connection so its JSONL
+        children can be attached.
+        """
+        if self.connections and obj.get("id"):
+            register(obj, self)
+        for key, (style, _) in self.connections.items():
+            obj[key] = {style: [], "pageInfo": {"hasNextPage": False, "endCursor": None}}
+        for key, plan in self.fields.items():
+            value = obj.get(key)
+            for item in value if isinstance(value, list) else [value]:
+                if isinstance(item, dict):
+                    plan.prepare(item, register)
+
+    def attach(self, parent, key, child, register):
+        """Appends a JSONL child line to the connection `key` of `parent`."""
+        style, plan = self.connections[key]
+        plan.prepare(child, register)
+        parent[key][style].append({"node": child} if style == "edges" else child)
+
+
+class BulkRecordAssembler():
+    """
+    Rebuilds records from the lines of a bulk operation JSONL file.
+
+    A line is either a root record or a node of a nested connection, at any
+    depth, whose `__parentId` is the id of the object owning the connection.
+    Shopify writes a child after its parent but not necessarily right after
+    it, so up to `max_open_records` root records are kept open and the oldest
+    one is completed, in file order, when a new root record does not fit.
+    Only the objects of the open records are indexed, memory is bounded by
+    the window instead of the file size. A child of a record already
+    completed raises BulkRecordClosedError, the record went out without it.
+    Without `max_open_records` every record stays open until `flush`.
+
+    `offset` is the end of the last line added, in bytes from the start of the
+    file, and each open record remembers where its line starts so the file can
+    be resumed right after the last completed record.
+
+    `replayed` lists the earlier reads of the same lines from `offset` that
+    stopped on a late line, as the number of records they completed and the
+    end of the line they stopped on. Those records are only completed again
+    when that line or a later one is theirs, the others already went out
+    complete.
+    """
+
+    def __init__(self, plan, max_open_records=DEFAULT_MAX_OPEN_RECORDS, offset=0, replayed=()):
+        self.plan = plan
+        self.max_open_records = max(1, max_open_records) if max_open_records else None
+        self.replayed = list(replayed)
+        self.open_records = collections.OrderedDict()
+        self.index = {}
+        self.root_count = 0
+        self.offset = offset
+
+    def add(self, rec, end_offset=None):
+        """Adds a parsed JSONL line ending at `end_offset` and returns the records it completed."""
+        start_offset = self.offset
+        if end_offset is not None:
+            self.offset = end_offset
+
+        parent_id = rec.pop("__parentId", None)
+        if parent_id is None:
+            return self.open(rec, start_offset)
+
+        marker = next((key for key in rec if key.startswith(CONNECTION_MARKER)), None)
+        if marker is None:
+            LOGGER.debug("Skipping JSONL line outside of the query's connections: %s", parent_id)
+            return []
+        if parent_id not in self.index:
+            raise BulkRecordClosedError(
+                "A nested connection line of {} came after its record was completed with "
+                "{} records open".format(parent_id, self.max_open_records))
+        del rec[marker]
+        parent, parent_plan, root_key = self.index[parent_id]
+        parent_plan.attach(parent, marker.split("__", 1)[1], rec, self.get_register(root_key))
+        self.open_records[root_key][3] = self.offset
+        return []
+
+    def open(self, rec, start_offset):
+        if not self.plan.has_connections():
+            return [rec]
+
+        completed = []
+        if self.max_open_records and len(self.open_records) >= self.max_open_records:
+            completed.extend(self.close_oldest())
+
+        root_key = self.root_count
+        self.root_count += 1
+        # The record, the ids it indexed, the start of its line and the end of its last line
+        self.open_records[root_key] = [rec, [], start_offset, start_offset]
+        self.plan.prepare(rec, self.get_register(root_key))
+        return completed
+
+    def get_register(self, root_key):
+        indexed_ids = self.open_records[root_key][1]
+
+        def register(obj, plan):
+            self.index[obj["id"]] = (obj, plan, root_key)
+            indexed_ids.append(obj["id"])
+        return register
+
+    def close_oldest(self):
+        """Completes the oldest open record, returns it unless it already went out complete."""
+        root_key, (rec, indexed_ids, _, last_offset) = self.open_records.popitem(last=False)
+        for obj_id in indexed_ids:
+            self.index.pop(obj_id, None)
+        # The last earlier read that completed the record had every line before it stopped
+        stopped_at = next((line_offset for completed, line_offset in reversed(self.replayed)
+                           if root_key < completed), None)
+        if stopped_at is not None and last_offset < stopped_at:
+            return []
+        return [rec]
+
+    def flush(self):
+        """Completes the records still open at the end of the file."""
+        while self.open_records:
+            yield from self.close_oldest()
+
+    def get_resume_offset(self):
+        """Offset of the first line of the oldest record not completed yet."""
+        for _, _, start_offset, _ in self.open_records.values():
+            return start_offset
+        return self.offset
+
+    def get_replayed(self):
+        """`replayed` for the next read of the lines, after this one stopped on a late line."""
+        return self.replayed + [(self.root_count - len(self.open_records), self.offset)]
+
+
+class BulkQueryBuilder():
+    """
+    Rewrites a stream's paginated GraphQL query into a bulk operation query.
+
+    Pagination arguments, `pageInfo` and variables are dropped, the `query:`
+    filter of the root connection is inlined, `nodes` connections are turned
+    into `edges { node }` and every nested connection node selects a marker
+    alias used to rebuild the records from the JSONL result file.
+    """
+
+    def __init__(self, query):
+        self.plan = BulkQueryPlan()
+        self.connection_count = 0
+        operation = parse(query).definitions[0]
+        root_fields = [selection for selection in operation.selection_set.selections
+                       if isinstance(selection, FieldNode)]
+        if len(root_fields) != 1 or not get_connection_style(root_fields[0]):
+            raise BulkQueryNotSupportedError("Bulk queries need a single root connection")
+        self.root = root_fields[0]
+        self.root_selections = self.rewrite_selections(
+            get_connection_node_selections(self.root, get_connection_style(self.root)),
+            self.plan, depth=1)
+
+        # The id of the root record is needed to attach its children
+        if self.plan.has_connections() and not self.selects_id(self.root_selections):
+            self.root_selections.append(field("id"))
+
+        used_variables = set()
+
+        class VariableCollector(Visitor):
+            def enter_variable(self, node, *_):
+                used_variables.add(node.name.value)
+
+        root_arguments = [argument for argument in self.root.arguments
+                          if argument.name.value not in PAGINATION_ARGUMENTS | {"query"}]
+        visit(field(self.root.name.value, self.root_selections, arguments=root_arguments),
+              VariableCollector())
+        if used_variables:
+            raise BulkQueryNotSupportedError(
+                "Bulk queries can not use variables: {}".format(sorted(used_variables)))
+
+    @staticmethod
+    def selects_id(selections):
+        return any(isinstance(selection, FieldNode) and selection.name.value == "id"
+                   and not selection.alias for selection in selections)
+
+    def rewrite_selections(self, selections, plan, depth):
+        new_selections = []
+        for selection in selections:
+            if isinstance(selection, InlineFragmentNode):
+                new_selections.append(InlineFragmentNode(
+                    type_condition=selection.type_condition,
+                    directives=selection.directives,
+                    selection_set=SelectionSetNode(selections=self.rewrite_selections(
+                        selection.selection_set.selections, plan, depth))))
+            elif not isinstance(selection, FieldNode):
+                raise BulkQueryNotSupportedError(
+                    "Unsupported selection in bulk query: {}".format(selection.kind))
+            elif selection.selection_set is None:
+                new_selections.append(selection)
+            elif get_connection_style(selection):
+                new_selections.append(self.rewrite_connection(selection, plan, depth + 1))
+            else:
+                child_plan = BulkQueryPlan()
+                child_selections = self.rewrite_selections(selection.selection_set.selections,
+                                                           child_plan, depth)
+                if child_plan.has_connections():
+                    plan.fields[get_response_key(selection)] = child_plan
+                    # The id of the object is needed to attach its children
+                    if not self.selects_id(child_selections):
+                        child_selections.append(field("id"))
+                new_selections.append(field(
+                    selection.name.value,
+                    child_selections,
+                    alias=selection.alias.value if selection.alias else None,
+                    arguments=selection.arguments))
+        return new_selections
+
+    def rewrite_connection(self, node, plan, depth):
+        self.connection_count += 1
+        if self.connection_count >= MAX_BULK_CONNECTIONS:
+            raise BulkQueryNotSupportedError(
+                "Bulk queries are limited to {} connections".format(MAX_BULK_CONNECTIONS))
+        if depth > MAX_BULK_CONNECTION_DEPTH:
+            raise BulkQueryNotSupportedError(
+                "Bulk queries are limited to {} levels of connections".format(
+                    MAX_BULK_CONNECTION_DEPTH))
+
+        style = get_connection_style(node)
+        key = get_response_key(node)
+        child_plan = BulkQueryPlan()
+        plan.connections[key] = (style, child_plan)
+
+        node_selections = self.rewrite_selections(
+            get_connection_node_selections(node, style), child_plan, depth)
+        node_selections.append(field("__typename",
+                                     alias="{}{}__{}".format(CONNECTION_MARKER, style, key)))
+        return field(node.name.value,
+                     [field("edges", [field("node", node_selections)])],
+                     alias=node.alias.value if node.alias else None,
+                     arguments=[argument for argument in node.arguments
+                                if argument.name.value not in PAGINATION_ARGUMENTS])
+
+    def build(self, query_filter):
+        """Returns the bulk query string for the given `query:` filter."""
+        arguments = [argument for argument in self.root.arguments
+                     if argument.name.value not in PAGINATION_ARGUMENTS | {"query"}]
+        arguments.append(ArgumentNode(name=NameNode(value="query"),
+                                      value=StringValueNode(value=query_filter)))
+        root = field(self.root.name.value,
+                     [field("edges", [field("node", self.root_selections)])],
+                     alias=self.root.alias.value if self.root.alias else None,
+                     arguments=arguments)
+        return print_ast(OperationDefinitionNode(operation=OperationType.QUERY,
+                                                 variable_definitions=[],
+                                                 directives=[],
+                                                 selection_set=SelectionSetNode(
+                                                     selections=[root])))
+
+
+class BulkOperationProgress():
+    """
+    Follows the `objectCount` of a running bulk operation to log its progress
+    and choose when to poll it next.
+
+    Polling starts every MIN_POLL_INTERVAL seconds so small operations are
+    picked up as soon as they complete. When the number of objects the
+    operation will write is known, the next poll is scheduled halfway to the
+    completion estimated from the rate `objectCount` grows at. Otherwise the
+    interval grows by half while objects are being counted and doubles while
+    the count is stalled, up to MAX_POLL_INTERVAL.
+    """
+
+    def __init__(self, stream_name, bulk_op_id, expected_count=None):
+        self.tags = {"endpoint": stream_name, "bulk_operation_id": bulk_op_id}
+        self.expected_count = expected_count
+        self.started_at = time.monotonic()
+        self.interval = MIN_POLL_INTERVAL
+        self.object_count = 0
+        self.rate = None
+
+    def get_eta(self):
+        """Estimated seconds until the operation completes, or None if unknown."""
+        if not self.expected_count or not self.rate:
+            return None
+        return max(0.0, (self.expected_count - self.object_count) / self.rate)
+
+    def update(self, object_count):
+        """Records the `objectCount` of a poll and returns the seconds to wait before the next."""
+        elapsed = time.monotonic() - self.started_at
+        previous_count, self.object_count = self.object_count, object_count
+        if object_count and elapsed > 0:
+            self.rate = object_count / elapsed
+
+        eta = self.get_eta()
+        if eta is not None:
+            self.interval = eta / 2
+        elif object_count > previous_count:
+            self.interval *= 1.5
+        else:
+            self.interval *= 2
+        self.interval = min(max(self.interval, MIN_POLL_INTERVAL), MAX_POLL_INTERVAL)
+
+        if object_count > previous_count:
+            LOGGER.info("Bulk operation %s of %s: %d objects counted (%.0f/s), "
+                        "estimated time remaining %s",
+                        self.tags["bulk_operation_id"], self.tags["endpoint"], object_count,
+                        self.rate or 0, "{:.0f}s".format(eta) if eta is not None else "unknown")
+            metrics.log(LOGGER, metrics.Point("counter", "bulk_operation_object_count",
+                                              object_count, self.tags))
+            if eta is not None:
+                metrics.log(LOGGER, metrics.Point("timer", "bulk_operation_eta", eta, self.tags))
+        return self.interval
+
+    def complete(self, op):
+        """Reports the duration, object count and file size of the completed operation."""
+        duration = time.monotonic() - self.started_at
+        metrics.log(LOGGER, metrics.Point("timer", "bulk_operation_duration", duration, self.tags))
+        metrics.log(LOGGER, metrics.Point("counter", "bulk_operation_object_count",
+                                          int(op.get("objectCount") or 0), self.tags))
+        metrics.log(LOGGER, metrics.Point("counter", "bulk_operation_file_size",
+                                          int(op.get("fileSize") or 0), self.tags))
+
+
+class BulkOperation():
+    """
+    Runs a stream's query as a bulk operation for one date window and yields
+    the reassembled records in the same shape as the paginated API pages.
+
+    The bulk operation id is saved in the state under
+    `bookmarks.<stream>.bulk_operation` so an interrupted sync resumes polling
+    the running operation instead of submitting a new one.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.builders = {}
+        self.resume_checked = False
+        self.poll_timeout = DEFAULT_POLL_TIMEOUT
+        self.object_count = None
+        # Learnt from completed operations to estimate the objectCount of the next ones
+        self.objects_per_record = None
+        self.count_supported = True
+
+    def get_builder(self, query):
+        """Returns the (cached) bulk query builder, raises BulkQueryNotSupportedError."""
+        if query not in self.builders:
+            self.builders[query] = BulkQueryBuilder(query)
+        return self.builders[query]
+
+    def get_state(self):
+        return Context.state.get("bookmarks", {}).get(self.stream.name, {}).get("bulk_operation")
+
+    def save_state(self, bulk_op_metadata):
+        with output.state_lock:
+            stream_bookmark = Context.state.setdefault("bookmarks", {}).setdefault(
+                self.stream.name, {})
+            stream_bookmark["bulk_operation"] = bulk_op_metadata
+            output.write_state(Context.state)
+
+    def save_checkpoint(self, file_offset, records_emitted):
+        """Saves how far the result file of the current bulk operation has been emitted."""
+        bulk_op_metadata = dict(self.get_state() or {})
+        bulk_op_metadata.update({"file_offset": file_offset, "records_emitted": records_emitted})
+        self.save_state(bulk_op_metadata)
+
+    def clear_state(self):
+        with output.state_lock:
+            stream_bookmark = Context.state.get("bookmarks", {}).get(self.stream.name, {})
+            if "bulk_operation" in stream_bookmark:
+                del stream_bookmark["bulk_operation"]
+                output.write_state(Context.state)
+
+    @staticmethod
+    def post(operation):
+        # The same endpoint as shopify.GraphQL, built from the session settings
+        url = shopify.Session(Context.config.get('shop'), SHOPIFY_API_VERSION).site \
+            + "/graphql.json"
+        headers = {
+            "Content-Type": "application/json",
+            "X-Shopify-Access-Token": (
+                Context.config.get("access_token")
+                or Context.config.get("api_key")
+            ),
+        }
+        response = transport.get_session().post(url, headers=headers, json=operation,
+                                                timeout=transport.get_timeout(300))
+        LOGGER.info("X-request-ID for the bulk operation: %s", response.headers.get("X-Request-ID"))
+
+        return response.json()
+
+    def submit(self, query_string):
+        return self.post({
+            "query": BULK_OPERATION_RUN_QUERY,
+            "variables": {
+                "query": query_string
+            }
+        })
+
+    def cancel(self):
+        """Cancels the operation saved in the state, if it is still running, and clears it."""
+        bulk_op = self.get_state() or {}
+        if bulk_op.get("status") == "RUNNING" and bulk_op.get("bulk_operation_id"):
+            LOGGER.info("Cancelling bulk operation %s", bulk_op["bulk_operation_id"])
+            response = self.post({"query": BULK_OPERATION_CANCEL,
+                                  "variables": {"id": bulk_op["bulk_operation_id"]}})
+            user_errors = ((response.get("data") or {}).get("bulkOperationCancel") or {}
+                           ).get("userErrors")
+            if user_errors:
+                LOGGER.warning("Could not cancel bulk operation %s: %s",
+                               bulk_op["bulk_operation_id"], user_errors)
+        self.clear_state()
+
+    # pylint: disable=E1123
+    def fetch(self, op_id):
+        response = json.loads(shopify.GraphQL().execute(
+            query=BULK_OPERATION_STATUS_QUERY.format(op_id=op_id),
+            timeout=self.stream.request_timeout))
+        if not isinstance(response, dict):
+            raise ShopifyAPIError(f"Unexpected GraphQL response: {response}")
+        return response.get("data", {}).get("node")
+
+    def count(self, builder, query_filter):
+        """
+        Number of root records matching `query_filter` from the `<root>Count`
+        query of the root connection, or None when it is not available.
+        """
+        if not self.count_supported:
+            return None
+        root = builder.root.name.value
+        count = self.stream.fetch_count(root, query_filter)
+        if count is None:
+            LOGGER.info("Count of %s is not available, bulk operation progress "
+                        "will be logged without an estimated time remaining", root)
+            self.count_supported = False
+            return None
+        return count
+
+    def estimate_object_count(self, builder, query_filter):
+        """
+        Estimates the objectCount of the bulk operation for `query_filter`: its
+        records plus their nested connection nodes, in the proportion seen in
+        the previous operations of the stream.
+        """
+        objects_per_record = self.objects_per_record
+        if objects_per_record is None and not builder.plan.has_connections():
+            objects_per_record = 1
+        if objects_per_record is None:
+            return None
+        count = self.count(builder, query_filter)
+        return int(count * objects_per_record) if count is not None else None
+
+    def poll(self, bulk_op_id, timeout=None, expected_count=None):
+        """
+        Waits for the bulk operation to finish and returns its result file url.
+        `expected_count` is the estimated objectCount of the completed operation.
+        """
+        timeout = timeout or self.poll_timeout
+        start = time.time()
+        last_status = None
+        progress = BulkOperationProgress(self.stream.name, bulk_op_id, expected_count)
+
+        while time.time() - start < timeout:
+            op = self.fetch(bulk_op_id)
+
+            if not op:
+                LOGGER.warning("Bulk operation not found: %s", bulk_op_id)
+                return None
+            if not isinstance(op, dict):
+                raise ShopifyAPIError(f"Unexpected bulk operation format: {op}")
+
+            current_status = op.get("status")
+
+            if current_status != last_status:
+                LOGGER.info(
+                    "Bulk operation - %s, status: %s, created at - %s, completed at - %s",
+                    op.get("id"),
+                    current_status,
+                    op.get("createdAt"),
+                    op.get("completedAt") or "N/A"
+                )
+                last_status = current_status
+
+            if current_status == "COMPLETED":
+                LOGGER.info("Bulk operation completed. File size: %s bytes", op.get("fileSize"))
+                progress.complete(op)
+                self.object_count = int(op.get("objectCount") or 0)
+                self.save_state({
+                    "bulk_operation_id": op.get("id"),
+                    "status": current_status,
+                    "created_at": op.get("createdAt"),
+                    "last_date_window": self.stream.date_window_size,
+                })
+                return op.get("url")
+
+            if current_status in ["FAILED", "CANCELED"]:
+                self.clear_state()
+                raise BulkOperationFailedError(f"Bulk operation failed: {op.get('errorCode')}",
+                                               bulk_op_id=op.get("id"))
+
+            try:
+                self.stream.wait(progress.update(int(op.get("objectCount") or 0)))
+            except SyncStoppedError:
+                self.save_running_state(op)
+                raise
+
+        self.save_running_state(op)
+
+        elapsed = int(time.time() - start)
+        raise BulkOperationFailedError(
+            f"Bulk operation id - {op.get('id') or 'UNKNOWN'} did not complete "
+            f"within {elapsed} seconds. "
+            "Please contact Shopify support with the operation ID for assistance.",
+            bulk_op_id=op.get("id")
+        )
+
+    def save_running_state(self, op):
+        """Saves the operation still running so the next sync resumes polling it."""
+        self.save_state({
+            "bulk_operation_id": op.get("id"),
+            "status": op.get("status"),
+            "created_at": op.get("createdAt"),
+            "last_date_window": self.stream.date_window_size,
+        })
+
+    def resume(self):
+        """Returns the result url of the operation left running by a previous sync, if any."""
+        bulk_op = self.get_state()
+        if not bulk_op:
+            return None
+
+        if bulk_op.get("last_date_window") != self.stream.date_window_size:
+            LOGGER.info(
+                "Clearing existing bulk operation state due to date "
+                "window size change from %s to %s",
+                bulk_op.get("last_date_window"),
+                self.stream.date_window_size
+            )
+            self.clear_state()
+            return None
+
+        if bulk_op.get("status") in ["RUNNING", "COMPLETED"]:
+            op_id = bulk_op.get("bulk_operation_id")
+            LOGGER.info("Resuming polling for existing bulk operation ID: %s", op_id)
+            return self.poll(op_id)
+
+        self.clear_state()
+        return None
+
+    @backoff.on_exception(
+        backoff.expo,
+        BulkOperationInProgressError,
+        max_tries=7,
+        factor=10,
+        jitter=None,
+        on_backoff=lambda details: LOGGER.warning(
+            "Bulk operation already in progress (ID: %s). "
+            "Retry attempt %d after %.2f seconds. Total elapsed: %.2f seconds.",
+            getattr(details['exception'], 'bulk_op_id', 'UNKNOWN'),
+            details['tries'],
+            details['wait'],
+            details['elapsed']
+        )
+    )
+    def submit_and_poll(self, query, expected_count=None):
+        """Submit bulk query and poll for completion with automatic retry on conflicts"""
+        # The lock may have been released by a stream that stopped after another one failed
+        self.stream.check_stopped()
+        with metrics.http_request_timer(self.stream.name):
+            bulk_op_data = self.submit(query)
+
+            user_errors = (
+                bulk_op_data.get("data", {})
+                .get("bulkOperationRunQuery", {})
+                .get("userErrors")
+            )
+
+            if user_errors:
+                for error in user_errors:
+                    message = error.get("message", "")
+                    if (
+                        "bulk query operation for this app and shop is already in progress"
+                        in message
+                        ):
+                        # Extract BulkOperation ID using regex
+                        match = re.search(r"gid://shopify/BulkOperation/\d+", message)
+                        bulk_op_id = match.group(0) if match else None
+
+                        LOGGER.info("Detected concurrent bulk operation (ID: %s)", bulk_op_id)
+                        raise BulkOperationInProgressError(
+                            f"Bulk operation already in progress: {bulk_op_id}",
+                            bulk_op_id=bulk_op_id
+                        )
+
+                # Handle other user errors
+                raise BulkOperationFailedError("Bulk query error: {}".format(user_errors))
+
+            bulk_operation = (
+                bulk_op_data.get("data", {})
+                .get("bulkOperationRunQuery", {})
+                .get("bulkOperation")
+            )
+            bulk_op_id = bulk_operation.get("id") if bulk_operation else None
+            if not bulk_op_id:
+                raise ShopifyAPIError("Invalid bulk operation response: {}".format(bulk_op_data))
+
+            return self.poll(bulk_op_id, expected_count=expected_count)
+
+    @staticmethod
+    def iter_lines(url, offset=0):
+        """Yields each line of the result file from `offset` with the offset of its end."""
+        result_file = BulkResultFile(url, offset)
+        for line in result_file.iter_lines():
+            yield line, result_file.offset
+
+    def iter_records(self, url, offset=0):
+        """
+        Yields the parsed lines of the result file from `offset` with the offset
+        of their end, downloaded in parallel and parsed in a process pool when
+        `bulk_download_workers` is above 1.
+        """
+        download_workers = get_download_workers()
+        if download_workers > 1:
+            yield from SpooledBulkResultFile(url, download_workers,
+                                             Context.config.get("bulk_spool_dir"),
+                                             offset).iter_records()
+            return
+
+        for line, end_offset in self.iter_lines(url, offset):
+            yield json.loads(line), end_offset
+
+    def parse_jsonl(self, url, plan, offset=0):
+        """
+        Streams the JSONL result file from `offset` and yields one root record
+        at a time with its nested connections rebuilt from the `__parentId` of
+        the child lines, along with the offset to resume from once the record
+        has been emitted.
+
+        A nested line coming after its record was completed makes the lines
+        from `offset` read again with twice as many records open, and only the
+        records that missed lines emitted again, complete. Targets keep the
+        last version of a record. After MAX_OPEN_RECORDS_DOUBLINGS the error
+        is raised.
+        """
+        max_open_records = get_max_open_records()
+        replayed = []
+        for doublings in range(MAX_OPEN_RECORDS_DOUBLINGS + 1):
+            assembler = BulkRecordAssembler(plan, max_open_records, offset, replayed)
+            try:
+                yield from self.assemble(url, assembler)
+                return
+            except BulkRecordClosedError as exc:
+                if doublings == MAX_OPEN_RECORDS_DOUBLINGS:
+                    raise BulkRecordClosedError(
+                        "{}. The bulk result file of {} still had late lines with {} records "
+                        "open, raise `bulk_max_open_records`".format(
+                            exc, self.stream.name, max_open_records)) from exc
+                replayed = assembler.get_replayed()
+                max_open_records *= 2
+                LOGGER.warning("%s. Reading the result file of %s again from offset %d with %d "
+                               "records open", exc, self.stream.name, offset, max_open_records)
+
+    def assemble(self, url, assembler):
+        for rec, end_offset in self.iter_records(url, assembler.offset):
+            if not isinstance(rec, dict):
+                LOGGER.warning("Skipping unexpected JSONL line (not a dict): %s", rec)
+                assembler.offset = end_offset
+                continue
+            for completed in assembler.add(rec, end_offset):
+                yield completed, assembler.get_resume_offset()
+
+        for completed in assembler.flush():
+            yield completed, assembler.get_resume_offset()
+
+    def get_pages(self, query, query_filter):
+        """
+        Runs `query` filtered by `query_filter` as a bulk operation and yields
+        the records in pages shaped like the paginated API responses.
+
+        The offset in the result file after the last emitted page is saved in
+        the bulk operation state every BULK_CHECKPOINT_INTERVAL seconds, a
+        resumed sync continues from there instead of emitting the file again.
+        """
+        builder = self.get_builder(query)
+
+        existing_url = None
+        checkpoint = {}
+        if not self.resume_checked:
+            self.resume_checked = True
+            checkpoint = self.get_state() or {}
+            with BULK_OPERATION_LOCK:
+                existing_url = self.resume()
+
+        file_offset = records_emitted = 0
+        if existing_url and checkpoint.get("file_offset"):
+            file_offset = checkpoint["file_offset"]
+            records_emitted = checkpoint.get("records_emitted", 0)
+            LOGGER.info("Resuming the bulk result file of %s at byte %d, "
+                        "%d records were already emitted",
+                        self.stream.name, file_offset, records_emitted)
+
+        if not existing_url:
+            bulk_query = builder.build(query_filter)
+            LOGGER.info("Fetching records in date range: %s", query_filter)
+            expected_count = self.estimate_object_count(builder, query_filter)
+            with BULK_OPERATION_LOCK:
+                existing_url = self.submit_and_poll(bulk_query, expected_count)
+
+        if existing_url:
+            edges = []
+            checkpointed_at = time.monotonic()
+            for rec, resume_offset in self.parse_jsonl(existing_url, builder.plan, file_offset):
+                edges.append({"node": rec})
+                if len(edges) >= self.stream.results_per_page:
+                    yield {"edges": edges, "pageInfo": {"hasNextPage": True, "endCursor": None}}
+                    # The stream has emitted every record of the page by now
+                    records_emitted += len(edges)
+                    edges = []
+                    if time.monotonic() - checkpointed_at >= BULK_CHECKPOINT_INTERVAL:
+                        self.save_checkpoint(resume_offset, records_emitted)
+                        checkpointed_at = time.monotonic()
+            yield {"edges": edges, "pageInfo": {"hasNextPage": False, "endCursor": None}}
+            records_emitted += len(edges)
+            if self.object_count and records_emitted:
+                self.objects_per_record = self.object_count / records_emitted
+        else:
+            LOGGER.info("No data returned for the date range: %s", query_filter)
+
+        self.clear_state()
@@ -0,0 +1,208 @@
+import collections
+import json
+import urllib.error
+import shopify
+import singer
+from singer import metrics
+from graphql import parse, print_ast
+from graphql.language import (ArgumentNode, DocumentNode, FieldNode, InlineFragmentNode,
+                              IntValueNode, NamedTypeNode, NameNode, NonNullTypeNode,
+                              OperationDefinitionNode, OperationType, SelectionSetNode,
+                              VariableDefinitionNode, VariableNode)
+from tap_shopify.context import Context
+from tap_shopify.exceptions import ShopifyAPIError
+from tap_shopify.query_plan import get_variable_names
+from tap_shopify.rate_limit import PageSizer, MAX_QUERY_COST, QUERY_COST_HEADROOM
+from tap_shopify.streams.base import shopify_error_handling
+
+LOGGER = singer.get_logger()
+
+# Most parents whose next child page is requested at once
+MAX_BATCH_PARENTS = 50
+
+
+def find_field(selection_set, name):
+    """The first field called `name` in `selection_set`, depth first."""
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode) and selection.name.value == name:
+            return selection
+        if selection.selection_set:
+            found = find_field(selection.selection_set, name)
+            if found is not None:
+                return found
+    return None
+
+
+def variable_definition(name, type_name, non_null=False):
+    type_node = NamedTypeNode(name=NameNode(value=type_name))
+    return VariableDefinitionNode(variable=VariableNode(name=NameNode(value=name)),
+                                  type=NonNullTypeNode(type=type_node) if non_null else type_node,
+                                  default_value=None,
+                                  directives=())
+
+
+class ChildPages():
+    """
+    Fetches the remaining pages of a child connection for many parents per
+    request.
+
+    The connection field is taken from the stream query, so the child pages
+    hold the same fields as the first page. Each parent of a batch is one
+    aliased `node(id:)` selection with its own `after` cursor, the number of
+    parents per request is tuned like a page size from the requested cost of
+    the previous batches, and a MAX_COST_EXCEEDED error shrinks it.
+    `variables` are the values of the other variables the connection uses,
+    `first` defaults to the page size of the stream.
+    """
+
+    def __init__(self, stream, connection_name, variables=None, query=None):
+        self.stream = stream
+        self.connection_name = connection_name
+        self.variables = variables or {}
+        operation = parse(query or stream.get_selected_query()).definitions[0]
+        connection = find_field(operation.selection_set, connection_name)
+        # The connection without its `after` cursor, given per parent
+        self.connection = FieldNode(alias=connection.alias,
+                                    name=connection.name,
+                                    arguments=tuple(argument for argument in connection.arguments
+                                                    if argument.name.value != "after"),
+                                    directives=(),
+                                    selection_set=connection.selection_set)
+        self.variable_definitions = {definition.variable.name.value: definition
+                                     for definition in operation.variable_definitions or ()}
+        self.used_variables = get_variable_names(self.connection)
+
+        # Each parent requests about a page of children
+        first = next((argument.value for argument in self.connection.arguments
+                      if argument.name.value == "first"), None)
+        page_size = int(first.value) if isinstance(first, IntValueNode) else None
+        page_cost = (page_size or self.variables.get("first") or stream.results_per_page) + 2
+        self.sizer = PageSizer("{} {} pages".format(stream.name, connection_name),
+                               max(1, int(MAX_QUERY_COST * QUERY_COST_HEADROOM / page_cost)),
+                               MAX_BATCH_PARENTS)
+
+    def build_query(self, batch):
+        """Returns the query and variables requesting the next page of each (parent_id, cursor)."""
+        definitions = [self.variable_definitions[name] for name in sorted(self.used_variables)
+                       if name in self.variable_definitions]
+        values = {"first": self.stream.results_per_page, **self.variables}
+        variables = {name: values.get(name) for name in self.used_variables}
+        selections = []
+        for index, (parent_id, cursor) in enumerate(batch):
+            id_variable, after_variable = "id_{}".format(index), "after_{}".format(index)
+            connection = FieldNode(
+                alias=self.connection.alias,
+                name=self.connection.name,
+                arguments=self.connection.arguments + (ArgumentNode(
+                    name=NameNode(value="after"),
+                    value=VariableNode(name=NameNode(value=after_variable))),),
+                directives=(),
+                selection_set=self.connection.selection_set)
+            # gid://shopify/<Type>/<id>
+            parent_type = parent_id.split("/")[-2]
+            selections.append(FieldNode(
+                alias=NameNode(value="p{}".format(index)),
+                name=NameNode(value="node"),
+                arguments=(ArgumentNode(name=NameNode(value="id"),
+                                        value=VariableNode(name=NameNode(value=id_variable))),),
+                directives=(),
+                selection_set=SelectionSetNode(selections=(InlineFragmentNode(
+                    type_condition=NamedTypeNode(name=NameNode(value=parent_type)),
+                    directives=(),
+                    selection_set=SelectionSetNode(selections=(connection,))),))))
+            definitions += [variable_definition(id_variable, "ID", non_null=True),
+                            variable_definition(after_variable, "String")]
+            variables[id_variable], variables[after_variable] = parent_id, cursor
+
+        operation = OperationDefinitionNode(operation=OperationType.QUERY,
+                                            name=NameNode(value="ChildPages"),
+                                            variable_definitions=tuple(definitions),
+                                            directives=(),
+                                            selection_set=SelectionSetNode(
+                                                selections=tuple(selections)))
+        return print_ast(DocumentNode(definitions=(operation,))), variables
+
+    @shopify_error_handling
+    def request(self, batch):
+        """
+        Returns the `data` of the batch request, or None when it cost too much
+        and should be sent again with fewer parents.
+        """
+        query, variables = self.build_query(batch)
+        cost_key = (self.connection_name, len(batch))
+        Context.throttle.acquire(self.stream.name, cost_key)
+        LOGGER.info("Fetching %s pages of %d %s parents", self.connection_name,
+                    len(batch), self.stream.name)
+        try:
+            response = json.loads(shopify.GraphQL().execute( # pylint: disable=E1123
+                query=query,
+                variables=variables,
+                timeout=self.stream.request_timeout))
+        except urllib.error.HTTPError as http_error:
+            raise self.stream.get_http_error(http_error) from http_error
+        cost = response.get("extensions", {}).get("cost")
+        Context.throttle.update(cost_key, cost)
+
+        if "errors" in response:
+            for error in response["errors"]:
+                if (error.get("extensions") or {}).get("code") == "MAX_COST_EXCEEDED" \
+                        and self.sizer.shrink(len(batch), error):
+                    return None
+            raise ShopifyAPIError(response["errors"])
+
+        self.sizer.observe(len(batch), cost)
+        return response.get("data") or {}
+
+    def fetch_remaining(self, cursors):
+        """
+        Takes the end cursor of the last fetched page of each parent, by parent
+        id, and returns the later pages of every parent, by parent id.
+        """
+        response_key = (self.connection.alias or self.connection.name).value
+        pending = dict(cursors)
+        pages = collections.defaultdict(list)
+        requests = 0
+        while pending:
+            batch = list(pending.items())[:self.sizer.size]
+            requests += 1
+            data = self.request(batch)
+            if data is None:
+                continue
+
+            for index, (parent_id, _cursor) in enumerate(batch):
+                connection = (data.get("p{}".format(index)) or {}).get(response_key) or {}
+                pages[parent_id].append(connection)
+                page_info = connection.get("pageInfo") or {}
+                if page_info.get("hasNextPage"):
+                    pending[parent_id] = page_info["endCursor"]
+                else:
+                    del pending[parent_id]
+
+        LOGGER.info("Fetched %d later %s pages of %d %s parents with %d requests",
+                    sum(len(parent_pages) for parent_pages in pages.values()),
+                    self.connection_name, len(cursors), self.stream.name, requests)
+        metrics.log(LOGGER, metrics.Point("counter", "child_page_requests", requests,
+                                          {"endpoint": self.stream.name,
+                                           "connection": self.connection_name}))
+        return pages
+
+
+def fetch_child_pages(stream, connection_name, connections, variables=None, query=None):
+    """
+    Takes the first page of the `connection_name` connection of each parent
+    of `stream`, by parent id, and returns the later pages of every parent
+    with more, by parent id. The connection is read from `query`, the stream
+    query by default. The ChildPages of each connection is kept by the stream
+    for the whole sync, along with its batch size.
+    """
+    cursors = {parent_id: connection["pageInfo"]["endCursor"]
+               for parent_id, connection in connections.items()
+               if ((connection or {}).get("pageInfo") or {}).get("hasNextPage")}
+    if not cursors:
+        return {}
+
+    if connection_name not in stream.child_pages:
+        stream.child_pages[connection_name] = ChildPages(stream, connection_name, query=query)
+    child_pages = stream.child_pages[connection_name]
+    child_pages.variables = variables or {}
+    return child_pages.fetch_remaining(cursors)
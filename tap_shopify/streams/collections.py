@@ -1,5 +1,6 @@
 from tap_shopify.context import Context
 from tap_shopify.streams.base import Stream
+from tap_shopify.streams.child_pages import fetch_child_pages
 
 
 class Collections(Stream):
@@ -8,60 +9,51 @@ class Collections(Stream):
     data_key = "collections"
     replication_key = "updatedAt"
 
-    def transform_products(self, data):
+    def transform_products(self, data, product_pages=None):
         """
         Transforms the products data by extracting product IDs and handling pagination.
 
         Args:
             data (dict): Product data.
+            product_pages (list): Remaining pages of products, fetched when None.
 
         Returns:
             list: List of product IDs.
         """
-        # Extract product IDs from the first page
-        product_ids = [
+        if product_pages is None:
+            product_pages = fetch_child_pages(
+                self, "products", {data["id"]: data["products"]}).get(data["id"], [])
+
+        return [
             node["id"]
-            for item in data["products"]["edges"]
+            for products_data in [data["products"]] + product_pages
+            for item in products_data.get("edges", [])
             if (node := item.get("node")) and "id" in node
         ]
-        query = self.remove_fields_from_query(Context.get_unselected_fields(self.name))
-
-        # Handle pagination
-        page_info = data["products"].get("pageInfo", {})
-        while page_info.get("hasNextPage"):
-            params = {
-                "first": self.results_per_page,
-                "query": f"id:{data['id'].split('/')[-1]}",
-                "childafter": page_info.get("endCursor"),
-            }
 
-            # Fetch the next page of data
-            response = self.call_api(params, query=query)
-            products_data = response.get("edges", [{}])[0].get("node", {}).get("products", {})
-            product_ids.extend(
-                node["id"]
-                for item in products_data.get("edges", [])
-                if (node := item.get("node")) and "id" in node
-            )
-            page_info = products_data.get("pageInfo", {})
-
-        return product_ids
-
-    def transform_object(self, obj):
+    def transform_object(self, obj, product_pages=None):
         """
         Transforms a collection object.
 
         Args:
             obj (dict): Collection object.
+            product_pages (list): Remaining pages of products, fetched when None.
 
         Returns:
             dict: Transformed collection object.
         """
         obj["collectionType"] = "SMART" if obj.get("ruleSet") else "MANUAL"
         if obj.get("products"):
-            obj["products"] = self.transform_products(obj)
+            obj["products"] = self.transform_products(obj, product_pages)
         return obj
 
+    def transform_page(self, edges):
+        """Transforms the collections of a page, fetching the remaining products pages together."""
+        objs = [edge.get("node") for edge in edges]
+        product_pages = fetch_child_pages(
+            self, "products", {obj["id"]: obj.get("products") for obj in objs})
+        return [self.transform_object(obj, product_pages.get(obj["id"], [])) for obj in objs]
+
     def get_query(self):
         """
         Returns the GraphQL query for fetching collections.
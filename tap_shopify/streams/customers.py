@@ -7,6 +7,7 @@ class Customers(Stream):
     name = "customers"
     data_key = "customers"
     replication_key = "updatedAt"
+    bulk_supported = True
 
     def get_query(self):
         """
@@ -1,87 +1,26 @@
 import singer
 from tap_shopify.context import Context
 from tap_shopify.streams.base import Stream
+from tap_shopify.streams.child_pages import fetch_child_pages
 
 LOGGER = singer.get_logger()
 
+# Child connections whose remaining pages are fetched for a page of fulfillment orders
+CHILD_CONNECTIONS = ("merchantRequests", "locationsForMove", "fulfillments")
 
-class FulfillmentOrders(Stream):
-    """Stream class for Shopify fulfillment_orders."""
-
-    name = "fulfillment_orders"
-    data_key = "fulfillmentOrders"
-    replication_key = "updatedAt"
-
-    # pylint: disable=W0221,fixme
-    def get_query_params(self, updated_at_min, updated_at_max, cursor=None):
-        """
-        Construct query parameters for GraphQL requests.
-
-        Args:
-            updated_at_min (str): Minimum updated_at timestamp.
-            updated_at_max (str): Maximum updated_at timestamp.
-            cursor (str): Pagination cursor, if any.
-
-        Returns:
-            dict: Dictionary of query parameters.
-        """
-        rkey = self.camel_to_snake(self.replication_key)
-
-        params = {
-            "query": f"{rkey}:>='{updated_at_min}' AND {rkey}:<'{updated_at_max}'",
-            "first": self.results_per_page if self.results_per_page <= 30 else 30,
-        }
-
-        if cursor:
-            params["after"] = cursor
-        return params
-
-    def transform_childitems(self, data, parent_id, key, next_page_key):
-        """
-        Paginate child items.
-        """
-        child_records = [
-            node for item in data["edges"]
-            if (node := item.get("node"))
-        ]
-        # Handle pagination
-        page_info = data.get("pageInfo", {})
-        query = self.remove_fields_from_query(Context.get_unselected_fields(self.name))
-        while page_info.get("hasNextPage"):
-            params = {
-                "first": self.results_per_page,
-                "query": f"id:{parent_id.split('/')[-1]}",
-                next_page_key: page_info.get("endCursor"),
-            }
-
-            # Fetch the next page of data
-            response = self.call_api(params, query=query)
-            node = response.get("edges", [])[0].get("node", {})
-            child_records.extend(
-                node for item in node[key]["edges"]
-                if (node := item.get("node"))
-            )
-            page_info = node.get("pageInfo", {})
-
-        return child_records
-
-    def get_fulfillment_line_items(self, fulfillment_id, next_page=None):
-        """
-        Fetch all fulfillment line items for a given fulfillment ID.
-        """
-        fulfillment_line_items = []
-        query = """
-                query FulfillmentLineItems($fulfillmentId: ID!, $next_page: String) {
-                fulfillment(id: $fulfillmentId) {
-                    fulfillmentLineItems(first: 100, after: $next_page) {
-                    pageInfo {
-                        hasNextPage
-                        endCursor
-                    }
-                    nodes {
-                        id
-                        quantity
-                        originalTotalSet {
+# Line items of a fulfillment past the first page in the stream query
+FULFILLMENT_LINE_ITEMS_QUERY = """
+    query FulfillmentLineItems($fulfillmentId: ID!, $next_page: String) {
+        fulfillment(id: $fulfillmentId) {
+            fulfillmentLineItems(first: 100, after: $next_page) {
+                pageInfo {
+                    hasNextPage
+                    endCursor
+                }
+                nodes {
+                    id
+                    quantity
+                    originalTotalSet {
                         presentmentMoney {
                             amount
                             currencyCode
@@ -90,8 +29,8 @@ class FulfillmentOrders(Stream):
                             amount
                             currencyCode
                         }
-                        }
-                        discountedTotalSet {
+                    }
+                    discountedTotalSet {
                         presentmentMoney {
                             amount
                             currencyCode
@@ -100,56 +39,80 @@ class FulfillmentOrders(Stream):
                             amount
                             currencyCode
                         }
-                        }
-                        lineItem {
-                        id
-                        }
                     }
+                    lineItem {
+                        id
                     }
                 }
-                }
-                """
-
-        params = {
-            "fulfillmentId": fulfillment_id,
+            }
         }
-        if next_page:
-            params["next_page"] = next_page
+    }
+"""
 
-        while True:
-            response = self.call_api(params, query=query, data_key="fulfillment")
-            fulfillment_line_items.extend(
-                response.get("fulfillmentLineItems", {}).get("nodes", [])
-            )
 
-            page_info = response.get("fulfillmentLineItems", {}).get("pageInfo", {})
-            if not page_info.get("hasNextPage"):
-                break
+class FulfillmentOrders(Stream):
+    """Stream class for Shopify fulfillment_orders."""
 
-            params["next_page"] = page_info.get("endCursor")
+    name = "fulfillment_orders"
+    data_key = "fulfillmentOrders"
+    replication_key = "updatedAt"
+
+    # Nested connections make each record expensive, pages never hold more
+    # than 30 fulfillment orders and shrink from the observed query cost
+    max_results_per_page = 30
+
+    def get_child_pages(self, objs):
+        """
+        Fetches the remaining pages of the child connections of `objs` together,
+        returns them by connection name, then by parent id.
+        """
+        child_pages = {key: fetch_child_pages(self, key, {obj["id"]: obj.get(key) for obj in objs})
+                       for key in CHILD_CONNECTIONS}
 
-        return fulfillment_line_items
+        # The line items of every fulfillment of the page, once all fulfillments are known
+        fulfillments = [
+            item for obj in objs if obj.get("fulfillments")
+            for item in self.transform_childitems(
+                obj["fulfillments"], child_pages["fulfillments"].get(obj["id"], []))
+        ]
+        child_pages["fulfillmentLineItems"] = fetch_child_pages(
+            self, "fulfillmentLineItems",
+            {item["id"]: item.get("fulfillmentLineItems") for item in fulfillments},
+            query=FULFILLMENT_LINE_ITEMS_QUERY)
+        return child_pages
 
-    def transform_object(self, obj):
+    def transform_childitems(self, data, pages):
+        """
+        Child items of the first page `data` and the remaining `pages`.
+        """
+        return [
+            node for child_data in [data] + pages
+            for item in child_data.get("edges", [])
+            if (node := item.get("node"))
+        ]
+
+    def transform_object(self, obj, child_pages=None):
         """
         Transforms a collection object.
         Args:
             obj (dict): Collection object.
+            child_pages (dict): Remaining pages of the child connections, fetched when None.
         Returns:
             dict: Transformed collection object.
         """
+        if child_pages is None:
+            child_pages = self.get_child_pages([obj])
+
         if obj.get("merchantRequests"):
             obj["merchantRequests"] = self.transform_childitems(
                 obj.get("merchantRequests"),
-                obj["id"], "merchantRequests",
-                "merchant_request_after"
+                child_pages["merchantRequests"].get(obj["id"], [])
             )
 
         if obj.get("locationsForMove"):
             obj["locationsForMove"] = self.transform_childitems(
-                obj.get("locationsForMove"), obj["id"],
-                "locationsForMove",
-                "locations_move_after"
+                obj.get("locationsForMove"),
+                child_pages["locationsForMove"].get(obj["id"], [])
             )
             for item in obj["locationsForMove"]:
                 item["availableLineItems"] = item["availableLineItems"]["nodes"]
@@ -157,28 +120,32 @@ class FulfillmentOrders(Stream):
 
         if obj.get("fulfillments"):
             obj["fulfillments"] = self.transform_childitems(
-                obj.get("fulfillments"), obj["id"],
-                "fulfillments",
-                "fulfillments_after"
+                obj.get("fulfillments"),
+                child_pages["fulfillments"].get(obj["id"], [])
             )
             for item in obj["fulfillments"]:
                 item["fulfillmentOrders"] = item["fulfillmentOrders"]["nodes"]
                 item["events"] = item["events"]["nodes"]
-                initial_nodes = item["fulfillmentLineItems"]["nodes"]
-                if item["fulfillmentLineItems"]["pageInfo"]["hasNextPage"]:
-                    more_nodes = self.get_fulfillment_line_items(
-                        fulfillment_id=item["id"],
-                        next_page=item["fulfillmentLineItems"]["pageInfo"]["endCursor"]
-                    )
-                    item["fulfillmentLineItems"] = initial_nodes + more_nodes
-                else:
-                    item["fulfillmentLineItems"] = initial_nodes
+                item["fulfillmentLineItems"] = [
+                    node for line_items in [item["fulfillmentLineItems"]] +
+                    child_pages["fulfillmentLineItems"].get(item["id"], [])
+                    for node in line_items.get("nodes", [])
+                ]
 
         if obj.get("fulfillmentOrdersForMerge"):
             obj["fulfillmentOrdersForMerge"] = obj["fulfillmentOrdersForMerge"]["nodes"]
 
         return obj
 
+    def transform_page(self, edges):
+        """
+        Transforms the fulfillment orders of a page, fetching the remaining
+        pages of their child connections together.
+        """
+        objs = [edge.get("node") for edge in edges]
+        child_pages = self.get_child_pages(objs)
+        return [self.transform_object(obj, child_pages) for obj in objs]
+
     def get_query(self):
         """
         Returns the GraphQL query for fetching fulfillmentOrders.
@@ -1,7 +1,8 @@
 from datetime import timedelta
-from singer import metrics, utils
+from singer import utils
 from tap_shopify.context import Context
 from tap_shopify.streams.base import Stream
+from tap_shopify.streams.child_pages import fetch_child_pages
 
 
 class InventoryLevels(Stream):
@@ -12,37 +13,31 @@ class InventoryLevels(Stream):
     child_data_key = "inventoryLevels"
     replication_key = "updatedAt"
 
-    def get_next_page_child(self, parent_id, cursor, child_query):
+    def get_page_child_objects(self, nodes, child_query):
         """
-        Gets all child objects efficiently with pagination.
+        Gets the child objects of a page of parents, the remaining child pages
+        of every parent are fetched together.
 
         Args:
-            parent_id (str): The ID of the parent object.
-            cursor (str): The cursor for pagination.
+            nodes (list): The parent objects.
             child_query (str): The query for child objects.
 
         Yields:
             dict: The child object.
         """
-        has_next_page = True
-        query = self.remove_fields_from_query(Context.get_unselected_fields(self.name))
-        while has_next_page:
-            child_query_params = {
-                "first": self.results_per_page,
-                "parentquery": f"id:{parent_id.split('/')[-1]}",
-                "query": child_query,
-                "childafter": cursor,
-            }
-            data = self.call_api(child_query_params, query=query)
-            for edge in data.get("edges", []):
-                node = edge.get("node", {})
-                child_data = node.get(self.child_data_key, {})
-                child_edges = child_data.get("edges", [])
-                yield from child_edges
+        child_pages = fetch_child_pages(
+            self, self.child_data_key,
+            {node.get("id"): node.get(self.child_data_key) for node in nodes},
+            variables={"query": child_query})
+
+        for node in nodes:
+            # Handle already fetched child objects
+            for child_obj in node.get(self.child_data_key, {}).get("edges", []):
+                yield child_obj.get("node")
 
-            page_info = child_data.get("pageInfo", {})
-            cursor = page_info.get("endCursor")
-            has_next_page = page_info.get("hasNextPage", False)
+            for child_data in child_pages.get(node.get("id"), []):
+                for child_obj in child_data.get("edges", []):
+                    yield child_obj.get("node")
 
     # pylint: disable=too-many-locals
     def get_objects(self):
@@ -55,50 +50,21 @@ class InventoryLevels(Stream):
         last_updated_at = self.get_bookmark()
         current_bookmark = last_updated_at
         sync_start = utils.now().replace(microsecond=0)
-        query = self.remove_fields_from_query(Context.get_unselected_fields(self.name))
+        query = self.get_selected_query()
 
         while last_updated_at < sync_start:
             date_window_end = last_updated_at + timedelta(days=self.date_window_size)
             query_end = min(sync_start, date_window_end)
-            has_next_page, cursor = True, None
-
-            while has_next_page:
-                query_params = self.get_query_params(last_updated_at, query_end, cursor)
-                with metrics.http_request_timer(self.name):
-                    data = self.call_api(query_params, query=query)
+            child_query = self.get_query_params(last_updated_at, query_end)["query"]
 
+            for data in self.get_pages(query, last_updated_at, query_end):
                 # Process parent objects
-                for edge in data.get("edges", []):
-                    node = edge.get("node", {})
-
-                    # Handle already fetched child objects
-                    child_edges = node.get(self.child_data_key, {}).get("edges", [])
-                    for child_obj in child_edges:
-                        obj = self.transform_object(child_obj.get("node"))
-                        replication_value = utils.strptime_to_utc(obj[self.replication_key])
-                        current_bookmark = max(current_bookmark, replication_value)
-                        yield obj
-
-                    # Check if more child pages are needed
-                    child_page_info = node.get(self.child_data_key, {}).get("pageInfo", {})
-                    if child_page_info.get("hasNextPage", False):
-                        parent_id = node.get("id")
-                        child_cursor = child_page_info.get("endCursor")
-
-                        # Get remaining child pages
-                        for child_obj in self.get_next_page_child(
-                            parent_id, child_cursor, query_params["query"]
-                        ):
-                            transformed_obj = self.transform_object(child_obj.get("node"))
-                            replication_value = utils.strptime_to_utc(
-                                transformed_obj[self.replication_key]
-                            )
-                            current_bookmark = max(current_bookmark, replication_value)
-                            yield transformed_obj
-
-                page_info = data.get("pageInfo", {})
-                cursor = page_info.get("endCursor")
-                has_next_page = page_info.get("hasNextPage")
+                nodes = [edge.get("node", {}) for edge in data.get("edges", [])]
+                for child_obj in self.get_page_child_objects(nodes, child_query):
+                    obj = self.transform_object(child_obj)
+                    replication_value = utils.strptime_to_utc(obj[self.replication_key])
+                    current_bookmark = max(current_bookmark, replication_value)
+                    yield obj
 
             last_updated_at = query_end
             # Update bookmark to the latest value, but not beyond sync start time
@@ -2,9 +2,9 @@ from abc import ABC, abstractmethod
 from datetime import timedelta
 import json
 
-from singer import utils, get_logger, metrics
-from tap_shopify.context import Context
+from singer import utils, get_logger
 from tap_shopify.streams.base import Stream
+from tap_shopify.streams.child_pages import fetch_child_pages
 
 LOGGER = get_logger()
 
@@ -16,6 +16,7 @@ class Metafields(Stream, ABC):
     data_key = None
     child_data_key = "metafields"
     replication_key = "updatedAt"
+    bulk_supported = True
 
     @abstractmethod
     def get_query(self):
@@ -36,35 +37,28 @@ class Metafields(Stream, ABC):
                 obj["value"] = value
         return obj
 
-    def fetch_paginated_child_data(self, initial_child_data, parent_id):
+    def get_page_child_objects(self, nodes):
         """
-        Fetches all pages of child data by handling pagination.
+        Yields the metafields of parent nodes, the remaining pages of every
+        parent are fetched together.
         """
-        # Extract the numeric ID from the full path
-        numeric_id = parent_id.split('/')[-1]
-        page_info = initial_child_data.get("pageInfo", {})
-        query = self.remove_fields_from_query(Context.get_unselected_fields(self.name))
+        child_pages = fetch_child_pages(
+            self, self.child_data_key,
+            {node.get("id"): node.get(self.child_data_key) for node in nodes})
 
-        while page_info.get("hasNextPage"):
-            query_params = {
-                "first": self.results_per_page,
-                "query": f"id:{numeric_id}",
-                "childafter": page_info.get("endCursor"),
-            }
+        for node in nodes:
+            # First handle the already fetched child objects
+            for child_obj in node.get(self.child_data_key).get("edges", []):
+                yield child_obj.get("node")
 
-            response = self.call_api(query_params, query=query)
-            response_edges = response.get("edges", [])
-            if not response_edges:
-                break
+            for child_data in child_pages.get(node.get("id"), []):
+                for child_obj in child_data.get("edges", []):
+                    yield child_obj.get("node")
 
-            first_edge = response_edges[0]
-            child_data = first_edge.get("node", {}).get(self.child_data_key, {})
+    def get_child_objects(self, node):
+        """Yields the metafields of a parent node, fetching their remaining pages."""
+        yield from self.get_page_child_objects([node])
 
-            yield from child_data.get("edges", [])
-
-            page_info = child_data.get("pageInfo", {})
-
-    # pylint: disable=too-many-locals, too-many-nested-blocks
     def get_objects(self):
         """
         Main iterator to yield metafield objects.
@@ -75,43 +69,18 @@ class Metafields(Stream, ABC):
         # to ensure we don't miss any updates as it was observed shopify
         # updates the parent object initially and then the child objects
         last_updated_at = self.get_bookmark() - timedelta(minutes=1)
-        query = self.remove_fields_from_query(Context.get_unselected_fields(self.name))
+        query = self.get_selected_query()
         LOGGER.info("GraphQL query for stream '%s': %s", self.name, ' '.join(query.split()))
 
         while last_updated_at < sync_start:
             date_window_end = last_updated_at + timedelta(days=self.date_window_size)
             query_end = min(sync_start, date_window_end)
 
-            has_next_page = True
-            cursor = None
-
-            while has_next_page:
-                query_params = self.get_query_params(last_updated_at, query_end, cursor)
-                with metrics.http_request_timer(self.name):
-                    data = self.call_api(query_params, query=query)
-
+            for data in self.get_pages(query, last_updated_at, query_end):
                 # Process parent objects
-                for edge in data.get("edges", []):
-                    node = edge.get("node", {})
-
-                    # First handle the already fetched child objects
-                    child_edges = node.get(self.child_data_key).get("edges", [])
-                    for child_obj in child_edges:
-                        obj = self.transform_object(child_obj.get("node"))
-                        yield obj
-
-                    # Check if we need to get more child pages
-                    child_page_info = node.get(self.child_data_key, {}).get("pageInfo", {})
-                    if child_page_info.get("hasNextPage", False):
-                        parent_id = node.get("id")
-                        for child_obj in self.fetch_paginated_child_data(
-                            node.get(self.child_data_key), parent_id
-                        ):
-                            transformed_obj = self.transform_object(child_obj.get("node"))
-                            yield transformed_obj
-
-                page_info = data.get("pageInfo", {})
-                cursor, has_next_page = page_info.get("endCursor"), page_info.get("hasNextPage")
+                nodes = [edge.get("node", {}) for edge in data.get("edges", [])]
+                for child_obj in self.get_page_child_objects(nodes):
+                    yield self.transform_object(child_obj)
 
             last_updated_at = query_end
 
@@ -8,6 +8,12 @@ class MetafieldsOrders(Metafields):
     """Stream class for metafields associated with orders."""
     name = "metafields_orders"
     data_key = "orders"
+    # Synced from a scan of orders shared with the other order child streams
+    parent_scan = "orders"
+    skip_before_bookmark = True
+    # Its bookmark is written once the whole sync is done, a metafield can be
+    # updated after the order it belongs to
+    bookmark_each_window = False
 
     def get_query(self):
         """Returns the GraphQL query for fetching order metafields."""
@@ -1,5 +1,5 @@
 from datetime import timedelta
-from singer import metrics, utils
+from singer import utils
 from tap_shopify.context import Context
 from tap_shopify.streams.base import Stream
 
@@ -12,6 +12,16 @@ class OrderRefunds(Stream):
     child_data_key = "refunds"
     replication_key = "updatedAt"
     automatic_keys = ["order"]
+    bulk_supported = True
+    # Synced from a scan of orders shared with the other order child streams
+    parent_scan = "orders"
+    # Its bookmark is written after every date window
+    bookmark_each_window = True
+    skip_before_bookmark = True
+
+    def get_child_objects(self, node):
+        """Yields the refunds of an order node."""
+        yield from node.get(self.child_data_key, [])
 
     # pylint: disable=too-many-locals
     def get_objects(self):
@@ -28,40 +38,27 @@ class OrderRefunds(Stream):
         last_updated_at = self.get_bookmark() - timedelta(minutes=1)
         initial_bookmark_time = current_bookmark = self.get_bookmark()
         sync_start = utils.now().replace(microsecond=0)
-        query = self.remove_fields_from_query(Context.get_unselected_fields(self.name))
+        query = self.get_selected_query()
 
         # Process each date window
         while last_updated_at < sync_start:
             date_window_end = last_updated_at + timedelta(days=self.date_window_size)
             query_end = min(sync_start, date_window_end)
-            cursor = None
-
-            while True:
-                query_params = self.get_query_params(last_updated_at, query_end, cursor)
-
-                with metrics.http_request_timer(self.name):
-                    data = self.call_api(query_params, query=query)
 
+            for data in self.get_pages(query, last_updated_at, query_end):
                 # Process parent objects and their refunds
                 edges = data.get("edges", [])
                 for edge in edges:
                     node = edge.get("node", {})
-                    child_edges = node.get(self.child_data_key, [])
 
                     # Yield each transformed refund
-                    for child_obj in child_edges:
+                    for child_obj in self.get_child_objects(node):
                         replication_value = utils.strptime_with_tz(child_obj[self.replication_key])
                         current_bookmark = max(current_bookmark, replication_value)
                         # Perform the pseudo sync for the child objects
                         if replication_value >= initial_bookmark_time:
                             yield self.transform_object(child_obj)
 
-                # Handle pagination
-                page_info = data.get("pageInfo", {})
-                cursor = page_info.get("endCursor")
-                if not page_info.get("hasNextPage", False):
-                    break
-
             last_updated_at = query_end
             # Update bookmark to the latest value, but not beyond sync start time
             max_bookmark_value = min(sync_start, current_bookmark)
@@ -82,7 +79,7 @@ class OrderRefunds(Stream):
             node for item in data["refundLineItems"]["edges"]
             if (node := item.get("node"))
         ]
-        query = self.remove_fields_from_query(Context.get_unselected_fields(self.name))
+        query = self.get_selected_query()
 
         # Handle pagination
         page_info = data["refundLineItems"].get("pageInfo", {})
@@ -121,7 +118,7 @@ class OrderRefunds(Stream):
             node for item in data["orderAdjustments"]["edges"]
             if (node := item.get("node"))
         ]
-        query = self.remove_fields_from_query(Context.get_unselected_fields(self.name))
+        query = self.get_selected_query()
 
         # Handle pagination
         page_info = data["orderAdjustments"].get("pageInfo", {})
@@ -0,0 +1,172 @@
+from datetime import timedelta
+import singer
+from singer import utils
+from graphql import parse, print_ast
+from graphql.language import (DocumentNode, FieldNode, NameNode, OperationDefinitionNode,
+                              OperationType, SelectionSetNode)
+from tap_shopify.context import Context
+from tap_shopify.streams.base import Stream
+
+LOGGER = singer.get_logger()
+
+# Child objects are fetched again from the orders updated in the last minute
+# before their bookmark, Shopify updates the order before its child objects
+LOOKBACK = timedelta(minutes=1)
+
+# Fields of the merged node read by the scan itself
+SCAN_FIELDS = ("id", "updatedAt")
+
+
+def get_node_selections(query):
+    """Returns the operation of `query` and the selections of its `edges { node }`."""
+    operation = parse(query).definitions[0]
+    root = operation.selection_set.selections[0]
+    edges = next(selection for selection in root.selection_set.selections
+                 if selection.name.value == "edges")
+    node = edges.selection_set.selections[0]
+    return operation, root, node.selection_set.selections
+
+
+def field(name, selections=None, alias=None, arguments=()):
+    return FieldNode(alias=NameNode(value=alias) if alias else None,
+                     name=NameNode(value=name),
+                     arguments=arguments,
+                     directives=(),
+                     selection_set=SelectionSetNode(selections=tuple(selections))
+                     if selections else None)
+
+
+class OrdersScan(Stream):
+    """
+    Scans orders once for every selected stream derived from orders.
+
+    The node selections of the child streams' queries are merged into one
+    query, each top level field aliased with the stream name, so fields
+    requested by several streams with different arguments never conflict.
+    Every order node is split back into the node each stream would have
+    fetched and handed to the stream's `get_child_objects`, which still
+    paginates its own nested connections.
+
+    The scan starts from the earliest bookmark, less the lookback minute.
+    Each stream only receives the orders from its own start and skips the
+    child objects before its bookmark when it syncs pseudo incrementally.
+    Its bookmark is written as when it syncs alone, after every date window
+    or once the whole scan is done, and the remaining pages of its child
+    connections are fetched together for every page of orders.
+    """
+    name = "orders_scan"
+    data_key = "orders"
+    replication_key = "updatedAt"
+
+    def __init__(self, streams):
+        self.streams = streams
+        super().__init__()
+
+    @staticmethod
+    def get_alias_prefix(stream):
+        return stream.name + "__"
+
+    def get_query(self):
+        variables, arguments, node_selections = {}, {}, []
+        for stream in self.streams:
+            operation, root, selections = get_node_selections(stream.get_selected_query())
+            for variable in operation.variable_definitions or ():
+                variables.setdefault(variable.variable.name.value, variable)
+            for argument in root.arguments or ():
+                arguments.setdefault(argument.name.value, argument)
+            for selection in selections:
+                if not isinstance(selection, FieldNode):
+                    continue
+                response_key = (selection.alias or selection.name).value
+                node_selections.append(FieldNode(
+                    alias=NameNode(value=self.get_alias_prefix(stream) + response_key),
+                    name=selection.name,
+                    arguments=selection.arguments,
+                    directives=selection.directives,
+                    selection_set=selection.selection_set))
+
+        node_selections += [field(name) for name in SCAN_FIELDS]
+        root = field(self.data_key,
+                     [field("edges", [field("node", node_selections)]),
+                      field("pageInfo", [field("endCursor"), field("hasNextPage")])],
+                     arguments=tuple(arguments.values()))
+        operation = OperationDefinitionNode(operation=OperationType.QUERY,
+                                            name=NameNode(value="ScanOrders"),
+                                            variable_definitions=tuple(variables.values()),
+                                            directives=(),
+                                            selection_set=SelectionSetNode(selections=(root,)))
+        return print_ast(DocumentNode(definitions=(operation,)))
+
+    def split_node(self, node, stream):
+        """The order node as fetched by the query of `stream`."""
+        prefix = self.get_alias_prefix(stream)
+        return {key[len(prefix):]: value for key, value in node.items() if key.startswith(prefix)}
+
+    @staticmethod
+    def get_page_child_objects(stream, nodes):
+        """The child objects of the order nodes of a page, as `stream` fetches them."""
+        if hasattr(stream, "get_page_child_objects"):
+            return stream.get_page_child_objects(nodes)
+        return (child_obj for node in nodes for child_obj in stream.get_child_objects(node))
+
+    def update_bookmarks(self, streams, current_bookmarks, sync_start):
+        for stream in streams:
+            # Update bookmark to the latest value, but not beyond sync start time
+            stream.update_bookmark(utils.strftime(
+                min(sync_start, current_bookmarks[stream.name])))
+
+    # pylint: disable=too-many-locals
+    def sync(self):
+        """Yields (stream name, record) for the records of every child stream."""
+        sync_start = utils.now().replace(microsecond=0)
+        initial_bookmarks = {stream.name: stream.get_bookmark() for stream in self.streams}
+        current_bookmarks = dict(initial_bookmarks)
+        starts = {name: bookmark - LOOKBACK for name, bookmark in initial_bookmarks.items()}
+        query = self.get_query()
+        LOGGER.info("Scanning orders once for streams %s: %s",
+                    ", ".join(stream.name for stream in self.streams), ' '.join(query.split()))
+
+        for window_start, window_end in self.iter_windows(min(starts.values()), sync_start):
+            for data in self.get_pages(query, window_start, window_end):
+                nodes = [edge.get("node", {}) for edge in data.get("edges", [])]
+                for stream in self.streams:
+                    stream_nodes = [
+                        self.split_node(node, stream) for node in nodes
+                        if utils.strptime_to_utc(node["updatedAt"]) >= starts[stream.name]]
+                    for child_obj in self.get_page_child_objects(stream, stream_nodes):
+                        replication_value = utils.strptime_to_utc(
+                            child_obj[stream.replication_key])
+                        current_bookmarks[stream.name] = max(
+                            current_bookmarks[stream.name], replication_value)
+                        if (stream.skip_before_bookmark
+                                and replication_value < initial_bookmarks[stream.name]):
+                            continue
+                        yield stream.name, stream.transform_object(child_obj)
+
+            self.update_bookmarks([stream for stream in self.streams
+                                   if stream.bookmark_each_window
+                                   and window_end > starts[stream.name]],
+                                  current_bookmarks, sync_start)
+
+        self.update_bookmarks([stream for stream in self.streams
+                               if not stream.bookmark_each_window],
+                              current_bookmarks, sync_start)
+
+
+def use_shared_order_scan():
+    return Context.config.get("shared_order_scan") in (True, "true", "True")
+
+
+def get_order_scan_streams(stream_names):
+    """
+    The streams of `stream_names` synced by a shared OrdersScan, the streams
+    using bulk operations run their own. Empty unless at least two share it.
+    """
+    if not use_shared_order_scan():
+        return []
+    bulk_streams = Context.get_bulk_streams()
+    stream_names = [stream_name for stream_name in stream_names
+                    if getattr(Context.stream_objects[stream_name], "parent_scan", None) == "orders"
+                    and not (Context.stream_objects[stream_name].bulk_supported
+                             and stream_name in bulk_streams)]
+    return stream_names if len(stream_names) > 1 else []
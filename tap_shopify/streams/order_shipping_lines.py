@@ -1,7 +1,8 @@
 from datetime import timedelta
-from singer import metrics, utils
+from singer import utils
 from tap_shopify.context import Context
 from tap_shopify.streams.base import Stream
+from tap_shopify.streams.child_pages import fetch_child_pages
 
 
 class OrderShippingLines(Stream):
@@ -11,6 +12,36 @@ class OrderShippingLines(Stream):
     data_key = "orders"
     child_data_key = "shippingLines"
     replication_key = "updatedAt"
+    bulk_supported = True
+    # Synced from a scan of orders shared with the other order child streams
+    parent_scan = "orders"
+    # Its bookmark is written after every date window
+    bookmark_each_window = True
+    # Shipping lines carry the updatedAt of their order, which the lookback
+    # window fetches again on purpose
+    skip_before_bookmark = False
+
+    def get_selected_query(self):
+        """The full query, `orderId` and `updatedAt` are read from the order."""
+        return self.get_query()
+
+    def get_child_objects(self, node, shipping_line_pages=None):
+        """Yields the shipping lines of an order node, with the order's id and updatedAt."""
+        for shipping_line in self.paginate_shipping_lines(node, shipping_line_pages):
+            shipping_line["orderId"] = node["id"].split("/")[-1]
+            shipping_line["updatedAt"] = node["updatedAt"]
+            yield shipping_line
+
+    def get_page_child_objects(self, nodes):
+        """
+        Yields the shipping lines of order nodes, the remaining shippingLines
+        pages of every order are fetched together.
+        """
+        shipping_line_pages = fetch_child_pages(
+            self, self.child_data_key,
+            {node["id"]: node.get(self.child_data_key) for node in nodes})
+        for node in nodes:
+            yield from self.get_child_objects(node, shipping_line_pages.get(node["id"], []))
 
     # pylint: disable=too-many-locals
     def get_objects(self):
@@ -32,77 +63,44 @@ class OrderShippingLines(Stream):
         while last_updated_at < sync_start:
             date_window_end = last_updated_at + timedelta(days=self.date_window_size)
             query_end = min(sync_start, date_window_end)
-            cursor = None
-
-            while True:
-                query_params = self.get_query_params(last_updated_at, query_end, cursor)
-
-                with metrics.http_request_timer(self.name):
-                    data = self.call_api(query_params)
 
+            for data in self.get_pages(self.get_selected_query(), last_updated_at, query_end):
                 # Process parent objects and their shippinglines
-                edges = data.get("edges", [])
-                for edge in edges:
-                    node = edge.get("node", {})
-
-                    for shipping_line in self.paginate_shipping_lines(node):
-                        shipping_line["orderId"] = node["id"].split("/")[-1]
-                        shipping_line["updatedAt"] = node["updatedAt"]
-
-                        replication_value = utils.strptime_with_tz(
-                            shipping_line[self.replication_key]
-                        )
-                        current_bookmark = max(current_bookmark, replication_value)
-                        yield self.transform_object(shipping_line)
-
-                # Handle pagination
-                page_info = data.get("pageInfo", {})
-                cursor = page_info.get("endCursor")
-                if not page_info.get("hasNextPage", False):
-                    break
+                nodes = [edge.get("node", {}) for edge in data.get("edges", [])]
+                for shipping_line in self.get_page_child_objects(nodes):
+                    replication_value = utils.strptime_with_tz(
+                        shipping_line[self.replication_key]
+                    )
+                    current_bookmark = max(current_bookmark, replication_value)
+                    yield self.transform_object(shipping_line)
 
             last_updated_at = query_end
             # Update bookmark to the latest value, but not beyond sync start time
             max_bookmark_value = min(sync_start, current_bookmark)
             self.update_bookmark(utils.strftime(max_bookmark_value))
 
-    def paginate_shipping_lines(self, data):
+    def paginate_shipping_lines(self, data, shipping_line_pages=None):
         """
         Transforms the shippingLines data by handling pagination.
 
         Args:
             data (dict): Order data.
+            shipping_line_pages (list): Remaining pages of shippingLines, fetched when None.
 
         Returns:
             list: List of shippingLines.
         """
+        if shipping_line_pages is None:
+            shipping_line_pages = fetch_child_pages(
+                self, self.child_data_key, {data["id"]: data[self.child_data_key]}
+            ).get(data["id"], [])
 
-        for item in data["shippingLines"]["edges"]:
-            node = item.get("node")
-            if node:
-                yield node
-
-        # Handle pagination
-        page_info = data.get("pageInfo", {})
-        order_parent = data["id"]
-        while page_info.get("hasNextPage"):
-            params = {
-                "first": self.results_per_page,
-                "query": f"id:{order_parent.split('/')[-1]}",
-                "childafter": page_info.get("endCursor"),
-            }
-
-            # Fetch the next page of data
-            response = self.call_api(params)
-            node = response.get("edges", [])[0].get("node", {})
-            shipping_lines_data = node.get("shippingLines")
-            for item in shipping_lines_data["edges"]:
+        for shipping_lines_data in [data[self.child_data_key]] + shipping_line_pages:
+            for item in shipping_lines_data.get("edges", []):
                 node = item.get("node")
                 if node:
                     yield node
 
-            page_info = shipping_lines_data.get("pageInfo", {})
-
     def get_query(self):
         """
         Returns the GraphQL query for fetching order shipping lines.
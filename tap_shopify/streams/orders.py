@@ -1,15 +1,7 @@
-from datetime import timedelta
-import json
-import time
-import re
-import backoff
-import requests
-import shopify
 import singer
-from singer import metrics, utils
+from singer import utils
 from tap_shopify.context import Context
 from tap_shopify.streams.base import Stream
-from tap_shopify.exceptions import ShopifyAPIError, BulkOperationInProgressError
 
 LOGGER = singer.get_logger()
 
@@ -21,11 +13,11 @@ class Orders(Stream):
     def get_query(self):
         """
         Returns the GraphQL query string for the bulk operation.
-        The date filters will be injected via the bulk operation variables.
+        The date filter is injected into the root connection by the bulk query builder.
         """
         return """
         {
-        orders(query: "%s") {
+        orders(query: "%s", sortKey: UPDATED_AT) {
             edges {
             node {
                 additionalFees {
@@ -1021,331 +1013,19 @@ class Orders(Stream):
         }
         """
 
-    def is_discount_application(self, rec):
-        if '__typename' in rec and rec['__typename'] in ['AutomaticDiscountApplication',
-                                                       'DiscountCodeApplication',
-                                                       'ManualDiscountApplication',
-                                                       'ScriptDiscountApplication']:
-            return True
-        return False
-
-    def update_bookmark(self, bookmark_value, bookmark_key=None, bulk_op_metadata=None):
-        # Standard Singer bookmark
-        singer.write_bookmark(
-            Context.state,
-            self.name,
-            bookmark_key or self.replication_key,
-            bookmark_value
-        )
-
-        # Store under orders -> bulk_operation
-        if bulk_op_metadata:
-            orders_bookmark = Context.state.setdefault("bookmarks", {}).setdefault("orders", {})
-            orders_bookmark["bulk_operation"] = bulk_op_metadata
-
-        singer.write_state(Context.state)
+    def use_bulk_operation(self):
+        """Orders are always extracted with bulk operations."""
+        return True
 
     def build_query_filter(self, updated_at_min, updated_at_max):
-        return f"updated_at:>='{updated_at_min}' AND updated_at:<'{updated_at_max}'"
-
-    def submit_bulk_query(self, query_string):
-        url = f"https://{Context.config.get('shop')}.myshopify.com/admin/api/2025-07/graphql.json"
-        headers = {
-            "Content-Type": "application/json",
-            "X-Shopify-Access-Token": (
-                Context.config.get("access_token")
-                or Context.config.get("api_key")
-            ),
-        }
-        operation = {
-            "query": """
-                mutation bulkOperationRunQuery($query: String!) {
-                bulkOperationRunQuery(query: $query) {
-                    bulkOperation {
-                    id
-                    status
-                    createdAt
-                    }
-                    userErrors {
-                    field
-                    message
-                    }
-                }
-                }
-            """,
-            "variables": {
-                "query": query_string
-            }
-        }
-        response = requests.post(url, headers=headers, json=operation, timeout=300)
-        LOGGER.info("X-request-ID for the bulk operation: %s", response.headers.get("X-Request-ID"))
-
-        return response.json()
-
-    def poll_bulk_completion(self, current_bookmark, bulk_op_id, timeout=82800):
-        def fetch_bulk_operation(op_id):
-            query = f"""
-            {{
-                node(id: "{op_id}") {{
-                    ... on BulkOperation {{
-                        id
-                        status
-                        errorCode
-                        createdAt
-                        completedAt
-                        objectCount
-                        fileSize
-                        url
-                    }}
-                }}
-            }}
-            """
-            response = json.loads(shopify.GraphQL().execute(query=query))
-            if not isinstance(response, dict):
-                raise ShopifyAPIError(f"Unexpected GraphQL response: {response}")
-            return response.get("data", {}).get("node")
-
-        start = time.time()
-        last_status = None
-
-        while time.time() - start < timeout:
-            op = fetch_bulk_operation(bulk_op_id)
-
-            if not op:
-                LOGGER.warning("Bulk operation not found: %s", bulk_op_id)
-                return None
-            if not isinstance(op, dict):
-                raise ShopifyAPIError(f"Unexpected bulk operation format: {op}")
-
-            current_status = op.get("status")
-
-            if current_status != last_status:
-                LOGGER.info(
-                    "Bulk operation - %s, status: %s, created at - %s, completed at - %s",
-                    op.get("id"),
-                    current_status,
-                    op.get("createdAt"),
-                    op.get("completedAt") or "N/A"
-                )
-                last_status = current_status
-
-            if current_status == "COMPLETED":
-                LOGGER.info("Bulk operation completed. File size: %s bytes", op.get("fileSize"))
-                self.update_bookmark(
-                    bookmark_value=utils.strftime(current_bookmark),
-                    bulk_op_metadata={
-                        "bulk_operation_id": op.get("id"),
-                        "status": current_status,
-                        "created_at": op.get("createdAt"),
-                        "last_date_window": self.date_window_size,
-                    }
-                )
-                return op.get("url")
-
-            if current_status in ["FAILED", "CANCELED"]:
-                self.clear_bulk_operation_state()
-                raise ShopifyAPIError(f"Bulk operation failed: {op.get('errorCode')}")
-
-            time.sleep(60)
-
-        # Save bookmark if timeout occurs
-        self.update_bookmark(
-            bookmark_value=utils.strftime(current_bookmark),
-            bulk_op_metadata={
-                "bulk_operation_id": op.get("id"),
-                "status": op.get("status"),
-                "created_at": op.get("createdAt"),
-                "last_date_window": self.date_window_size,
-            }
-        )
-
-        elapsed = int(time.time() - start)
-        raise ShopifyAPIError(
-            f"Bulk operation id - {op.get('id') or 'UNKNOWN'} did not complete "
-            f"within {elapsed} seconds. "
-            "Please contact Shopify support with the operation ID for assistance."
-        )
-
-    # pylint: disable=unsupported-assignment-operation
-    def parse_bulk_jsonl(self, url):
-        """
-        Streams and yields one order at a time, with its associated line items,
-        without holding all orders/line_items in memory.
-        """
-        resp = requests.get(url, stream=True, timeout=60)
-        current_order = None
-        current_line_items = []
-        current_discount_applications = []
-
-        for line in resp.iter_lines():
-            if not line:
-                continue
-            rec = json.loads(line)
-            if not isinstance(rec, dict):
-                LOGGER.warning("Skipping unexpected JSONL line (not a dict): %s", rec)
-                continue
-            # Detect line item (child) or order (parent)
-            if '__parentId' in rec:
-                if self.is_discount_application(rec):
-                    # It's a discount application belonging to current_order
-                    current_discount_applications.append(rec)
-                else:
-                    # It's a line item belonging to current_order
-                    current_line_items.append(rec)
-            else:
-                if current_order:
-                    current_order["lineItems"] = current_line_items
-                    current_order["discountApplications"] = current_discount_applications
-                    yield current_order
-                # Start tracking new parent group
-                current_order = rec
-                current_line_items = []
-                current_discount_applications = []
-        # Yield the last parent group (if exists)
-        if current_order:
-            current_order["lineItems"] = current_line_items
-            current_order["discountApplications"] = current_discount_applications
-            yield current_order
+        return (f"updated_at:>='{utils.strftime(updated_at_min)}' "
+                f"AND updated_at:<'{utils.strftime(updated_at_max)}'")
 
     def transform_object(self, obj):
-        if obj.get("lineItems", {}).get("edges"):
-            obj["lineItems"] = [item["node"] for item in obj["lineItems"]["edges"]]
+        for key in ("lineItems", "discountApplications"):
+            if isinstance(obj.get(key), dict):
+                obj[key] = [item["node"] for item in obj[key].get("edges", [])]
         return obj
 
-    def clear_bulk_operation_state(self):
-        orders_bookmark = Context.state.get("bookmarks", {}).get("orders", {})
-        if "bulk_operation" in orders_bookmark:
-            del orders_bookmark["bulk_operation"]
-            singer.write_state(Context.state)
-
-    # pylint: disable=too-many-locals,too-many-statements
-    def get_objects(self):
-        last_updated_at = self.get_bookmark()
-        current_bookmark = last_updated_at
-        sync_start = utils.now().replace(microsecond=0)
-        query_template = self.remove_fields_from_query(Context.get_unselected_fields(self.name))
-        LOGGER.info(
-            "GraphQL query for stream '%s': %s",
-            self.name,
-            ' '.join(query_template.split())
-        )
-
-        bulk_op = Context.state.get("bookmarks", {}).get("orders", {}).get("bulk_operation")
-        op_id = None
-        existing_url = None
-
-        if bulk_op:
-            if bulk_op.get("last_date_window") != self.date_window_size:
-                LOGGER.info(
-                    "Clearing existing bulk operation state due to date "
-                    "window size change from %s to %s",
-                    bulk_op.get("last_date_window"),
-                    self.date_window_size
-                )
-                self.clear_bulk_operation_state()
-
-            else:
-                op_id = bulk_op.get("bulk_operation_id")
-                op_status = bulk_op.get("status")
-
-                if op_status in ["RUNNING", "COMPLETED"]:
-                    LOGGER.info("Resuming polling for existing bulk operation ID: %s", op_id)
-                    existing_url = self.poll_bulk_completion(current_bookmark, op_id)
-                else:
-                    self.clear_bulk_operation_state()
-
-        while last_updated_at < sync_start:
-            date_window_end = last_updated_at + timedelta(days=self.date_window_size)
-            query_end = min(sync_start, date_window_end)
-
-            if not existing_url:
-                existing_url = self.submit_and_poll_bulk_query(
-                    query_template,
-                    last_updated_at,
-                    query_end,
-                    current_bookmark
-                )
-            if existing_url:
-                for obj in self.parse_bulk_jsonl(existing_url):
-                    replication_value = utils.strptime_to_utc(obj[self.replication_key])
-                    current_bookmark = max(current_bookmark, replication_value)
-
-                    yield obj
-            else:
-                LOGGER.info("No data returned for the date range: %s to %s",
-                               last_updated_at, query_end)
-
-            self.clear_bulk_operation_state()
-            last_updated_at = query_end
-            max_bookmark_value = min(sync_start, current_bookmark)
-            self.update_bookmark(utils.strftime(max_bookmark_value))
-            existing_url = None
-
-    @backoff.on_exception(
-        backoff.expo,
-        BulkOperationInProgressError,
-        max_tries=7,
-        factor=10,
-        jitter=None,
-        on_backoff=lambda details: LOGGER.warning(
-            "Bulk operation already in progress (ID: %s). "
-            "Retry attempt %d after %.2f seconds. Total elapsed: %.2f seconds.",
-            getattr(details['exception'], 'bulk_op_id', 'UNKNOWN'),
-            details['tries'],
-            details['wait'],
-            details['elapsed']
-        )
-    )
-    def submit_and_poll_bulk_query(
-        self, query_template, last_updated_at, query_end, current_bookmark
-        ):
-        """Submit bulk query and poll for completion with automatic retry on conflicts"""
-        with metrics.http_request_timer(self.name):
-            query_filter = self.build_query_filter(
-                utils.strftime(last_updated_at),
-                utils.strftime(query_end)
-            )
-            query = query_template % query_filter
-            LOGGER.info("Fetching records in date range: %s", query_filter)
-
-            bulk_op_data = self.submit_bulk_query(query)
-
-            user_errors = (
-                bulk_op_data.get("data", {})
-                .get("bulkOperationRunQuery", {})
-                .get("userErrors")
-            )
-
-            if user_errors:
-                for error in user_errors:
-                    message = error.get("message", "")
-                    if (
-                        "bulk query operation for this app and shop is already in progress"
-                        in message
-                        ):
-                        # Extract BulkOperation ID using regex
-                        match = re.search(r"gid://shopify/BulkOperation/\d+", message)
-                        bulk_op_id = match.group(0) if match else None
-
-                        LOGGER.info("Detected concurrent bulk operation (ID: %s)", bulk_op_id)
-                        raise BulkOperationInProgressError(
-                            f"Bulk operation already in progress: {bulk_op_id}",
-                            bulk_op_id=bulk_op_id
-                        )
-
-                # Handle other user errors
-                raise ShopifyAPIError("Bulk query error: {}".format(user_errors))
-
-            bulk_operation = (
-                bulk_op_data.get("data", {})
-                .get("bulkOperationRunQuery", {})
-                .get("bulkOperation")
-            )
-            bulk_op_id = bulk_operation.get("id") if bulk_operation else None
-            if not bulk_op_id:
-                raise ShopifyAPIError("Invalid bulk operation response: {}".format(bulk_op_data))
-
-            return self.poll_bulk_completion(current_bookmark, bulk_op_id)
-
 
 Context.stream_objects["orders"] = Orders
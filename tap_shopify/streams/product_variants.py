@@ -7,6 +7,7 @@ class ProductVariants(Stream):
     name = "product_variants"
     data_key = "productVariants"
     replication_key = "updatedAt"
+    bulk_supported = True
 
     def transform_object(self, obj):
         """
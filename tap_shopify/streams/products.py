@@ -8,6 +8,7 @@ class Products(Stream):
     name = "products"
     data_key = "products"
     replication_key = "updatedAt"
+    bulk_supported = True
 
     def transform_object(self, obj):
         """
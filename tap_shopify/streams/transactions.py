@@ -1,5 +1,5 @@
 from datetime import timedelta
-from singer import metrics, utils
+from singer import utils
 from tap_shopify.context import Context
 from tap_shopify.streams.base import Stream
 
@@ -11,6 +11,16 @@ class Transactions(Stream):
     data_key = "orders"
     child_data_key = "transactions"
     replication_key = "createdAt"
+    bulk_supported = True
+    # Synced from a scan of orders shared with the other order child streams
+    parent_scan = "orders"
+    # Its bookmark is written after every date window
+    bookmark_each_window = True
+    skip_before_bookmark = True
+
+    def get_child_objects(self, node):
+        """Yields the transactions of an order node."""
+        yield from node.get(self.child_data_key, [])
 
     # pylint: disable=W0221
     def get_query_params(self, updated_at_min, updated_at_max, cursor=None):
@@ -53,37 +63,25 @@ class Transactions(Stream):
         last_updated_at = self.get_bookmark() - timedelta(minutes=1)
         initial_bookmark_time = current_bookmark = self.get_bookmark()
         sync_start = utils.now().replace(microsecond=0)
-        query = self.remove_fields_from_query(Context.get_unselected_fields(self.name))
+        query = self.get_selected_query()
 
         while last_updated_at < sync_start:
             date_window_end = last_updated_at + timedelta(days=self.date_window_size)
             query_end = min(sync_start, date_window_end)
-            cursor = None
-
-            while True:
-                query_params = self.get_query_params(last_updated_at, query_end, cursor)
-
-                with metrics.http_request_timer(self.name):
-                    data = self.call_api(query_params, query=query)
 
+            for data in self.get_pages(query, last_updated_at, query_end):
                 edges = data.get("edges", [])
                 for edge in edges:
                     node = edge.get("node", {})
-                    child_edges = node.get(self.child_data_key, [])
 
                     # Yield each transformed transaction object
-                    for child_obj in child_edges:
+                    for child_obj in self.get_child_objects(node):
                         replication_value = utils.strptime_with_tz(child_obj[self.replication_key])
                         current_bookmark = max(current_bookmark, replication_value)
                         # Perform the pseudo sync for the child objects
                         if replication_value >= initial_bookmark_time:
                             yield self.transform_object(child_obj)
 
-                page_info = data.get("pageInfo", {})
-                cursor = page_info.get("endCursor")
-                if not page_info.get("hasNextPage", False):
-                    break
-
             last_updated_at = query_end
             # Update bookmark to the latest value, but not beyond sync start time
             max_bookmark_value = min(sync_start, current_bookmark)
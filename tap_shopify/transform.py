@@ -0,0 +1,325 @@
+import datetime
+import decimal
+import re
+from singer.utils import strftime
+from singer.transform import (LOGGER as TRANSFORM_LOGGER, NO_INTEGER_DATETIME_PARSING, Error,
+                              SchemaMismatch, Transformer, breadcrumb_path)
+
+# The UTC timestamps Shopify returns, converted without dateutil. Anything else,
+# or any invalid date, goes through singer's parsing
+DATETIME_PATTERN = re.compile(r"([1-9]\d{3})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d{1,6}))?Z\Z")
+
+
+def get_path(path):
+    """The list of keys of a `(parent, key)` path, as singer's Transformer reports it."""
+    keys = []
+    while path is not None:
+        path, key = path
+        keys.append(key)
+    return keys[::-1]
+
+
+def transform_null(data, _path):
+    if data is None or data == "":
+        return True, None
+    return False, None
+
+
+def transform_string(data, _path):
+    if data is None:
+        return False, None
+    try:
+        return True, str(data)
+    except Exception: # pylint: disable=broad-except
+        return False, None
+
+
+def transform_integer(data, _path):
+    if isinstance(data, str):
+        data = data.replace(",", "")
+    try:
+        return True, int(data)
+    except Exception: # pylint: disable=broad-except
+        return False, None
+
+
+def transform_number(data, _path):
+    if isinstance(data, str):
+        data = data.replace(",", "")
+    try:
+        return True, float(data)
+    except Exception: # pylint: disable=broad-except
+        return False, None
+
+
+def transform_boolean(data, _path):
+    if isinstance(data, str) and data.lower() == "false":
+        return True, False
+    try:
+        return True, bool(data)
+    except Exception: # pylint: disable=broad-except
+        return False, None
+
+
+def transform_decimal(data, _path):
+    if isinstance(data, (str, float, int)):
+        try:
+            return True, str(decimal.Decimal(str(data)))
+        except Exception: # pylint: disable=broad-except
+            return False, None
+    if isinstance(data, decimal.Decimal):
+        try:
+            return True, "NaN" if data.is_snan() else str(data)
+        except Exception: # pylint: disable=broad-except
+            return False, None
+    return False, None
+
+
+def transform_unknown(_data, _path):
+    return False, None
+
+
+def transform_untyped(data, _path):
+    return True, data
+
+
+SIMPLE_TYPES = {
+    "null": transform_null,
+    "string": transform_string,
+    "integer": transform_integer,
+    "number": transform_number,
+    "boolean": transform_boolean,
+}
+
+
+class RecordTransformer(Transformer):
+    """
+    singer's Transformer compiled once for the schema and metadata of a stream.
+
+    `Transformer.transform` walks the whole schema for every record: it looks
+    up the metadata of every field, rebuilds the list of types and the path of
+    every value and matches the pattern properties again. Here the metadata is
+    turned into a filter of the only fields it drops or descends into, and
+    every schema node into a function with its types, child functions and
+    datetime handling resolved up front. Values are converted by the same
+    rules and in the same order, so records, filtered and removed paths and
+    the paths of schema mismatch errors are the same as singer's. Unlike
+    singer, the schema is left as it is, nulls are not moved last in its types.
+    """
+
+    def __init__(self, schema, metadata=None, integer_datetime_fmt=NO_INTEGER_DATETIME_PARSING):
+        super().__init__(integer_datetime_fmt)
+        self.filter_record = self.compile_filter(metadata, ()) if metadata else None
+        self.transform_root = self.compile_schema(schema)
+
+    def transform_record(self, record):
+        """Transforms `record` like `Transformer.transform(record, schema, metadata)`."""
+        if self.filter_record is not None:
+            record = self.filter_record(record)
+
+        success, transformed = self.transform_root(record, None)
+        if not success:
+            raise SchemaMismatch(self.errors)
+        return transformed
+
+    def compile_filter(self, metadata, parent):
+        """
+        Returns the filter of the data at breadcrumb `parent`, dropping the
+        unselected and unsupported fields, or None when no metadata applies
+        below it.
+        """
+        depth = len(parent)
+        below = [breadcrumb for breadcrumb in metadata
+                 if len(breadcrumb) > depth and breadcrumb[:depth] == parent]
+        if not below:
+            return None
+
+        # A field name and either the path it is filtered as or the filter of its value
+        actions = {}
+        fields = dict.fromkeys(breadcrumb[depth + 1] for breadcrumb in below
+                               if breadcrumb[depth] == "properties" and len(breadcrumb) > depth + 1)
+        for field_name in fields:
+            breadcrumb = parent + ("properties", field_name)
+            field_metadata = metadata.get(breadcrumb, {})
+            if field_metadata.get("inclusion") == "automatic":
+                continue
+            if (field_metadata.get("selected") is False
+                    or field_metadata.get("inclusion") == "unsupported"):
+                actions[field_name] = breadcrumb_path(breadcrumb)
+            else:
+                field_filter = self.compile_filter(metadata, breadcrumb)
+                if field_filter is not None:
+                    actions[field_name] = field_filter
+        items_filter = self.compile_filter(metadata, parent + ("items",))
+
+        if not actions and items_filter is None:
+            return None
+
+        def filter_data(data):
+            if isinstance(data, dict):
+                for field_name, action in actions.items():
+                    if field_name not in data:
+                        continue
+                    if isinstance(action, str):
+                        data.pop(field_name)
+                        self.filtered.add(action)
+                    else:
+                        data[field_name] = action(data[field_name])
+            elif isinstance(data, list) and items_filter is not None:
+                data = [items_filter(row) for row in data]
+            return data
+
+        return filter_data
+
+    def compile_schema(self, schema):
+        """Returns the function transforming a value of `schema` to (success, value)."""
+        if "anyOf" in schema:
+            return self.compile_any_of(schema)
+
+        if "type" not in schema:
+            # indicates no typing information so don't bother transforming it
+            return transform_untyped
+
+        types = list(schema["type"]) if isinstance(schema["type"], list) else [schema["type"]]
+        if "null" in types:
+            types.remove("null")
+            types.append("null")
+        transforms = [self.compile_type(typ, schema) for typ in types]
+
+        if len(types) == 2 and types[1] == "null" and types[0] != "boolean":
+            # Only booleans turn None into a value, None is null for every other type
+            transform = transforms[0]
+
+            def transform_nullable(data, path):
+                if data is None:
+                    return True, None
+                success, transformed = transform(data, path)
+                if success:
+                    return success, transformed
+                if data == "":
+                    return True, None
+                self.errors.append(Error(get_path(path), data, schema,
+                                         logging_level=TRANSFORM_LOGGER.level))
+                return False, None
+
+            return transform_nullable
+
+        def transform_value(data, path):
+            for transform in transforms:
+                success, transformed = transform(data, path)
+                if success:
+                    return success, transformed
+            self.errors.append(Error(get_path(path), data, schema,
+                                     logging_level=TRANSFORM_LOGGER.level))
+            return False, None
+
+        return transform_value
+
+    def compile_any_of(self, schema):
+        transforms = [self.compile_schema(subschema) for subschema in schema["anyOf"]]
+
+        def transform_any_of(data, path):
+            for transform in transforms:
+                success, transformed = transform(data, path)
+                if success:
+                    return success, transformed
+            self.errors.append(Error(get_path(path), data, schema,
+                                     logging_level=TRANSFORM_LOGGER.level))
+            return False, None
+
+        return transform_any_of
+
+    def compile_type(self, typ, schema):
+        """Returns the function transforming a value of `schema` as type `typ`."""
+        if typ == "null":
+            return transform_null
+
+        if schema.get("format") == "date-time":
+            def transform_datetime(data, _path):
+                match = DATETIME_PATTERN.match(data) if isinstance(data, str) else None
+                if match:
+                    fraction = match.group(7) or ""
+                    try:
+                        return True, strftime(datetime.datetime(
+                            *map(int, match.group(1, 2, 3, 4, 5, 6)),
+                            int(fraction.ljust(6, "0")), datetime.timezone.utc))
+                    except ValueError:
+                        pass
+                data = self._transform_datetime(data)
+                if data is None:
+                    return False, None
+                return True, data
+            return transform_datetime
+
+        if schema.get("format") == "singer.decimal":
+            return transform_decimal
+
+        if typ == "object":
+            return self.compile_object(schema.get("properties", {}),
+                                       schema.get("patternProperties"))
+
+        if typ == "array":
+            return self.compile_array(schema)
+
+        return SIMPLE_TYPES.get(typ, transform_unknown)
+
+    def compile_object(self, properties, pattern_properties):
+        if properties == {} and not pattern_properties:
+            # Don't touch an empty schema
+            return lambda data, _path: (isinstance(data, dict), data)
+
+        transforms = {key: self.compile_schema(subschema)
+                      for key, subschema in properties.items()}
+        patterns = [(re.compile(pattern), subschema)
+                    for pattern, subschema in (pattern_properties or {}).items()]
+        pattern_transforms = {}
+
+        def get_pattern_transform(key):
+            # Keys matching pattern properties are transformed with anyOf the matches
+            if key not in pattern_transforms:
+                pattern_schemas = [subschema for pattern, subschema in patterns
+                                   if pattern.match(key)]
+                pattern_transforms[key] = (self.compile_schema({"anyOf": pattern_schemas})
+                                           if pattern_schemas else None)
+            return pattern_transforms[key]
+
+        def transform_object(data, path):
+            if not isinstance(data, dict):
+                return False, data
+
+            result = {}
+            success = True
+            for key, value in data.items():
+                transform = transforms.get(key)
+                if transform is None and patterns:
+                    transform = get_pattern_transform(key)
+                if transform is None:
+                    self.removed.add(".".join(map(str, get_path(path) + [key])))
+                    continue
+                value_success, result[key] = transform(value, (path, key))
+                success = success and value_success
+            return success, result
+
+        return transform_object
+
+    def compile_array(self, schema):
+        if "items" not in schema:
+            def transform_without_items(_data, _path):
+                raise KeyError("items")
+            return transform_without_items
+
+        transform_item = self.compile_schema(schema["items"])
+
+        def transform_array(data, path):
+            if not isinstance(data, list):
+                return False, data
+
+            result = []
+            success = True
+            for index, row in enumerate(data):
+                row_success, transformed = transform_item(row, (path, index))
+                success = success and row_success
+                result.append(transformed)
+            return success, result
+
+        return transform_array
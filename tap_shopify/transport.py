@@ -0,0 +1,116 @@
+import http.client
+import io
+import json
+import socket
+import threading
+import urllib.error
+from urllib.error import URLError
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+from tap_shopify.context import Context
+
+# Number of keep-alive connections kept open per host
+DEFAULT_POOL_SIZE = 10
+
+# Seconds allowed to establish a connection, the read timeout comes from `request_timeout`
+DEFAULT_CONNECT_TIMEOUT = 30
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_pool_size():
+    pool_size = DEFAULT_POOL_SIZE
+    pool_size_from_config = Context.config.get('http_pool_size')
+    # ignore 0, "0" and "" the same way `request_timeout` does
+    if pool_size_from_config and int(pool_size_from_config):
+        pool_size = int(pool_size_from_config)
+    return pool_size
+
+
+def get_connect_timeout():
+    connect_timeout = DEFAULT_CONNECT_TIMEOUT
+    timeout_from_config = Context.config.get('http_connect_timeout')
+    if timeout_from_config and float(timeout_from_config):
+        connect_timeout = float(timeout_from_config)
+    return connect_timeout
+
+
+def get_session():
+    """
+    Returns the process wide `requests.Session`, creating it on first use.
+    Every GraphQL page, bulk operation call and token refresh goes through this
+    session so the TCP + TLS connection to the shop is reused between requests.
+    """
+    global _SESSION # pylint: disable=global-statement
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                pool_size = get_pool_size()
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _SESSION = session
+    return _SESSION
+
+
+def close_session():
+    """Closes the pooled connections, the next `get_session` call opens a new pool."""
+    global _SESSION # pylint: disable=global-statement
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            _SESSION.close()
+            _SESSION = None
+
+
+def get_timeout(read_timeout=None):
+    return (get_connect_timeout(), read_timeout)
+
+
+def post_json(url, payload, headers, timeout=None, stream=False):
+    """
+    POSTs `payload` as JSON over the pooled session and returns the response.
+    With `stream` only the headers are read, see `iter_body`.
+
+    Transport failures and non-2xx responses are re-raised as the urllib/socket
+    exceptions raised by the SDK's original `urlopen` implementation, so the
+    retry decorators in `shopify_error_handling` keep behaving the same way.
+    """
+    body = json.dumps(payload).encode("utf-8")
+    try:
+        response = get_session().post(url, data=body, headers=headers,
+                                      timeout=get_timeout(timeout), stream=stream)
+    except requests.exceptions.Timeout as exc:
+        raise socket.timeout("The read operation timed out") from exc
+    except requests.exceptions.ChunkedEncodingError as exc:
+        raise http.client.IncompleteRead(b'') from exc
+    except requests.exceptions.ConnectionError as exc:
+        raise URLError(exc) from exc
+
+    if response.status_code >= 400:
+        raise urllib.error.HTTPError(url,
+                                     response.status_code,
+                                     response.reason,
+                                     response.headers,
+                                     io.BytesIO(response.content))
+    return response
+
+
+def iter_body(response, chunk_size):
+    """
+    Yields the body of a streamed response in chunks and releases its
+    connection to the pool once read. Errors reading the body are raised as
+    `post_json` raises them.
+    """
+    try:
+        yield from response.iter_content(chunk_size)
+    except requests.exceptions.ChunkedEncodingError as exc:
+        raise http.client.IncompleteRead(b'') from exc
+    except requests.exceptions.ConnectionError as exc:
+        if exc.args and isinstance(exc.args[0], ReadTimeoutError):
+            raise socket.timeout("The read operation timed out") from exc
+        raise URLError(exc) from exc
+    finally:
+        response.close()
@@ -1,8 +1,12 @@
 import json
+import threading
+import time
 import unittest
 from unittest.mock import patch, MagicMock
+import urllib.error
 from datetime import datetime
 from dateutil.tz import tzlocal
+import shopify
 from itertools import cycle
 from tap_shopify.streams.base import Stream, ShopifyAPIError
 from tap_shopify.context import Context
@@ -100,6 +104,31 @@ class TestStream(unittest.TestCase):
 
         self.assertEqual(result, {})
 
+    @patch('time.sleep')
+    @patch.object(Context.throttle, 'acquire')
+    @patch('shopify.GraphQL')
+    def test_fetch_count_retried_and_throttled(self, mock_graphql, mock_acquire, _mock_sleep):
+        """Count queries are throttled and retried after 5xx and THROTTLED responses."""
+        mock_graphql.return_value.execute.side_effect = [
+            urllib.error.HTTPError("https://shop", 503, "Service Unavailable", {}, None),
+            json.dumps({"errors": [{"message": "Throttled",
+                                    "extensions": {"code": "THROTTLED"}}]}),
+            json.dumps({"data": {"productsCount": {"count": 40}},
+                        "extensions": {"cost": {"requestedQueryCost": 1}}}),
+        ]
+
+        self.assertEqual(self.stream.fetch_count("products", "updated_at:>='2025'"), 40)
+        self.assertEqual(mock_acquire.call_count, 3)
+
+    @patch('shopify.GraphQL')
+    def test_fetch_count_errors_checked_first(self, mock_graphql):
+        """A count query answered with errors has no count, whatever its data."""
+        mock_graphql.return_value.execute.return_value = json.dumps(
+            {"data": {"productsCount": {"count": 0}},
+             "errors": [{"message": "Field 'productsCount' doesn't exist"}]})
+
+        self.assertIsNone(self.stream.fetch_count("products", "updated_at:>='2025'"))
+
     @patch('shopify.GraphQL')
     @patch.object(Stream, 'get_query', return_value=mock_query())
     @patch.object(Stream, 'transform_object', side_effect=lambda x: x)
@@ -136,3 +165,184 @@ class TestStream(unittest.TestCase):
         self.assertEqual(len(objects), 4)
         self.assertEqual(objects[0], {"id": "mocked_id_1", "updatedAt": "2025-01-01T00:00:00Z"})
         self.assertEqual(objects[1], {"id": "mocked_id_2", "updatedAt": "2025-01-01T00:00:00Z"})
+
+
+class TestPrefetchPages(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, Context, "config", Context.config)
+        Context.config = {"start_date": "2025-01-01T00:00:00Z"}
+        self.stream = Stream()
+        self.stream.name = "products"
+        self.fetched = []
+
+    def call_api(self, query_params, query=None):
+        page = len(self.fetched) + 1
+        self.fetched.append(page)
+        if page == self.fail_at:
+            raise ShopifyAPIError("page {} failed".format(page))
+        return {"edges": [page], "pageInfo": {"endCursor": str(page), "hasNextPage": page < 4}}
+
+    def test_one_page_ahead(self):
+        """The next page is fetched while the current one is processed, never two ahead."""
+        self.fail_at = None
+        with patch.object(Stream, "call_api", side_effect=self.call_api):
+            pages = self.stream.get_pages("query", "2025-01-01", "2025-01-02")
+            first = next(pages)
+            # Wait for the prefetch of the second page to finish
+            time.sleep(0.1)
+            self.assertEqual(first["edges"], [1])
+            self.assertEqual(self.fetched, [1, 2])
+            self.assertEqual([page["edges"] for page in pages], [[2], [3], [4]])
+
+    def test_error_raised_in_page_order(self):
+        """A failed prefetch is raised after the pages before it were consumed."""
+        self.fail_at = 3
+        consumed = []
+        with patch.object(Stream, "call_api", side_effect=self.call_api):
+            with self.assertRaises(ShopifyAPIError):
+                for page in self.stream.get_pages("query", "2025-01-01", "2025-01-02"):
+                    consumed.extend(page["edges"])
+        self.assertEqual(consumed, [1, 2])
+
+    def test_prefetch_disabled(self):
+        self.fail_at = None
+        Context.config["prefetch_pages"] = "false"
+        with patch.object(Stream, "call_api", side_effect=self.call_api), \
+             patch("tap_shopify.streams.base.prefetch_pages") as mock_prefetch_pages:
+            pages = list(self.stream.get_pages("query", "2025-01-01", "2025-01-02"))
+        self.assertEqual(len(pages), 4)
+        mock_prefetch_pages.assert_not_called()
+
+    @patch("tap_shopify.transport.post_json")
+    def test_token_sent_from_prefetch_thread(self, mock_post_json):
+        """Pages fetched by the prefetch worker thread carry the access token."""
+        Context.config["access_token"] = "token"
+        shopify.ShopifyResource.activate_session(
+            shopify.Session("test-shop", "2025-07", "token"))
+        self.addCleanup(shopify.ShopifyResource.clear_session)
+        self.stream.data_key = "products"
+        sent = []
+
+        def post_json(url, data, headers, timeout=None):
+            page = len(sent) + 1
+            sent.append((threading.current_thread().name, headers.get("X-Shopify-Access-Token")))
+            connection = {"edges": [], "pageInfo": {"endCursor": str(page),
+                                                    "hasNextPage": page < 3}}
+            return MagicMock(content=json.dumps({"data": {"products": connection}}).encode())
+
+        mock_post_json.side_effect = post_json
+        list(self.stream.get_pages("query", "2025-01-01", "2025-01-02"))
+
+        self.assertEqual(len(sent), 3)
+        self.assertTrue(all(name.startswith("products-prefetch") for name, _ in sent))
+        self.assertEqual({token for _, token in sent}, {"token"})
+
+
+class TestStreamResponses(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, Context, "config", Context.config)
+        Context.config = {"start_date": "2025-01-01T00:00:00Z", "stream_responses": "true"}
+        self.stream = Stream()
+        self.stream.name = self.stream.data_key = "products"
+        self.read = []
+
+    def page(self, ids, has_next_page=False, errors=None):
+        connection = {"edges": [{"node": {"id": i, "updatedAt": "2025-01-01T00:00:00Z"}}
+                                for i in ids],
+                      "pageInfo": {"endCursor": str(ids[-1]), "hasNextPage": has_next_page}}
+        response = {"data": {"products": connection},
+                    "extensions": {"cost": {"requestedQueryCost": 10}}}
+        if errors:
+            response["errors"] = errors
+        return json.dumps(response).encode("utf-8")
+
+    def body(self, encoded):
+        for start in range(0, len(encoded), 16):
+            self.read.append(start)
+            yield encoded[start:start + 16]
+
+    def objects(self, query_params=None):
+        return self.stream.stream_page_objects(
+            "query", query_params or {"query": "", "first": 250})
+
+    @patch("tap_shopify.response_reader.READ_AHEAD", 64)
+    @patch("shopify.GraphQL")
+    def test_objects_yielded_while_reading(self, mock_graphql):
+        """Each object is handed on once decoded, the next page follows the pageInfo."""
+        bodies = [self.page([1, 2, 3], has_next_page=True), self.page([4])]
+        mock_graphql.return_value.execute_stream.side_effect = [self.body(bodies[0]),
+                                                                self.body(bodies[1])]
+
+        objects = self.stream.stream_objects("query", "2025-01-01", "2025-01-02")
+        self.assertEqual(next(objects)["id"], 1)
+        self.assertLess(len(self.read), len(bodies[0]) / 16)
+
+        self.assertEqual([obj["id"] for obj in objects], [2, 3, 4])
+        variables = [call.kwargs["variables"] for call
+                     in mock_graphql.return_value.execute_stream.call_args_list]
+        self.assertEqual(variables[1]["after"], "3")
+        mock_graphql.return_value.execute.assert_not_called()
+
+    @patch("shopify.GraphQL")
+    def test_max_cost_fetched_again(self, mock_graphql):
+        """A page too expensive is fetched again with call_api with fewer records."""
+        errors = [{"message": "Query cost is 2000, which exceeds the single query max cost "
+                              "limit (1000).", "extensions": {"code": "MAX_COST_EXCEEDED",
+                                                              "cost": 2000, "maxCost": 1000}}]
+        mock_graphql.return_value.execute_stream.return_value = self.body(
+            json.dumps({"errors": errors}).encode("utf-8"))
+        mock_graphql.return_value.execute.return_value = self.page([1, 2]).decode("utf-8")
+
+        self.assertEqual([obj["id"] for obj in self.objects()], [1, 2])
+        variables = mock_graphql.return_value.execute.call_args.kwargs["variables"]
+        self.assertLess(variables["first"], 250)
+
+    @patch("tap_shopify.response_reader.READ_AHEAD", 64)
+    @patch("shopify.GraphQL")
+    def test_broken_body_fetched_again(self, mock_graphql):
+        """The objects of a page that broke off are emitted again from call_api."""
+        encoded = self.page([1, 2, 3])
+        mock_graphql.return_value.execute_stream.return_value = self.body(
+            encoded[:len(encoded) // 2])
+        mock_graphql.return_value.execute.return_value = encoded.decode("utf-8")
+
+        ids = [obj["id"] for obj in self.objects()]
+
+        self.assertEqual(ids[:1], [1])
+        self.assertEqual(ids[-3:], [1, 2, 3])
+        mock_graphql.return_value.execute.assert_called_once()
+
+    @patch("shopify.GraphQL")
+    def test_http_error_fetched_again(self, mock_graphql):
+        mock_graphql.return_value.execute_stream.side_effect = urllib.error.HTTPError(
+            "https://shop", 503, "Service Unavailable", {}, None)
+        mock_graphql.return_value.execute.return_value = self.page([1]).decode("utf-8")
+
+        self.assertEqual([obj["id"] for obj in self.objects()], [1])
+
+    @patch("shopify.GraphQL")
+    def test_errors_after_objects_raised(self, mock_graphql):
+        mock_graphql.return_value.execute_stream.return_value = self.body(
+            self.page([1], errors=[{"message": "Internal error"}]))
+
+        with self.assertRaises(ShopifyAPIError):
+            list(self.objects())
+        mock_graphql.return_value.execute.assert_not_called()
+
+    def test_not_streamed_with_page_transform(self):
+        """Streams transforming whole pages and bulk operations get complete pages."""
+        self.assertTrue(self.stream.use_streamed_pages("query"))
+
+        class PageStream(Stream):
+            name = data_key = "collections"
+
+            def transform_page(self, edges):
+                return edges
+
+        self.assertFalse(PageStream().use_streamed_pages("query"))
+        with patch.object(Stream, "get_bulk_operation", return_value=MagicMock()):
+            self.assertFalse(self.stream.use_streamed_pages("query"))
+        Context.config["stream_responses"] = False
+        self.assertFalse(self.stream.use_streamed_pages("query"))
@@ -0,0 +1,559 @@
+import json
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+import shopify
+from graphql import parse, print_ast
+from singer import utils
+
+from tap_shopify.context import Context
+from tap_shopify.exceptions import (BulkOperationFailedError, BulkQueryNotSupportedError,
+                                    BulkRecordClosedError, SyncStoppedError)
+from tap_shopify.streams.bulk import (BulkOperation, BulkOperationProgress, BulkQueryBuilder,
+                                      BulkRecordAssembler, MAX_OPEN_RECORDS_DOUBLINGS)
+from tap_shopify.streams.orders import Orders
+from tap_shopify.streams.order_shipping_lines import OrderShippingLines
+from tap_shopify.streams.customers import Customers
+from tap_shopify.streams.products import Products
+from tap_shopify.streams.fulfillment_orders import FulfillmentOrders
+
+
+PRODUCTS_QUERY = """
+query GetProducts($first: Int!, $after: String, $query: String) {
+    products(first: $first, after: $after, query: $query, sortKey: UPDATED_AT) {
+        edges {
+            node {
+                id
+                updatedAt
+                media(first: 250) {
+                    edges {
+                        node {
+                            id
+                        }
+                    }
+                }
+            }
+        }
+        pageInfo {
+            endCursor
+            hasNextPage
+        }
+    }
+}
+"""
+
+ORDERS_QUERY = """
+query GetOrders($first: Int!, $after: String, $query: String) {
+    orders(first: $first, after: $after, query: $query) {
+        nodes {
+            id
+            fulfillments {
+                fulfillmentLineItems(first: 10) {
+                    nodes {
+                        id
+                        lineItem {
+                            id
+                        }
+                    }
+                }
+            }
+            refunds {
+                id
+                refundLineItems(first: 10) {
+                    edges {
+                        node {
+                            quantity
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+
+def jsonl(*records, offset=0):
+    """Lines of a result file starting at `offset`, with the offset of their end."""
+    lines = []
+    for rec in records:
+        line = json.dumps(rec).encode("utf-8")
+        offset += len(line) + 1
+        lines.append((line, offset))
+    return lines
+
+
+class TestBulkQueryBuilder(unittest.TestCase):
+
+    def test_build_bulk_query(self):
+        """Pagination, pageInfo and variables are removed and the filter is inlined."""
+        builder = BulkQueryBuilder(PRODUCTS_QUERY)
+        expected = """
+        {
+            products(sortKey: UPDATED_AT, query: "updated_at:>='2025-01-01'") {
+                edges {
+                    node {
+                        id
+                        updatedAt
+                        media {
+                            edges {
+                                node {
+                                    id
+                                    _sdc_bulk_edges__media: __typename
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+        """
+        self.assertEqual(builder.build("updated_at:>='2025-01-01'"), print_ast(parse(expected)))
+        self.assertEqual(list(builder.plan.connections), ["media"])
+
+    def test_unsupported_query(self):
+        """Queries over the bulk connection limits are rejected."""
+        Context.config = {"start_date": "2025-01-01T00:00:00Z"}
+        with self.assertRaises(BulkQueryNotSupportedError):
+            BulkQueryBuilder(FulfillmentOrders().get_query())
+
+
+class TestBulkRecordAssembler(unittest.TestCase):
+
+    def setUp(self):
+        self.plan = BulkQueryBuilder(ORDERS_QUERY).plan
+
+    def assemble(self, lines, max_open_records=100):
+        assembler = BulkRecordAssembler(self.plan, max_open_records)
+        records = []
+        for line in lines:
+            records.extend(assembler.add(dict(line)))
+        records.extend(assembler.flush())
+        return records, assembler
+
+    def test_nested_connections(self):
+        """Children are attached to nested objects at any depth, interleaved with other records."""
+        records, assembler = self.assemble([
+            {"id": "Order/1", "fulfillments": [{"id": "Fulfillment/1"}],
+             "refunds": [{"id": "Refund/1"}]},
+            {"id": "Order/2", "fulfillments": [], "refunds": []},
+            {"id": "FulfillmentLineItem/1", "lineItem": {"id": "LineItem/1"},
+             "_sdc_bulk_nodes__fulfillmentLineItems": "FulfillmentLineItem",
+             "__parentId": "Fulfillment/1"},
+            {"quantity": 2, "_sdc_bulk_edges__refundLineItems": "RefundLineItem",
+             "__parentId": "Refund/1"},
+        ])
+
+        self.assertEqual([rec["id"] for rec in records], ["Order/1", "Order/2"])
+        fulfillment = records[0]["fulfillments"][0]
+        self.assertEqual(fulfillment["fulfillmentLineItems"]["nodes"],
+                         [{"id": "FulfillmentLineItem/1", "lineItem": {"id": "LineItem/1"}}])
+        self.assertEqual(records[0]["refunds"][0]["refundLineItems"]["edges"],
+                         [{"node": {"quantity": 2}}])
+        self.assertEqual(records[1]["refunds"], [])
+        self.assertEqual(assembler.index, {})
+
+    def test_window_is_bounded(self):
+        """The oldest record is completed when the window is full, a late child raises."""
+        assembler = BulkRecordAssembler(self.plan, max_open_records=2)
+
+        self.assertEqual(assembler.add({"id": "Order/1", "refunds": [{"id": "Refund/1"}]}), [])
+        self.assertEqual(assembler.add({"id": "Order/2", "refunds": []}), [])
+        completed = assembler.add({"id": "Order/3", "refunds": []})
+
+        self.assertEqual([rec["id"] for rec in completed], ["Order/1"])
+        self.assertNotIn("Refund/1", assembler.index)
+        with self.assertRaises(BulkRecordClosedError):
+            assembler.add({"quantity": 1, "__parentId": "Refund/1",
+                           "_sdc_bulk_edges__refundLineItems": "RefundLineItem"})
+
+    def test_unbounded_window(self):
+        """Without max_open_records every record stays open until the end of the file."""
+        assembler = BulkRecordAssembler(self.plan, max_open_records=None)
+        for number in range(1, 4):
+            self.assertEqual(assembler.add({"id": "Order/{}".format(number), "refunds": []}), [])
+        self.assertEqual([rec["id"] for rec in assembler.flush()],
+                         ["Order/1", "Order/2", "Order/3"])
+
+    def test_records_without_connections(self):
+        """Records of queries without nested connections are returned right away."""
+        assembler = BulkRecordAssembler(BulkQueryBuilder(
+            "{ orders(first: 10) { nodes { id } } }").plan, max_open_records=1)
+        self.assertEqual(assembler.add({"id": "Order/1"}), [{"id": "Order/1"}])
+        self.assertEqual(list(assembler.flush()), [])
+
+
+@patch("tap_shopify.streams.bulk.time.monotonic", return_value=0.0)
+class TestBulkOperationProgress(unittest.TestCase):
+
+    def test_backoff_without_estimate(self, mock_monotonic):
+        """The interval doubles while stalled and grows by half while objects are counted."""
+        progress = BulkOperationProgress("orders", "gid://shopify/BulkOperation/1")
+        mock_monotonic.return_value = 10.0
+
+        self.assertEqual(progress.update(0), 2)
+        self.assertEqual(progress.update(0), 4)
+        self.assertEqual(progress.update(500), 6)
+        for _ in range(10):
+            progress.update(0)
+        self.assertEqual(progress.interval, 60)
+
+    def test_poll_halfway_to_estimated_completion(self, mock_monotonic):
+        """With a known object count the next poll is halfway to the estimated completion."""
+        progress = BulkOperationProgress("orders", "gid://shopify/BulkOperation/1",
+                                         expected_count=10000)
+        mock_monotonic.return_value = 20.0
+
+        # 2000 objects in 20 seconds, 8000 remaining at 100 per second
+        self.assertEqual(progress.update(2000), 40)
+        self.assertEqual(progress.get_eta(), 80)
+
+        mock_monotonic.return_value = 99.0
+        self.assertEqual(progress.update(9900), 1)
+
+
+class TestBulkOperation(unittest.TestCase):
+
+    def setUp(self):
+        Context.config = {"start_date": "2025-01-01T00:00:00Z"}
+        Context.state = {}
+
+    @patch.object(BulkOperation, "iter_lines")
+    def test_parse_jsonl(self, mock_iter_lines):
+        """Child lines are attached to the connection of their parent, in the paginated shape."""
+        mock_iter_lines.return_value = jsonl(
+            {"id": "gid://shopify/Product/1", "updatedAt": "2025-01-01T00:00:00Z"},
+            {"id": "gid://shopify/MediaImage/1", "_sdc_bulk_edges__media": "MediaImage",
+             "__parentId": "gid://shopify/Product/1"},
+            {"id": "gid://shopify/Product/2", "updatedAt": "2025-01-02T00:00:00Z"},
+        )
+        stream = Products()
+        bulk_operation = BulkOperation(stream)
+        plan = bulk_operation.get_builder(PRODUCTS_QUERY).plan
+
+        records = [rec for rec, _ in bulk_operation.parse_jsonl("https://storage", plan)]
+
+        self.assertEqual(records, [
+            {"id": "gid://shopify/Product/1", "updatedAt": "2025-01-01T00:00:00Z",
+             "media": {"edges": [{"node": {"id": "gid://shopify/MediaImage/1"}}],
+                       "pageInfo": {"hasNextPage": False, "endCursor": None}}},
+            {"id": "gid://shopify/Product/2", "updatedAt": "2025-01-02T00:00:00Z",
+             "media": {"edges": [], "pageInfo": {"hasNextPage": False, "endCursor": None}}},
+        ])
+        # The transform of the paginated path works on bulk records unchanged
+        self.assertEqual(stream.transform_object(records[0])["media"],
+                         [{"id": "gid://shopify/MediaImage/1"}])
+
+    @patch.object(BulkOperation, "iter_lines")
+    def test_parse_jsonl_late_child(self, mock_iter_lines):
+        """A child after its record left the window only makes that record emitted again."""
+        lines = jsonl(
+            {"id": "gid://shopify/Product/1"},
+            {"id": "gid://shopify/Product/2"},
+            {"id": "gid://shopify/Product/3"},
+            {"id": "gid://shopify/MediaImage/1", "_sdc_bulk_edges__media": "MediaImage",
+             "__parentId": "gid://shopify/Product/2"},
+            {"id": "gid://shopify/Product/4"},
+            offset=100)
+        mock_iter_lines.side_effect = lambda url, offset=0: iter(
+            [line for line in lines if line[1] > offset])
+        Context.config["bulk_max_open_records"] = 1
+        bulk_operation = BulkOperation(Products())
+        plan = bulk_operation.get_builder(PRODUCTS_QUERY).plan
+
+        with self.assertLogs(level="WARNING"):
+            records = [rec for rec, _ in bulk_operation.parse_jsonl("https://storage", plan,
+                                                                    offset=100)]
+
+        self.assertEqual([rec["id"].split("/")[-1] for rec in records], ["1", "2", "2", "3", "4"])
+        self.assertEqual(records[1]["media"]["edges"], [])
+        self.assertEqual(records[2]["media"]["edges"],
+                         [{"node": {"id": "gid://shopify/MediaImage/1"}}])
+        # Read again from the checkpoint, not from the start of the file
+        self.assertEqual([call.args for call in mock_iter_lines.call_args_list],
+                         [("https://storage", 100), ("https://storage", 100)])
+
+    @patch.object(BulkOperation, "iter_lines")
+    def test_parse_jsonl_late_child_gives_up(self, mock_iter_lines):
+        """A window doubled MAX_OPEN_RECORDS_DOUBLINGS times too small raises."""
+        records = [{"id": "gid://shopify/Product/{}".format(number)} for number in range(40)]
+        lines = jsonl(*records, {"id": "gid://shopify/MediaImage/1",
+                                 "_sdc_bulk_edges__media": "MediaImage",
+                                 "__parentId": "gid://shopify/Product/0"})
+        mock_iter_lines.side_effect = lambda url, offset=0: iter(lines)
+        Context.config["bulk_max_open_records"] = 1
+        bulk_operation = BulkOperation(Products())
+        plan = bulk_operation.get_builder(PRODUCTS_QUERY).plan
+
+        with self.assertLogs(level="WARNING"), \
+                self.assertRaisesRegex(BulkRecordClosedError, "bulk_max_open_records"):
+            list(bulk_operation.parse_jsonl("https://storage", plan))
+        self.assertEqual(mock_iter_lines.call_count, MAX_OPEN_RECORDS_DOUBLINGS + 1)
+
+    @patch("tap_shopify.streams.bulk.SpooledBulkResultFile")
+    @patch.object(BulkOperation, "iter_lines")
+    def test_parallel_download_opt_in(self, mock_iter_lines, mock_spooled_file):
+        """`bulk_download_workers` above 1 reads the result file through the spool."""
+        mock_spooled_file.return_value.iter_records.return_value = [({"id": "Product/1"}, 20)]
+        Context.config = {"start_date": "2025-01-01T00:00:00Z", "bulk_download_workers": "4"}
+        bulk_operation = BulkOperation(Products())
+
+        records = list(bulk_operation.iter_records("https://storage"))
+
+        self.assertEqual(records, [({"id": "Product/1"}, 20)])
+        mock_spooled_file.assert_called_once_with("https://storage", 4, None, 0)
+        mock_iter_lines.assert_not_called()
+
+    @patch.object(BulkOperation, "iter_lines")
+    @patch.object(BulkOperation, "submit_and_poll", return_value="https://storage")
+    def test_get_pages(self, mock_submit_and_poll, mock_iter_lines):
+        """Records are returned in pages of results_per_page and the bulk state is cleared."""
+        mock_iter_lines.return_value = jsonl(
+            *[{"id": "gid://shopify/Product/{}".format(i)} for i in range(5)])
+        Context.state = {"bookmarks": {"products": {"bulk_operation": {"status": "FAILED"}}}}
+        stream = Products()
+        stream.results_per_page = 2
+
+        pages = list(BulkOperation(stream).get_pages(PRODUCTS_QUERY, "updated_at:>='2025'"))
+
+        self.assertEqual([len(page["edges"]) for page in pages], [2, 2, 1])
+        self.assertFalse(pages[-1]["pageInfo"]["hasNextPage"])
+        self.assertIn('query: "updated_at:>=\'2025\'"', mock_submit_and_poll.call_args[0][0])
+        self.assertNotIn("bulk_operation", Context.state["bookmarks"]["products"])
+
+    @patch("tap_shopify.streams.bulk.BULK_CHECKPOINT_INTERVAL", 0)
+    @patch.object(BulkOperation, "iter_lines")
+    @patch.object(BulkOperation, "submit_and_poll", return_value="https://storage")
+    def test_checkpoint(self, mock_submit_and_poll, mock_iter_lines):
+        """The offset after the last emitted page is saved in the bulk operation state."""
+        lines = jsonl(
+            {"id": "gid://shopify/Product/1"},
+            {"id": "gid://shopify/MediaImage/1", "_sdc_bulk_edges__media": "MediaImage",
+             "__parentId": "gid://shopify/Product/1"},
+            {"id": "gid://shopify/Product/2"},
+            {"id": "gid://shopify/Product/3"},
+        )
+        mock_iter_lines.return_value = lines
+        Context.config["bulk_max_open_records"] = 1
+        stream = Products()
+        stream.results_per_page = 1
+        pages = BulkOperation(stream).get_pages(PRODUCTS_QUERY, "updated_at:>='2025'")
+
+        next(pages)
+        next(pages)
+
+        # Product 1 and its media were emitted, the file resumes at product 2
+        bulk_state = Context.state["bookmarks"]["products"]["bulk_operation"]
+        self.assertEqual(bulk_state, {"file_offset": lines[1][1], "records_emitted": 1})
+
+    @patch.object(BulkOperation, "iter_lines")
+    @patch.object(BulkOperation, "poll", return_value="https://storage")
+    def test_resume_from_checkpoint(self, mock_poll, mock_iter_lines):
+        """A resumed operation with a checkpoint reads its result file from the saved offset."""
+        stream = Products()
+        Context.state = {"bookmarks": {"products": {"bulk_operation": {
+            "bulk_operation_id": "gid://shopify/BulkOperation/1",
+            "status": "COMPLETED",
+            "last_date_window": stream.date_window_size,
+            "file_offset": 100,
+            "records_emitted": 2}}}}
+        mock_iter_lines.return_value = jsonl({"id": "gid://shopify/Product/3"}, offset=100)
+
+        pages = list(BulkOperation(stream).get_pages(PRODUCTS_QUERY, "updated_at:>='2025'"))
+
+        mock_iter_lines.assert_called_once_with("https://storage", 100)
+        self.assertEqual([edge["node"]["id"] for edge in pages[0]["edges"]],
+                         ["gid://shopify/Product/3"])
+
+    @patch("tap_shopify.streams.bulk.time.sleep")
+    @patch.object(BulkOperation, "fetch")
+    def test_poll_adaptive_interval(self, mock_fetch, mock_sleep):
+        """Polling starts fast and the completed operation's objectCount is kept."""
+        op = {"id": "gid://shopify/BulkOperation/1", "status": "RUNNING", "objectCount": "0"}
+        mock_fetch.side_effect = [
+            op,
+            dict(op, objectCount="120"),
+            dict(op, status="COMPLETED", objectCount="300", fileSize="4096",
+                 url="https://storage"),
+        ]
+        bulk_operation = BulkOperation(Products())
+
+        with self.assertLogs(level="INFO") as logs:
+            url = bulk_operation.poll("gid://shopify/BulkOperation/1")
+
+        self.assertEqual(url, "https://storage")
+        self.assertEqual([call[0][0] for call in mock_sleep.call_args_list], [2, 3])
+        self.assertEqual(bulk_operation.object_count, 300)
+        self.assertTrue(any('"bulk_operation_file_size", "value": 4096' in line
+                            for line in logs.output))
+
+    @patch.object(BulkOperation, "fetch")
+    def test_poll_stopped_by_another_stream(self, mock_fetch):
+        """A poll stops as soon as another stream fails and keeps the operation to resume."""
+        mock_fetch.return_value = {"id": "gid://shopify/BulkOperation/1", "status": "RUNNING",
+                                   "objectCount": "0", "createdAt": "2025-01-01T00:00:00Z"}
+        stream = Products()
+        stream.stop_event = threading.Event()
+        threading.Timer(0.1, stream.stop_event.set).start()
+        Context.state = {}
+
+        with self.assertRaises(SyncStoppedError):
+            BulkOperation(stream).poll("gid://shopify/BulkOperation/1")
+
+        self.assertEqual(mock_fetch.call_count, 1)
+        self.assertEqual(
+            Context.state["bookmarks"]["products"]["bulk_operation"]["bulk_operation_id"],
+            "gid://shopify/BulkOperation/1")
+
+    @patch("shopify.GraphQL")
+    def test_estimate_object_count(self, mock_graphql):
+        """The root count is scaled by the objects per record of previous operations."""
+        mock_graphql.return_value.execute.return_value = json.dumps(
+            {"data": {"productsCount": {"count": 40}}})
+        bulk_operation = BulkOperation(Products())
+        builder = bulk_operation.get_builder(PRODUCTS_QUERY)
+
+        self.assertIsNone(bulk_operation.estimate_object_count(builder, "updated_at:>='2025'"))
+        bulk_operation.objects_per_record = 2.5
+        self.assertEqual(bulk_operation.estimate_object_count(builder, "updated_at:>='2025'"), 100)
+        self.assertIn("productsCount", mock_graphql.return_value.execute.call_args.kwargs["query"])
+
+    @patch.object(BulkOperation, "post", return_value={"data": {"bulkOperationCancel": {}}})
+    def test_cancel(self, mock_post):
+        """A running operation saved in the state is cancelled and the state is cleared."""
+        Context.state = {"bookmarks": {"orders": {"bulk_operation": {
+            "bulk_operation_id": "gid://shopify/BulkOperation/1", "status": "RUNNING"}}}}
+
+        BulkOperation(Orders()).cancel()
+
+        self.assertEqual(mock_post.call_args[0][0]["variables"],
+                         {"id": "gid://shopify/BulkOperation/1"})
+        self.assertNotIn("bulk_operation", Context.state["bookmarks"]["orders"])
+
+    @patch("tap_shopify.streams.bulk.transport.get_session")
+    def test_post_url_from_session(self, mock_get_session):
+        """Operations are posted to the GraphQL endpoint of the shop's session."""
+        for name in ("protocol", "myshopify_domain", "port"):
+            self.addCleanup(setattr, shopify.Session, name, getattr(shopify.Session, name))
+        Context.config = {"shop": "test-shop", "access_token": "token"}
+
+        BulkOperation.post({"query": "{}"})
+        shopify.Session.setup(protocol="http", myshopify_domain="0.0.1", port=8080)
+        Context.config = {"shop": "127", "access_token": "token"}
+        BulkOperation.post({"query": "{}"})
+
+        urls = [call.args[0] for call in mock_get_session.return_value.post.call_args_list]
+        self.assertEqual(urls, ["https://test-shop.myshopify.com/admin/api/2025-07/graphql.json",
+                                "http://127.0.0.1:8080/admin/api/2025-07/graphql.json"])
+
+    @patch.object(BulkOperation, "iter_lines")
+    @patch.object(BulkOperation, "poll", return_value="https://storage")
+    @patch.object(BulkOperation, "submit_and_poll")
+    def test_resume_existing_operation(self, mock_submit_and_poll, mock_poll, mock_iter_lines):
+        """A running operation saved in the state is polled instead of submitting a new one."""
+        mock_iter_lines.return_value = []
+        Context.state = {"bookmarks": {"orders": {"bulk_operation": {
+            "bulk_operation_id": "gid://shopify/BulkOperation/1",
+            "status": "RUNNING",
+            "last_date_window": 30.0}}}}
+        stream = Orders()
+
+        list(BulkOperation(stream).get_pages(stream.get_query(), "updated_at:>='2025'"))
+
+        mock_poll.assert_called_once_with("gid://shopify/BulkOperation/1")
+        mock_submit_and_poll.assert_not_called()
+
+
+class TestBulkStreams(unittest.TestCase):
+
+    def setUp(self):
+        Context.state = {}
+
+    def test_opt_in(self):
+        """Supported streams use bulk operations only when listed in bulk_streams."""
+        Context.config = {"start_date": "2025-01-01T00:00:00Z"}
+        self.assertFalse(Products().use_bulk_operation())
+        self.assertTrue(Orders().use_bulk_operation())
+
+        Context.config = {"start_date": "2025-01-01T00:00:00Z",
+                          "bulk_streams": "products, fulfillment_orders"}
+        self.assertTrue(Products().use_bulk_operation())
+        self.assertFalse(FulfillmentOrders().use_bulk_operation())
+
+    def test_shipping_lines_bulk_query(self):
+        """The nested shippingLines connection of order_shipping_lines is rebuilt from bulk lines."""
+        Context.config = {"start_date": "2025-01-01T00:00:00Z"}
+        builder = BulkQueryBuilder(OrderShippingLines().get_query())
+        self.assertEqual(list(builder.plan.connections), ["shippingLines"])
+        self.assertNotIn("$", builder.build("updated_at:>='2025'"))
+
+    @patch('shopify.GraphQL')
+    def test_fall_back_to_pagination(self, mock_graphql):
+        """A supported stream whose query can not run in bulk is paginated instead."""
+        Context.config = {"start_date": "2025-01-01T00:00:00Z", "bulk_streams": ["products"]}
+        mock_graphql.return_value.execute.return_value = json.dumps(
+            {"data": {"products": {"edges": [], "pageInfo": {"hasNextPage": False}}}})
+        stream = Products()
+
+        pages = list(stream.get_pages("{ shop { name } }", "2025-01-01", "2025-01-02"))
+
+        self.assertEqual(pages, [{"edges": [], "pageInfo": {"hasNextPage": False}}])
+        self.assertFalse(stream.use_bulk_operation())
+
+
+def bulk_pages(*updated_at_values):
+    """A fake BulkOperation.get_pages yielding one customer per page."""
+    def get_pages(_query, _query_filter):
+        for updated_at in updated_at_values:
+            yield {"edges": [{"node": {"id": updated_at, "updatedAt": updated_at}}],
+                   "pageInfo": {"hasNextPage": True, "endCursor": None}}
+    return get_pages
+
+
+def failed_bulk_operation(_query, _query_filter):
+    raise BulkOperationFailedError("Bulk operation failed: TIMEOUT")
+    yield  # pylint: disable=unreachable
+
+
+@patch("tap_shopify.streams.base.utils.now",
+       return_value=utils.strptime_with_tz("2025-01-01T00:00:00Z"))
+@patch("tap_shopify.streams.base.Context.get_unselected_fields", return_value=[])
+@patch("tap_shopify.streams.base.Context.get_unselected_paths", Mock(return_value=[]))
+class TestSingleBulkOperation(unittest.TestCase):
+
+    def setUp(self):
+        Context.state = {}
+        Context.config = {"start_date": "2024-11-01T00:00:00Z",
+                          "bulk_streams": ["customers"],
+                          "bulk_single_operation": "true"}
+
+    @patch.object(BulkOperation, "get_pages")
+    def test_single_operation(self, mock_get_pages, *_):
+        """One operation covers the whole range, the bookmark is written once it was emitted."""
+        mock_get_pages.side_effect = bulk_pages("2024-11-02T00:00:00Z", "2024-12-24T00:00:00Z")
+        bookmarks = []
+        stream = Customers()
+
+        with patch.object(Customers, "update_bookmark", side_effect=bookmarks.append):
+            records = list(stream.get_objects())
+
+        self.assertEqual(len(records), 2)
+        mock_get_pages.assert_called_once()
+        self.assertEqual(mock_get_pages.call_args[0][1],
+                         "updated_at:>='2024-11-01 00:00:00+00:00' "
+                         "AND updated_at:<'2025-01-01 00:00:00+00:00'")
+        self.assertEqual(bookmarks, ["2024-12-24T00:00:00.000000Z"])
+
+    @patch.object(BulkOperation, "cancel")
+    @patch.object(BulkOperation, "get_pages")
+    def test_fall_back_to_date_windows(self, mock_get_pages, mock_cancel, *_):
+        """A failed operation over the whole range is cancelled and replaced by date windows."""
+        mock_get_pages.side_effect = [failed_bulk_operation(None, None),
+                                      iter([]), iter([]), iter([])]
+
+        list(Customers().get_objects())
+
+        mock_cancel.assert_called_once()
+        # 2024-11-01 to 2025-01-01 in windows of 30 days
+        self.assertEqual(mock_get_pages.call_count, 4)
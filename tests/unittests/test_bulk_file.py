@@ -0,0 +1,178 @@
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+import requests
+
+from tap_shopify.bulk_file import BulkResultFile, SpooledBulkResultFile, MAX_DOWNLOAD_TRIES
+
+CONTENT = b'{"id": 1}\n{"id": 2}\n{"id": 3}\n'
+
+
+class FakeResponse():
+
+    def __init__(self, content, status_code=200, fail_after=None, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.fail_after = fail_after
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(self.status_code)
+
+    def iter_content(self, _chunk_size):
+        # Small chunks so lines are split across reads
+        for start in range(0, len(self.content), 4):
+            if self.fail_after is not None and start >= self.fail_after:
+                raise requests.exceptions.ChunkedEncodingError("Connection reset by peer")
+            yield self.content[start:start + 4]
+
+
+def ranged(content, start):
+    return FakeResponse(content[start:], status_code=206)
+
+
+def range_server(content, fail_once_at=None):
+    """Returns a fake `session.get` serving `Range: bytes=start-end` requests of `content`."""
+    failures = []
+
+    def get(_url, headers=None, **_kwargs):
+        start, end = [int(value) for value in headers["Range"][len("bytes="):].split("-")]
+        fail_after = None
+        if fail_once_at is not None and start <= fail_once_at <= end and not failures:
+            failures.append(start)
+            fail_after = fail_once_at - start
+        return FakeResponse(content[start:end + 1], status_code=206, fail_after=fail_after,
+                            headers={"Content-Range": "bytes {}-{}/{}".format(
+                                start, end, len(content))})
+    return get
+
+
+@patch('tap_shopify.bulk_file.time.sleep')
+@patch('tap_shopify.bulk_file.transport.get_session')
+class TestBulkResultFile(unittest.TestCase):
+
+    def test_read_lines(self, mock_get_session, mock_sleep):
+        """Lines are yielded without the newline, the offset is the size of the file."""
+        mock_get_session.return_value.get.return_value = FakeResponse(CONTENT + b'{"id": 4}')
+        result_file = BulkResultFile("https://storage")
+
+        self.assertEqual(list(result_file.iter_lines()),
+                         [b'{"id": 1}', b'{"id": 2}', b'{"id": 3}', b'{"id": 4}'])
+        self.assertEqual(result_file.offset, len(CONTENT) + 9)
+        mock_sleep.assert_not_called()
+
+    def test_resume_with_range_request(self, mock_get_session, mock_sleep):
+        """An interrupted download resumes after the last complete line without repeating it."""
+        mock_get = mock_get_session.return_value.get
+        # Fails in the middle of the second line
+        mock_get.side_effect = [FakeResponse(CONTENT, fail_after=12), ranged(CONTENT, 10)]
+
+        lines = list(BulkResultFile("https://storage").iter_lines())
+
+        self.assertEqual(lines, [b'{"id": 1}', b'{"id": 2}', b'{"id": 3}'])
+        self.assertEqual(mock_get.call_args_list[1].kwargs["headers"], {"Range": "bytes=10-"})
+        mock_sleep.assert_called_once()
+
+    def test_range_ignored_by_server(self, mock_get_session, mock_sleep):
+        """A full response to a Range request skips the bytes already consumed."""
+        mock_get_session.return_value.get.return_value = FakeResponse(CONTENT)
+
+        lines = list(BulkResultFile("https://storage", offset=20).iter_lines())
+
+        self.assertEqual(lines, [b'{"id": 3}'])
+
+    def test_retryable_status(self, mock_get_session, mock_sleep):
+        """5xx responses are retried, 4xx responses are raised."""
+        mock_get = mock_get_session.return_value.get
+        mock_get.side_effect = [FakeResponse(b"", status_code=503), FakeResponse(CONTENT)]
+        self.assertEqual(len(list(BulkResultFile("https://storage").iter_lines())), 3)
+
+        mock_get.side_effect = [FakeResponse(b"", status_code=403)]
+        with self.assertRaises(requests.exceptions.HTTPError):
+            list(BulkResultFile("https://storage").iter_lines())
+
+    def test_give_up_without_progress(self, mock_get_session, mock_sleep):
+        """The error is raised after MAX_DOWNLOAD_TRIES attempts without progress."""
+        mock_get = mock_get_session.return_value.get
+        mock_get.side_effect = requests.exceptions.ConnectionError("Connection refused")
+
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            list(BulkResultFile("https://storage").iter_lines())
+        self.assertEqual(mock_get.call_count, MAX_DOWNLOAD_TRIES)
+
+
+@patch('tap_shopify.bulk_file.time.sleep')
+@patch('tap_shopify.bulk_file.transport.get_session')
+class TestSpooledBulkResultFile(unittest.TestCase):
+
+    content = b"".join(json.dumps({"id": i, "title": "x" * (i % 7)}).encode("utf-8") + b"\n"
+                       for i in range(200))
+
+    @patch('tap_shopify.bulk_file.SPOOL_PARSE_SIZE', 100)
+    @patch('tap_shopify.bulk_file.SPOOL_RANGE_SIZE', 333)
+    def test_parallel_download(self, mock_get_session, mock_sleep):
+        """Ranges are fetched in parallel, retried, and the records come back in file order."""
+        mock_get_session.return_value.get.side_effect = range_server(self.content,
+                                                                     fail_once_at=1000)
+
+        with patch.object(SpooledBulkResultFile, "split_lines",
+                          wraps=SpooledBulkResultFile.split_lines) as mock_split_lines:
+            records = list(SpooledBulkResultFile("https://storage", workers=3).iter_records())
+            mock_split_lines.assert_called_once()
+
+        self.assertEqual([rec["id"] for rec, _ in records], list(range(200)))
+        self.assertEqual(records[-1][1], len(self.content))
+        mock_sleep.assert_called_once()
+
+    def test_workers_not_forked(self, mock_get_session, mock_sleep):
+        """The parsing processes do not fork the threads of the tap."""
+        mock_get_session.return_value.get.side_effect = range_server(self.content)
+
+        with patch('tap_shopify.bulk_file.ProcessPoolExecutor',
+                   wraps=ProcessPoolExecutor) as mock_pool:
+            records = list(SpooledBulkResultFile("https://storage", workers=2).iter_records())
+
+        self.assertEqual(len(records), 200)
+        self.assertIn(mock_pool.call_args.kwargs["mp_context"].get_start_method(),
+                      ("forkserver", "spawn"))
+
+    @patch('tap_shopify.bulk_file.SPOOL_PARSE_SIZE', 100)
+    def test_parallel_download_from_offset(self, mock_get_session, mock_sleep):
+        """Only the bytes after the offset are downloaded and parsed."""
+        mock_get_session.return_value.get.side_effect = range_server(self.content)
+        offset = self.content.index(b'{"id": 150,')
+
+        records = list(SpooledBulkResultFile("https://storage", workers=2,
+                                             offset=offset).iter_records())
+
+        self.assertEqual([rec["id"] for rec, _ in records], list(range(150, 200)))
+
+    def test_range_not_supported(self, mock_get_session, mock_sleep):
+        """A server without Range support is read over a single connection."""
+        mock_get_session.return_value.get.return_value = FakeResponse(CONTENT)
+
+        records = list(SpooledBulkResultFile("https://storage", workers=3).iter_records())
+
+        self.assertEqual(records, [({"id": 1}, 10), ({"id": 2}, 20), ({"id": 3}, 30)])
+
+    def test_split_lines(self, mock_get_session, mock_sleep):
+        """Pieces end after a newline, long lines are never split."""
+        with tempfile.TemporaryDirectory() as spool_dir:
+            path = os.path.join(spool_dir, "bulk_result.jsonl")
+            with open(path, "wb") as spool:
+                spool.write(b"aaaa\nbbbbbbbbbbbbbb\ncc\nd\n")
+
+            pieces = SpooledBulkResultFile.split_lines(path, 25, piece_size=5)
+
+        self.assertEqual(pieces, [(0, 5), (5, 20), (20, 25)])
@@ -0,0 +1,199 @@
+import json
+import unittest
+import urllib.error
+from unittest.mock import Mock, patch
+
+from graphql import parse
+
+from tap_shopify.context import Context
+from tap_shopify.streams.child_pages import ChildPages, fetch_child_pages
+from tap_shopify.streams.collections import Collections
+from tap_shopify.streams.fulfillment_orders import FulfillmentOrders
+from tap_shopify.streams.inventory_levels import InventoryLevels
+from tap_shopify.streams.metafields_products import MetafieldsProducts
+
+
+def connection(ids, cursor=None):
+    return {"edges": [{"node": {"id": child_id}} for child_id in ids],
+            "nodes": [{"id": child_id} for child_id in ids],
+            "pageInfo": {"endCursor": cursor, "hasNextPage": cursor is not None}}
+
+
+class FakeChildPagesGraphQL():
+    """Serves the pages of `children` (parent id -> pages of child ids) to batch queries."""
+
+    def __init__(self, children, response_key, max_parents=None):
+        self.children = children
+        self.response_key = response_key
+        self.max_parents = max_parents
+        self.batches = []
+
+    def execute(self, query, variables, timeout=None):
+        parse(query)
+        batch = [(variables["id_{}".format(index)], variables["after_{}".format(index)])
+                 for index in range(len(variables))
+                 if "id_{}".format(index) in variables]
+        self.batches.append(batch)
+        if self.max_parents and len(batch) > self.max_parents:
+            return json.dumps({"errors": [{"message": "Query cost is 2000",
+                                           "extensions": {"code": "MAX_COST_EXCEEDED",
+                                                          "cost": 2000, "maxCost": 1000}}]})
+        data = {}
+        for index, (parent_id, cursor) in enumerate(batch):
+            page = int(cursor) + 1
+            pages = self.children[parent_id]
+            data["p{}".format(index)] = {self.response_key: connection(
+                pages[page], str(page) if page + 1 < len(pages) else None)}
+        return json.dumps({"data": data,
+                           "extensions": {"cost": {"requestedQueryCost": 10 * len(batch)}}})
+
+
+@patch.object(Context, "get_unselected_fields", return_value=[])
+@patch.object(Context, "get_unselected_paths", Mock(return_value=[]))
+class TestChildPages(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, Context, "config", Context.config)
+        Context.config = {}
+
+    def test_build_query(self, _mock_unselected):
+        """Each parent is an aliased node with its own cursor, other arguments are kept."""
+        child_pages = ChildPages(InventoryLevels(), "inventoryLevels",
+                                 variables={"query": "updated_at:>'2025-01-01'"})
+        query, variables = child_pages.build_query([("gid://shopify/Location/1", "c1"),
+                                                    ("gid://shopify/Location/2", "c2")])
+
+        operation = parse(query).definitions[0]
+        self.assertEqual([(selection.alias.value, selection.name.value)
+                          for selection in operation.selection_set.selections],
+                         [("p0", "node"), ("p1", "node")])
+        self.assertIn("... on Location", query)
+        self.assertIn("inventoryLevels(first: $first, query: $query, after: $after_1)", query)
+        self.assertNotIn("childafter", query)
+        self.assertNotIn("parentquery", query)
+        self.assertEqual(variables, {"first": child_pages.stream.results_per_page,
+                                     "query": "updated_at:>'2025-01-01'",
+                                     "id_0": "gid://shopify/Location/1", "after_0": "c1",
+                                     "id_1": "gid://shopify/Location/2", "after_1": "c2"})
+
+    def test_fetch_in_batches(self, _mock_unselected):
+        """Later pages of many parents are fetched together until every parent is done."""
+        children = {"gid://shopify/Product/1": [["m1"], ["m2"], ["m3"]],
+                    "gid://shopify/Product/2": [["m4"], ["m5"]],
+                    "gid://shopify/Product/3": [["m6"]]}
+        fake = FakeChildPagesGraphQL(children, "metafields")
+        with patch("shopify.GraphQL", return_value=fake):
+            pages = fetch_child_pages(MetafieldsProducts(), "metafields", {
+                "gid://shopify/Product/1": connection(["m1"], "0"),
+                "gid://shopify/Product/2": connection(["m4"], "0"),
+                "gid://shopify/Product/3": connection(["m6"])})
+
+        self.assertEqual(len(fake.batches), 2)
+        self.assertEqual(len(fake.batches[0]), 2)
+        self.assertEqual({parent_id: [[edge["node"]["id"] for edge in page["edges"]]
+                                      for page in parent_pages]
+                          for parent_id, parent_pages in pages.items()},
+                         {"gid://shopify/Product/1": [["m2"], ["m3"]],
+                          "gid://shopify/Product/2": [["m5"]]})
+
+    @patch("time.sleep")
+    def test_http_error_retried(self, _mock_sleep, _mock_unselected):
+        """A 429 response to a batch is retried like the stream's own pages."""
+        children = {"gid://shopify/Product/1": [["m1"], ["m2"]]}
+        fake = FakeChildPagesGraphQL(children, "metafields")
+        responses = [urllib.error.HTTPError("https://shop/graphql.json", 429,
+                                            "Too Many Requests", {}, None)]
+
+        def execute(**kwargs):
+            if responses:
+                raise responses.pop()
+            return fake.execute(**kwargs)
+
+        with patch("shopify.GraphQL") as mock_graphql:
+            mock_graphql.return_value.execute.side_effect = execute
+            pages = fetch_child_pages(MetafieldsProducts(), "metafields", {
+                "gid://shopify/Product/1": connection(["m1"], "0")})
+
+        self.assertEqual(mock_graphql.return_value.execute.call_count, 2)
+        self.assertEqual([edge["node"]["id"] for edge in pages["gid://shopify/Product/1"][0]
+                          ["edges"]], ["m2"])
+
+    def test_no_request_without_next_pages(self, _mock_unselected):
+        with patch("shopify.GraphQL") as mock_graphql:
+            self.assertEqual(fetch_child_pages(Collections(), "products", {
+                "gid://shopify/Collection/1": connection(["p1"])}), {})
+        mock_graphql.assert_not_called()
+
+    def test_cost_exceeded_shrinks_batch(self, _mock_unselected):
+        """A batch above the cost limit is sent again with fewer parents."""
+        children = {"gid://shopify/Collection/{}".format(i): [["a"], ["b"]] for i in range(8)}
+        fake = FakeChildPagesGraphQL(children, "products", max_parents=4)
+        stream = Collections()
+        with patch("shopify.GraphQL", return_value=fake):
+            pages = fetch_child_pages(stream, "products", {
+                parent_id: connection(["a"], "0") for parent_id in children})
+
+        # The batch size grows from the observed cost until a batch is rejected
+        sizes = [len(batch) for batch in fake.batches]
+        rejected = next(index for index, size in enumerate(sizes) if size > 4)
+        self.assertTrue(all(size <= 4 for size in sizes[rejected + 1:]))
+        self.assertEqual(sum(sizes) - sizes[rejected], 8)
+        self.assertEqual(len(pages), 8)
+        self.assertLessEqual(stream.child_pages["products"].sizer.size, 4)
+
+    def test_collection_products_across_page(self, _mock_unselected):
+        """The remaining products of every collection of a page share requests."""
+        children = {"gid://shopify/Collection/1": [["p1"], ["p2"]],
+                    "gid://shopify/Collection/2": [["p3"], ["p4"]]}
+        fake = FakeChildPagesGraphQL(children, "products")
+        edges = [{"node": {"id": "gid://shopify/Collection/1", "ruleSet": None,
+                           "products": connection(["p1"], "0")}},
+                 {"node": {"id": "gid://shopify/Collection/2", "ruleSet": None,
+                           "products": connection(["p3"], "0")}}]
+        with patch("shopify.GraphQL", return_value=fake):
+            objs = Collections().transform_page(edges)
+
+        self.assertEqual(len(fake.batches), 1)
+        self.assertEqual([obj["products"] for obj in objs], [["p1", "p2"], ["p3", "p4"]])
+
+    def test_fulfillment_order_child_pages(self, _mock_unselected):
+        """Every child connection with more pages is paginated from its own cursor."""
+        children = {"gid://shopify/FulfillmentOrder/1": [["r1"], ["r2"]]}
+        fake = FakeChildPagesGraphQL(children, "merchantRequests")
+        obj = {"id": "gid://shopify/FulfillmentOrder/1",
+               "merchantRequests": connection(["r1"], "0")}
+        with patch("shopify.GraphQL", return_value=fake):
+            obj = FulfillmentOrders().transform_object(obj)
+
+        self.assertEqual(len(fake.batches), 1)
+        self.assertEqual(obj["merchantRequests"], [{"id": "r1"}, {"id": "r2"}])
+
+    @patch("tap_shopify.streams.child_pages.metrics.log")
+    def test_fulfillment_line_items_across_page(self, mock_metrics_log, _mock_unselected):
+        """The remaining line items of every fulfillment of a page share requests."""
+        children = {"gid://shopify/Fulfillment/{}".format(i): [["l{}a".format(i)],
+                                                               ["l{}b".format(i)]]
+                    for i in range(4)}
+        fake = FakeChildPagesGraphQL(children, "fulfillmentLineItems")
+
+        def fulfillment(index):
+            return {"id": "gid://shopify/Fulfillment/{}".format(index),
+                    "fulfillmentOrders": {"nodes": []}, "events": {"nodes": []},
+                    "fulfillmentLineItems": connection(["l{}a".format(index)], "0")}
+
+        edges = [{"node": {"id": "gid://shopify/FulfillmentOrder/{}".format(i),
+                           "fulfillments": {"edges": [{"node": fulfillment(2 * i)},
+                                                      {"node": fulfillment(2 * i + 1)}],
+                                            "pageInfo": {"hasNextPage": False}}}}
+                 for i in range(2)]
+        with patch("shopify.GraphQL", return_value=fake):
+            objs = FulfillmentOrders().transform_page(edges)
+
+        self.assertEqual(len(fake.batches), 1)
+        self.assertEqual(len(fake.batches[0]), 4)
+        self.assertEqual([[[line_item["id"] for line_item in item["fulfillmentLineItems"]]
+                           for item in obj["fulfillments"]] for obj in objs],
+                         [[["l0a", "l0b"], ["l1a", "l1b"]], [["l2a", "l2b"], ["l3a", "l3b"]]])
+        point = mock_metrics_log.call_args.args[1]
+        self.assertEqual((point.metric, point.value, point.tags["connection"]),
+                         ("child_page_requests", 1, "fulfillmentLineItems"))
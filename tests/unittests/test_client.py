@@ -34,7 +34,7 @@ class TestShopifyClientInit(unittest.TestCase):
         tmp.close()
         return tmp.name
 
-    @patch('tap_shopify.client.requests.post')
+    @patch('tap_shopify.transport.requests.Session.post')
     def test_init_uses_existing_token_without_refresh(self, mock_post):
         """When an access_token is already in config, no refresh should be triggered."""
         config = self._make_config()  # has access_token='existing_token'
@@ -46,7 +46,7 @@ class TestShopifyClientInit(unittest.TestCase):
         finally:
             os.unlink(path)
 
-    @patch('tap_shopify.client.requests.post')
+    @patch('tap_shopify.transport.requests.Session.post')
     def test_init_fetches_token_when_missing(self, mock_post):
         """First run: no access_token in config, should fetch one via client credentials."""
         config = self._make_config()
@@ -75,7 +75,7 @@ class TestRefreshAccessToken(unittest.TestCase):
         client.config_path = config_path
         return client
 
-    @patch('tap_shopify.client.requests.post')
+    @patch('tap_shopify.transport.requests.Session.post')
     def test_successful_refresh(self, mock_post):
         """Successful token refresh should update config and access_token."""
         config = {
@@ -120,7 +120,7 @@ class TestRefreshAccessToken(unittest.TestCase):
         finally:
             os.unlink(tmp.name)
 
-    @patch('tap_shopify.client.requests.post')
+    @patch('tap_shopify.transport.requests.Session.post')
     def test_refresh_failure_raises(self, mock_post):
         """Non-200 response from token endpoint should raise."""
         config = {
@@ -283,7 +283,7 @@ class TestRetry401Handler(unittest.TestCase):
         # Should not raise
         retry_401_handler({'wait': 1, 'tries': 1})
 
-    @patch('tap_shopify.client.requests.post')
+    @patch('tap_shopify.transport.requests.Session.post')
     def test_retry_401_handler_updates_context_config_access_token(self, mock_post):
         """After retry_401_handler fires, Context.config['access_token'] must reflect
         the newly fetched token.
@@ -636,7 +636,7 @@ class TestMainClient(unittest.TestCase):
 class TestBackoffOnRefresh(unittest.TestCase):
     """Tests for backoff/retry on token refresh failures."""
 
-    @patch('tap_shopify.client.requests.post')
+    @patch('tap_shopify.transport.requests.Session.post')
     def test_refresh_retries_on_connection_error(self, mock_post):
         """_refresh_access_token should retry on RequestException."""
         config = {
@@ -671,7 +671,7 @@ class TestBackoffOnRefresh(unittest.TestCase):
         finally:
             os.unlink(tmp.name)
 
-    @patch('tap_shopify.client.requests.post')
+    @patch('tap_shopify.transport.requests.Session.post')
     def test_refresh_gives_up_after_max_retries(self, mock_post):
         """_refresh_access_token should give up after max retries."""
         config = {
@@ -1,7 +1,19 @@
+import json
+import re
+import threading
 import unittest
+import urllib.error
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, Mock, patch
+import shopify
+from singer import utils
 from tap_shopify.context import Context
+from tap_shopify.date_window import DateWindowSizer, MAX_PRESCAN_PROBES
+from tap_shopify.exceptions import ShopifyAPIError
 from tap_shopify.streams.base import Stream
 
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
 class TestShopifyDateWindowHandling(unittest.TestCase):
     
     def test_no_date_window_value(self):
@@ -56,3 +68,239 @@ class TestShopifyDateWindowHandling(unittest.TestCase):
         }
         streams = Stream()
         self.assertEqual(streams.date_window_size, 30)
+
+
+class TestParallelDateWindows(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, Context, "config", Context.config)
+        self.addCleanup(setattr, Context, "state", Context.state)
+        Context.config = {"start_date": "2025-01-01T00:00:00Z", "date_window_size": 10,
+                          "date_window_workers": 3}
+        Context.state = {}
+        self.stream = Stream()
+        self.stream.name = "products"
+        self.stream.get_query = lambda: "query { products { edges { node { id updatedAt } } } }"
+        self.first_window_released = threading.Event()
+        patcher = patch.object(Context, "get_unselected_fields", return_value=[])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(Context, "get_unselected_paths", return_value=[])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_pages(self, _query, updated_at_min, updated_at_max, **_kwargs):
+        if updated_at_min == START:
+            # The first window completes after the others
+            self.first_window_released.wait(timeout=5)
+        yield {"edges": [{"node": {"id": str(updated_at_min),
+                                   "updatedAt": utils.strftime(updated_at_min + timedelta(days=1))}}]}
+        if updated_at_min == START + timedelta(days=10):
+            raise_error = getattr(self, "raise_error", None)
+            if raise_error:
+                raise raise_error
+
+    @patch("tap_shopify.streams.base.utils.now", return_value=START + timedelta(days=30))
+    def test_watermark_waits_for_earlier_windows(self, _mock_now):
+        """The bookmark only passes a window once every earlier window completed."""
+        bookmarks = []
+        objects = []
+        with patch.object(Stream, "get_pages", side_effect=self.get_pages), \
+             patch.object(Stream, "update_bookmark", side_effect=bookmarks.append):
+            for obj in self.stream.get_objects():
+                objects.append(obj["id"])
+                if len(objects) == 2:
+                    self.assertEqual(bookmarks, [])
+                    self.first_window_released.set()
+
+        self.assertEqual(len(objects), 3)
+        self.assertEqual(objects[-1], str(START))
+        self.assertEqual(bookmarks[-1], utils.strftime(START + timedelta(days=21)))
+
+    @patch("tap_shopify.streams.base.utils.now", return_value=START + timedelta(days=30))
+    def test_failed_window_keeps_bookmark(self, _mock_now):
+        """A failed window raises its error and the bookmark stays before it."""
+        self.raise_error = ShopifyAPIError("window failed")
+        self.first_window_released.set()
+        bookmarks = []
+        with patch.object(Stream, "get_pages", side_effect=self.get_pages), \
+             patch.object(Stream, "update_bookmark", side_effect=bookmarks.append):
+            with self.assertRaises(ShopifyAPIError):
+                list(self.stream.get_objects())
+
+        for bookmark in bookmarks:
+            self.assertLessEqual(bookmark, utils.strftime(START + timedelta(days=10)))
+
+    @patch("tap_shopify.transport.post_json")
+    @patch("tap_shopify.streams.base.utils.now", return_value=START + timedelta(days=30))
+    def test_token_sent_from_window_threads(self, _mock_now, mock_post_json):
+        """The pages of every window are requested from a worker thread with the access token."""
+        Context.config["access_token"] = "token"
+        shopify.ShopifyResource.activate_session(
+            shopify.Session("test-shop", "2025-07", "token"))
+        self.addCleanup(shopify.ShopifyResource.clear_session)
+        self.stream.data_key = "products"
+        sent = []
+
+        def post_json(url, data, headers, timeout=None):
+            sent.append((threading.current_thread().name, headers.get("X-Shopify-Access-Token")))
+            connection = {"edges": [], "pageInfo": {"endCursor": None, "hasNextPage": False}}
+            return MagicMock(content=json.dumps({"data": {"products": connection}}).encode())
+
+        mock_post_json.side_effect = post_json
+        with patch.object(Stream, "update_bookmark"):
+            list(self.stream.get_objects())
+
+        self.assertEqual(len(sent), 3)
+        self.assertTrue(all(name.startswith("products_") for name, _ in sent))
+        self.assertEqual({token for _, token in sent}, {"token"})
+
+
+class TestDateWindowSizer(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, Context, "config", Context.config)
+
+    def test_merge_sparse_windows(self):
+        """Windows grow at most twofold per window over quiet periods."""
+        sizer = DateWindowSizer("orders", 30, max_size=100, target_records=1000)
+        self.assertEqual(sizer.observe(30, 10), 60)
+        self.assertEqual(sizer.observe(60, 0), 100)
+
+    def test_size_from_density(self):
+        """The next window holds about the target at the density just observed."""
+        sizer = DateWindowSizer("orders", 30, target_records=1000)
+        self.assertEqual(sizer.observe(30, 6000), 5)
+
+    def test_split_dense_window(self):
+        """A window counted above the target is split, never below the minimum."""
+        sizer = DateWindowSizer("orders", 30, min_size=1, target_records=1000)
+        self.assertIsNone(sizer.split(30, 900))
+        self.assertEqual(sizer.split(30, 2000), 13.5)
+        self.assertEqual(sizer.split(13.5, 1000000), 1)
+        self.assertIsNone(sizer.split(1, 1000000))
+
+    @patch.object(Stream, "fetch_count")
+    def test_stream_window_split_by_count(self, mock_fetch_count):
+        """With adaptive_date_window the stream probes counts until the window fits."""
+        Context.config = {"start_date": "2025-01-01T00:00:00Z", "date_window_size": 8,
+                          "adaptive_date_window": "true", "date_window_target_records": 100}
+        stream = Stream()
+        stream.name = stream.data_key = "orders"
+        mock_fetch_count.side_effect = [400, 90]
+
+        window_end = stream.get_window_end(START, START + timedelta(days=30))
+
+        self.assertEqual(window_end, START + timedelta(days=1.8))
+        self.assertEqual(mock_fetch_count.call_args.args[0], "orders")
+
+    @patch.object(Stream, "fetch_count", return_value=None)
+    def test_stream_without_count(self, mock_fetch_count):
+        """A stream without a count query sizes its windows from the records fetched."""
+        Context.config = {"start_date": "2025-01-01T00:00:00Z", "date_window_size": 8,
+                          "adaptive_date_window": True}
+        stream = Stream()
+        stream.name = stream.data_key = "orders"
+
+        self.assertEqual(stream.get_window_end(START, START + timedelta(days=30)),
+                         START + timedelta(days=8))
+        stream.observe_window(START, START + timedelta(days=8), 0)
+        self.assertEqual(stream.get_window_end(START, START + timedelta(days=30)),
+                         START + timedelta(days=16))
+        mock_fetch_count.assert_called_once()
+
+    def test_fixed_windows_by_default(self):
+        Context.config = {"start_date": "2025-01-01T00:00:00Z", "date_window_size": 8}
+        stream = Stream()
+        self.assertIsNone(stream.window_sizer)
+        self.assertEqual(stream.get_window_end(START, START + timedelta(days=5)),
+                         START + timedelta(days=5))
+
+
+class FakePrescanGraphQL():
+    """Answers the pre-scan queries from a list of record timestamps."""
+
+    def __init__(self, records):
+        self.records = sorted(records)
+        self.queries = []
+
+    def execute(self, query, variables=None, timeout=None):
+        self.queries.append(variables)
+        start, end = [datetime.fromisoformat(value)
+                      for value in re.findall(r"'([^']+)'", variables["query"])]
+        matching = [value for value in self.records if start <= value < end]
+        if variables["reverse"]:
+            matching.reverse()
+        edges = [{"node": {"updatedAt": utils.strftime(value)}} for value in matching[:1]]
+        return json.dumps({"data": {"products": {"edges": edges}}})
+
+
+class TestPopulatedRangeScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, Context, "config", Context.config)
+        Context.config = {"start_date": "2020-01-01T00:00:00Z", "date_window_size": 30,
+                          "skip_empty_date_windows": True}
+        self.stream = Stream()
+        self.stream.name = self.stream.data_key = "products"
+        self.sync_start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def windows(self, records):
+        graphql = FakePrescanGraphQL(records)
+        with patch("shopify.GraphQL", return_value=graphql):
+            windows = list(self.stream.iter_windows(datetime(2020, 1, 1, tzinfo=timezone.utc),
+                                                    self.sync_start))
+        return windows, graphql.queries
+
+    def test_skip_range_before_first_record(self):
+        """Windows start at the first record instead of start_date."""
+        first = datetime(2024, 11, 15, 8, tzinfo=timezone.utc)
+        windows, _ = self.windows([first, datetime(2024, 12, 20, tzinfo=timezone.utc)])
+
+        self.assertEqual(windows[0][0], first)
+        self.assertEqual(windows[-1][1], self.sync_start)
+        self.assertEqual(len(windows), 2)
+
+    def test_skip_gap_between_records(self):
+        """Gaps longer than a date window are skipped, the records are all covered."""
+        records = [datetime(2020, 3, 1, tzinfo=timezone.utc),
+                   datetime(2020, 3, 5, tzinfo=timezone.utc),
+                   datetime(2023, 6, 1, tzinfo=timezone.utc),
+                   datetime(2024, 12, 31, tzinfo=timezone.utc)]
+        windows, queries = self.windows(records)
+
+        for record in records:
+            self.assertTrue(any(start <= record < end for start, end in windows))
+        days = sum((end - start) / timedelta(days=1) for start, end in windows)
+        self.assertLess(days, 180)
+        self.assertLessEqual(len(queries), MAX_PRESCAN_PROBES)
+
+    def test_no_records(self):
+        windows, queries = self.windows([])
+        self.assertEqual(windows, [])
+        self.assertEqual(len(queries), 1)
+
+    def test_prescan_not_supported(self):
+        """A connection rejecting the sorted query is synced over its whole range."""
+        graphql = FakePrescanGraphQL([])
+        graphql.execute = lambda **kwargs: json.dumps({"errors": [{"message": "sortKey"}]})
+        with patch("shopify.GraphQL", return_value=graphql):
+            windows = list(self.stream.iter_windows(datetime(2024, 11, 1, tzinfo=timezone.utc),
+                                                    self.sync_start))
+
+        self.assertEqual(windows[0][0], datetime(2024, 11, 1, tzinfo=timezone.utc))
+        self.assertFalse(self.stream.range_scanner.supported)
+
+    @patch("time.sleep")
+    def test_prescan_failure_syncs_whole_range(self, _mock_sleep):
+        """A probe failing after its retries skips the pre-scan, not the sync."""
+        graphql = FakePrescanGraphQL([])
+        graphql.execute = Mock(side_effect=urllib.error.HTTPError(
+            "https://shop", 503, "Service Unavailable", {}, None))
+        with patch("shopify.GraphQL", return_value=graphql):
+            windows = list(self.stream.iter_windows(datetime(2024, 11, 1, tzinfo=timezone.utc),
+                                                    self.sync_start))
+
+        self.assertGreater(graphql.execute.call_count, 1)
+        self.assertEqual(windows[0][0], datetime(2024, 11, 1, tzinfo=timezone.utc))
+        self.assertEqual(windows[-1][1], self.sync_start)
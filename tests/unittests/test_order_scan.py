@@ -0,0 +1,162 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import Mock, patch
+
+from graphql import parse
+
+from tap_shopify.context import Context
+from tap_shopify.streams.metafields_orders import MetafieldsOrders
+from tap_shopify.streams.order_scan import OrdersScan, get_order_scan_streams
+from tap_shopify.streams.order_refunds import OrderRefunds
+from tap_shopify.streams.order_shipping_lines import OrderShippingLines
+from tap_shopify.streams.transactions import Transactions
+
+
+def order_node(order_id, updated_at, refunds=(), transactions=()):
+    return {"id": "gid://shopify/Order/{}".format(order_id),
+            "updatedAt": updated_at,
+            "order_refunds__refunds": list(refunds),
+            "transactions__transactions": list(transactions),
+            "order_shipping_lines__id": "gid://shopify/Order/{}".format(order_id),
+            "order_shipping_lines__updatedAt": updated_at,
+            "order_shipping_lines__shippingLines": {"edges": [{"node": {"code": "ship"}}]}}
+
+
+@patch.object(Context, "get_unselected_fields", return_value=[])
+@patch.object(Context, "get_unselected_paths", Mock(return_value=[]))
+class TestOrdersScan(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, Context, "config", Context.config)
+        self.addCleanup(setattr, Context, "state", Context.state)
+        Context.config = {"start_date": "2025-01-01T00:00:00Z", "shared_order_scan": True}
+        Context.state = {"bookmarks": {
+            "order_refunds": {"updatedAt": "2025-01-10T00:00:00Z"},
+            "transactions": {"createdAt": "2025-01-20T00:00:00Z"},
+            "order_shipping_lines": {"updatedAt": "2025-01-10T00:00:00Z"}}}
+
+    def get_scan(self):
+        return OrdersScan([OrderRefunds(), Transactions(), OrderShippingLines()])
+
+    def test_merged_query(self, _mock_unselected):
+        """Each stream's node fields are requested once, aliased with the stream name."""
+        query = self.get_scan().get_query()
+        root = parse(query).definitions[0].selection_set.selections[0]
+        node = root.selection_set.selections[0].selection_set.selections[0]
+        keys = [(selection.alias or selection.name).value
+                for selection in node.selection_set.selections]
+
+        self.assertIn("order_refunds__refunds", keys)
+        self.assertIn("transactions__transactions", keys)
+        self.assertIn("order_shipping_lines__shippingLines", keys)
+        self.assertEqual(keys[-2:], ["id", "updatedAt"])
+        self.assertIn("$childafter", query)
+        self.assertIn("sortKey: UPDATED_AT", query)
+
+    @patch("tap_shopify.streams.base.utils.now",
+           return_value=datetime(2025, 2, 1, tzinfo=timezone.utc))
+    def test_records_and_bookmarks_per_stream(self, _mock_now, _mock_unselected):
+        """Orders are fetched once, each stream keeps its own filter and bookmark."""
+        scan = self.get_scan()
+        page = {"edges": [
+            {"node": order_node(1, "2025-01-05T00:00:00Z")},
+            {"node": order_node(2, "2025-01-15T00:00:00Z",
+                                refunds=[{"id": "r1", "updatedAt": "2025-01-15T00:00:00Z"}],
+                                transactions=[{"id": "t1", "createdAt": "2025-01-02T00:00:00Z"}])},
+            {"node": order_node(3, "2025-01-25T00:00:00Z",
+                                transactions=[{"id": "t2", "createdAt": "2025-01-25T00:00:00Z"}])},
+        ]}
+
+        with patch.object(OrdersScan, "get_pages", return_value=[page]) as mock_get_pages, \
+             patch("tap_shopify.streams.order_scan.utils.now",
+                   return_value=datetime(2025, 2, 1, tzinfo=timezone.utc)):
+            records = list(scan.sync())
+
+        mock_get_pages.assert_called_once()
+        self.assertEqual(mock_get_pages.call_args.args[1],
+                         datetime(2025, 1, 9, 23, 59, tzinfo=timezone.utc))
+        self.assertEqual([(name, rec.get("id") or rec.get("orderId")) for name, rec in records],
+                         [("order_refunds", "r1"),
+                          ("transactions", "t2"),
+                          ("order_shipping_lines", "2"),
+                          ("order_shipping_lines", "3")])
+        bookmarks = Context.state["bookmarks"]
+        self.assertEqual(bookmarks["order_refunds"]["updatedAt"], "2025-01-15T00:00:00.000000Z")
+        self.assertEqual(bookmarks["transactions"]["createdAt"], "2025-01-25T00:00:00.000000Z")
+        self.assertEqual(bookmarks["order_shipping_lines"]["updatedAt"],
+                         "2025-01-25T00:00:00.000000Z")
+
+    @patch("tap_shopify.streams.base.utils.now",
+           return_value=datetime(2025, 2, 1, tzinfo=timezone.utc))
+    def test_bookmarks_as_synced_alone(self, _mock_now, _mock_unselected):
+        """An interrupted scan moved the transactions bookmark, never the metafields one."""
+        Context.config["date_window_size"] = 10
+        Context.state["bookmarks"]["transactions"] = {"createdAt": "2025-01-10T00:00:00Z"}
+        Context.state["bookmarks"]["metafields_orders"] = {"updatedAt": "2025-01-10T00:00:00Z"}
+        scan = OrdersScan([Transactions(), MetafieldsOrders()])
+        node = order_node(1, "2025-01-25T00:00:00Z",
+                          transactions=[{"id": "t1", "createdAt": "2025-01-25T00:00:00Z"}])
+        node["metafields_orders__metafields"] = {
+            "edges": [{"node": {"id": "m1", "updatedAt": "2025-01-30T00:00:00Z"}}]}
+        windows = []
+
+        def get_pages(_query, window_start, _window_end):
+            windows.append(window_start)
+            if len(windows) > 1:
+                raise RuntimeError("interrupted")
+            return [{"edges": [{"node": node}]}]
+
+        with patch.object(OrdersScan, "get_pages", side_effect=get_pages), \
+             patch("tap_shopify.streams.order_scan.utils.now",
+                   return_value=datetime(2025, 2, 1, tzinfo=timezone.utc)):
+            records = []
+            with self.assertRaises(RuntimeError):
+                for record in scan.sync():
+                    records.append(record)
+
+        self.assertEqual([name for name, _ in records], ["transactions", "metafields_orders"])
+        bookmarks = Context.state["bookmarks"]
+        self.assertEqual(bookmarks["transactions"]["createdAt"], "2025-01-25T00:00:00.000000Z")
+        self.assertEqual(bookmarks["metafields_orders"]["updatedAt"], "2025-01-10T00:00:00Z")
+
+        # A complete scan writes it at the end
+        with patch.object(OrdersScan, "get_pages", return_value=[{"edges": [{"node": node}]}]), \
+             patch("tap_shopify.streams.order_scan.utils.now",
+                   return_value=datetime(2025, 2, 1, tzinfo=timezone.utc)):
+            list(OrdersScan([Transactions(), MetafieldsOrders()]).sync())
+        self.assertEqual(bookmarks["metafields_orders"]["updatedAt"],
+                         "2025-01-30T00:00:00.000000Z")
+
+    @patch("tap_shopify.streams.base.utils.now",
+           return_value=datetime(2025, 2, 1, tzinfo=timezone.utc))
+    def test_child_pages_per_page(self, _mock_now, _mock_unselected):
+        """The remaining shipping lines of every order of a page are fetched together."""
+        scan = self.get_scan()
+        page = {"edges": [{"node": order_node(order_id, "2025-01-15T00:00:00Z")}
+                          for order_id in (1, 2, 3)]}
+        for edge in page["edges"]:
+            edge["node"]["order_shipping_lines__shippingLines"]["pageInfo"] = {
+                "hasNextPage": True, "endCursor": "cursor"}
+
+        with patch.object(OrdersScan, "get_pages", return_value=[page]), \
+             patch("tap_shopify.streams.order_scan.utils.now",
+                   return_value=datetime(2025, 2, 1, tzinfo=timezone.utc)), \
+             patch("tap_shopify.streams.order_shipping_lines.fetch_child_pages",
+                   return_value={}) as mock_fetch:
+            records = list(scan.sync())
+
+        mock_fetch.assert_called_once()
+        self.assertEqual(len(mock_fetch.call_args.args[2]), 3)
+        self.assertEqual(len([name for name, _ in records if name == "order_shipping_lines"]), 3)
+
+    def test_scan_streams(self, _mock_unselected):
+        """Only opted in, paginated order child streams share a scan, two at least."""
+        names = ["orders", "order_refunds", "transactions", "metafields_orders", "products"]
+        self.assertEqual(get_order_scan_streams(names),
+                         ["order_refunds", "transactions", "metafields_orders"])
+
+        Context.config["bulk_streams"] = ["transactions", "metafields_orders"]
+        self.assertEqual(get_order_scan_streams(names), [])
+
+        Context.config = {"start_date": "2025-01-01T00:00:00Z"}
+        self.assertEqual(get_order_scan_streams(names), [])
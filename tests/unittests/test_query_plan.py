@@ -0,0 +1,255 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from graphql import parse
+
+import tap_shopify
+from tap_shopify import query_plan
+from tap_shopify.context import Context
+from tap_shopify.query_plan import (QueryPlanCache, SCALAR_VALUE_BYTES, estimate_query,
+                                    prune_query)
+from tap_shopify.streams.orders import Orders
+from tap_shopify.streams.transactions import Transactions
+
+QUERY = """
+query GetThings($first: Int!, $after: String, $query: String) {
+    things(first: $first, after: $after) {
+        edges {
+            node {
+                id
+                name
+                notes(query: $query) {
+                    id
+                }
+                billingAddress {
+                    city
+                    zip
+                }
+                lines(first: 10) {
+                    nodes {
+                        sku
+                        quantity
+                    }
+                }
+            }
+        }
+    }
+}
+"""
+
+ORDERS_CATALOG = {"streams": [{
+    "tap_stream_id": "orders",
+    "schema": {"properties": {"id": {}, "billingAddress": {}, "lineItems": {}}},
+    "metadata": [
+        {"breadcrumb": [], "metadata": {"selected": True}},
+        {"breadcrumb": ["properties", "id"], "metadata": {"inclusion": "automatic"}},
+        {"breadcrumb": ["properties", "billingAddress"], "metadata": {"selected": True}},
+        {"breadcrumb": ["properties", "billingAddress", "properties", "city"],
+         "metadata": {"selected": False}},
+        {"breadcrumb": ["properties", "billingAddress", "properties", "zip"],
+         "metadata": {"selected": True}},
+        {"breadcrumb": ["properties", "lineItems"], "metadata": {"selected": True}},
+        {"breadcrumb": ["properties", "lineItems", "items", "properties", "taxLines"],
+         "metadata": {"inclusion": "unsupported"}},
+    ]}]}
+
+
+class TestQueryPlanCache(unittest.TestCase):
+
+    def test_pruned_once_per_run(self):
+        """The same query and removed fields are pruned once, in any order."""
+        cache = QueryPlanCache()
+        with patch.object(query_plan, "prune_document",
+                          wraps=query_plan.prune_document) as mock_prune:
+            first = cache.get(QUERY, ["name", "notes"]).query
+            second = cache.get(QUERY, ["notes", "name"]).query
+            other = cache.get(QUERY, ["name"]).query
+
+        self.assertIs(first, second)
+        self.assertEqual(mock_prune.call_count, 2)
+        self.assertNotIn("notes", first)
+        self.assertNotIn("$query", first)
+        self.assertIn("$query: String", other)
+
+    def test_cached_across_runs(self):
+        """A new cache reads the pruned query written to the directory by a previous run."""
+        with tempfile.TemporaryDirectory() as directory:
+            expected = QueryPlanCache().get(QUERY, ["name"], directory=directory)
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+            with patch.object(query_plan, "prune_document") as mock_prune:
+                self.assertEqual(QueryPlanCache().get(QUERY, ["name"], directory=directory),
+                                 expected)
+                mock_prune.assert_not_called()
+
+            # Another query text or set of fields is another file
+            QueryPlanCache().get(QUERY.replace("name", "title"), ["name"], directory=directory)
+            QueryPlanCache().get(QUERY, ["notes"], directory=directory)
+            self.assertEqual(len(os.listdir(directory)), 3)
+
+    def test_unwritable_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "file")
+            with open(path, "w", encoding="utf-8"):
+                pass
+            # A directory below a file can not be created
+            pruned = QueryPlanCache().get(QUERY, ["name"],
+                                          directory=os.path.join(path, "queries"))
+
+        self.assertEqual(pruned.query, prune_query(QUERY, ["name"]))
+
+    @patch.object(Context, "get_unselected_fields", return_value=["customer"])
+    def test_stream_query_pruned_once(self, _mock_unselected):
+        self.addCleanup(setattr, Context, "query_plans", Context.query_plans)
+        self.addCleanup(setattr, Context, "config", Context.config)
+        Context.query_plans = QueryPlanCache()
+        Context.config = {}
+
+        with patch.object(query_plan, "prune_document",
+                          wraps=query_plan.prune_document) as mock_prune, \
+                patch.object(Context, "get_unselected_paths", return_value=[]):
+            queries = [Orders().get_selected_query() for _ in range(3)]
+
+        self.assertEqual(mock_prune.call_count, 1)
+        self.assertEqual(len(set(queries)), 1)
+
+    def test_prune_nested_paths(self):
+        """Nested fields are removed by their path from the root, connections skipped."""
+        pruned = prune_query(QUERY, [], [("things", "billingAddress", "city"),
+                                         ("things", "lines", "quantity"),
+                                         ("things", "notes", "id")])
+
+        document = parse(pruned)
+        self.assertIn("zip", pruned)
+        self.assertNotIn("city", pruned)
+        self.assertIn("sku", pruned)
+        self.assertNotIn("quantity", pruned)
+        # A field left without subfields goes, and the variable only it used
+        self.assertNotIn("notes", pruned)
+        self.assertEqual([definition.variable.name.value
+                          for definition in document.definitions[0].variable_definitions],
+                         ["first", "after"])
+        # The same names elsewhere stay
+        self.assertIn("id", prune_query(QUERY, [], [("things", "billingAddress", "id")]))
+
+    def test_prune_full_path_only(self):
+        """A path ending like the removed one below another field stays."""
+        query = """query {
+            things(first: 10) {
+                nodes {
+                    billingAddress { city zip }
+                    lines(first: 10) { nodes { billingAddress { city zip } } }
+                }
+            }
+        }"""
+
+        pruned = parse(prune_query(query, [], [("things", "billingAddress", "city")]))
+
+        record = pruned.definitions[0].selection_set.selections[0].selection_set.selections[0]
+        billing_address, lines = record.selection_set.selections
+        self.assertEqual([field.name.value for field in billing_address.selection_set.selections],
+                         ["zip"])
+        line_address = lines.selection_set.selections[0].selection_set.selections[0]
+        self.assertEqual([field.name.value for field in line_address.selection_set.selections],
+                         ["city", "zip"])
+        # Nor is a path below the records of the stream matched without its root
+        self.assertEqual(prune_query(query, [], [("billingAddress", "city")]),
+                         prune_query(query, [], []))
+
+    def test_estimates(self):
+        """Objects cost 1, connections 2 plus their records, bytes count at full pages."""
+        def scalar(name):
+            return len(name) + 4 + SCALAR_VALUE_BYTES
+
+        def wrapper(name, content):
+            # Quoted key, colon, comma and braces or brackets
+            return len(name) + 6 + content
+
+        self.assertEqual(estimate_query(parse(
+            "query { shop { name } items(first: 10) { edges { node { id tags } } } }")),
+                         (1 + 2 + 10,
+                          wrapper("shop", scalar("name"))
+                          + wrapper("items", 10 * wrapper("edges", wrapper(
+                              "node", scalar("id") + scalar("tags"))))))
+        self.assertEqual(estimate_query(parse(
+            "query($first: Int) { items(first: $first) { nodes { id owner { id } } } }")),
+                         (2 + 250 * 2,
+                          wrapper("items", 250 * wrapper(
+                              "nodes", scalar("id") + wrapper("owner", scalar("id"))))))
+
+    @patch("tap_shopify.query_plan.LOGGER.info")
+    def test_reported_once_per_stream(self, mock_info):
+        cache = QueryPlanCache()
+        paths = [("things", "billingAddress", "city"), ("things", "lines", "sku")]
+        plan = cache.get(QUERY, [], paths)
+        cache.report("things", plan)
+        cache.report("things", cache.get(QUERY, [], list(reversed(paths))))
+
+        self.assertEqual(mock_info.call_count, 1)
+        self.assertLess(plan.bytes, plan.full_bytes)
+        self.assertEqual(plan.cost, plan.full_cost)
+
+
+class TestNestedSelection(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, Context, "config", Context.config)
+        self.addCleanup(setattr, Context, "catalog", Context.catalog)
+        self.addCleanup(setattr, Context, "stream_map", Context.stream_map)
+        Context.config = {}
+        Context.catalog = ORDERS_CATALOG
+        Context.stream_map = {}
+
+    def test_unselected_paths(self):
+        self.assertEqual(sorted(Context.get_unselected_paths("orders")),
+                         [("billingAddress", "city"), ("lineItems", "taxLines")])
+
+    def test_discover_nested_fields(self):
+        """Nested breadcrumbs are only discovered with `discover_nested_fields`."""
+        schema = {"properties": {"id": {"type": "string"},
+                                 "billingAddress": {"type": "object",
+                                                    "properties": {"city": {"type": "string"}}},
+                                 "lineItems": {"type": "array", "items": {
+                                     "type": "object", "properties": {
+                                         "taxLines": {"type": "array", "items": {
+                                             "type": "object",
+                                             "properties": {"rate": {"type": "number"}}}}}}}}}
+
+        breadcrumbs = [tuple(entry["breadcrumb"])
+                       for entry in tap_shopify.get_discovery_metadata(Orders(), schema)]
+        self.assertNotIn(("properties", "billingAddress", "properties", "city"), breadcrumbs)
+
+        Context.config = {"discover_nested_fields": True}
+        breadcrumbs = [tuple(entry["breadcrumb"])
+                       for entry in tap_shopify.get_discovery_metadata(Orders(), schema)]
+        self.assertIn(("properties", "billingAddress", "properties", "city"), breadcrumbs)
+        self.assertIn(("properties", "lineItems", "items", "properties", "taxLines", "items",
+                       "properties", "rate"), breadcrumbs)
+
+    def test_orders_query_pruned(self):
+        """Deselected nested fields leave the orders query, line items keep their tax lines."""
+        full = Orders().get_query()
+        with patch.object(Context, "query_plans", QueryPlanCache()), \
+                patch.object(Context, "get_unselected_fields", return_value=[]):
+            query = Orders().get_selected_query()
+
+        self.assertLess(len(query), len(full))
+        self.assertEqual(query.count("city"), full.count("city") - 1)
+        self.assertEqual(query.count("taxLines"), full.count("taxLines") - 1)
+
+    def test_child_stream_paths(self):
+        """Deselected paths start at the child records nested in their parent."""
+        stream = Transactions()
+        self.assertEqual(stream.get_record_path(), ("orders", "transactions"))
+
+        full = stream.get_query()
+        with patch.object(Context, "query_plans", QueryPlanCache()), \
+                patch.object(Context, "get_unselected_fields", return_value=[]), \
+                patch.object(Context, "get_unselected_paths",
+                             return_value=[("amountSet", "shopMoney")]):
+            query = stream.get_selected_query()
+
+        self.assertEqual(query.count("shopMoney"), full.count("shopMoney") - 1)
+        self.assertIn("amountRoundingSet", query)
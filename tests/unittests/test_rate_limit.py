@@ -0,0 +1,156 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from tap_shopify.context import Context
+from tap_shopify.rate_limit import CostThrottle, PageSizer
+from tap_shopify.streams.fulfillment_orders import FulfillmentOrders
+from tap_shopify.streams.products import Products
+
+
+def cost_extension(requested, available, maximum=1000.0, restore_rate=50.0):
+    return {
+        "requestedQueryCost": requested,
+        "actualQueryCost": requested,
+        "throttleStatus": {
+            "maximumAvailable": maximum,
+            "currentlyAvailable": available,
+            "restoreRate": restore_rate,
+        },
+    }
+
+
+@patch('tap_shopify.rate_limit.time.sleep')
+@patch('tap_shopify.rate_limit.time.monotonic', return_value=100.0)
+class TestCostThrottle(unittest.TestCase):
+
+    def test_no_wait_for_unknown_query(self, mock_monotonic, mock_sleep):
+        """The first query is sent immediately, nothing is known about its cost yet."""
+        throttle = CostThrottle()
+        self.assertEqual(throttle.acquire("products", "query"), 0)
+        mock_sleep.assert_not_called()
+
+    def test_waits_until_bucket_refills(self, mock_monotonic, mock_sleep):
+        """The wait is the time needed to restore the missing points."""
+        throttle = CostThrottle()
+        throttle.update("query", cost_extension(requested=300, available=100))
+
+        wait = throttle.acquire("products", "query")
+
+        # 200 points missing at 50 points per second
+        self.assertEqual(wait, 4.0)
+        mock_sleep.assert_called_once_with(4.0)
+        self.assertEqual(throttle.get_wait_time("products"), 4.0)
+
+    def test_bucket_restores_over_time(self, mock_monotonic, mock_sleep):
+        """Time elapsed since the last response counts towards the bucket level."""
+        throttle = CostThrottle()
+        throttle.update("query", cost_extension(requested=300, available=100))
+        mock_monotonic.return_value = 103.0
+
+        self.assertEqual(throttle.acquire("products", "query"), 1.0)
+
+    def test_reservations_queue_up(self, mock_monotonic, mock_sleep):
+        """Back to back callers reserve points so the second one waits for the first."""
+        throttle = CostThrottle()
+        throttle.update("query", cost_extension(requested=500, available=1000))
+
+        self.assertEqual(throttle.acquire("products", "query"), 0)
+        self.assertEqual(throttle.acquire("products", "query"), 0)
+        self.assertEqual(throttle.acquire("customers", "query"), 10.0)
+        self.assertEqual(throttle.get_wait_time("products"), 0)
+        self.assertEqual(throttle.get_wait_time("customers"), 10.0)
+
+    def test_unknown_query_uses_most_expensive_cost(self, mock_monotonic, mock_sleep):
+        """A query never seen before is assumed to be as expensive as the costliest one."""
+        throttle = CostThrottle()
+        throttle.update("heavy", cost_extension(requested=800, available=0))
+
+        self.assertEqual(throttle.acquire("orders", "new query"), 16.0)
+
+    @patch('shopify.GraphQL')
+    def test_call_api_updates_throttle(self, mock_graphql, mock_monotonic, mock_sleep):
+        """call_api records the cost extension of every response."""
+        Context.config = {"start_date": "2025-01-01T00:00:00Z"}
+        original_throttle = Context.throttle
+        Context.throttle = CostThrottle()
+        try:
+            mock_graphql.return_value.execute.return_value = json.dumps({
+                "data": {"products": {"edges": []}},
+                "extensions": {"cost": cost_extension(requested=120, available=880)},
+            })
+            stream = Products()
+            stream.call_api({}, query="query")
+
+            self.assertEqual(Context.throttle.query_costs[("query", None)], 120)
+            self.assertEqual(Context.throttle.available, 880)
+            self.assertEqual(Context.throttle.restore_rate, 50.0)
+        finally:
+            Context.throttle = original_throttle
+
+
+class TestPageSizer(unittest.TestCase):
+
+    def test_grows_toward_budget(self):
+        """Cheap pages grow, at most doubling per page, up to the maximum page size."""
+        sizer = PageSizer("locations", 50)
+        self.assertEqual(sizer.observe(50, {"requestedQueryCost": 52}), 100)
+        self.assertEqual(sizer.observe(100, {"requestedQueryCost": 102}), 200)
+        self.assertEqual(sizer.observe(200, {"requestedQueryCost": 202}), 250)
+
+    def test_respects_configured_maximum(self):
+        """The configured results_per_page is never exceeded."""
+        sizer = PageSizer("events", 30, max_size=30)
+        self.assertEqual(sizer.observe(30, {"requestedQueryCost": 32}), 30)
+
+    def test_shrinks_expensive_pages(self):
+        """Pages close to the cost limit are reduced to fit with headroom."""
+        sizer = PageSizer("fulfillment_orders", 30)
+        self.assertEqual(sizer.observe(30, {"requestedQueryCost": 990}), 27)
+
+    def test_shrink_on_max_cost_exceeded(self):
+        """The error's cost is used to compute a fitting size, which becomes the new ceiling."""
+        sizer = PageSizer("metafields_products", 250)
+        error = {"extensions": {"code": "MAX_COST_EXCEEDED", "cost": 2500, "maxCost": 1000}}
+        self.assertEqual(sizer.shrink(250, error), 90)
+        self.assertEqual(sizer.max_size, 249)
+        self.assertIsNone(sizer.shrink(1, error))
+
+
+@patch('shopify.GraphQL')
+class TestAdaptivePageSize(unittest.TestCase):
+
+    def setUp(self):
+        Context.config = {"start_date": "2025-01-01T00:00:00Z"}
+
+    def test_retry_with_smaller_page(self, mock_graphql):
+        """A MAX_COST_EXCEEDED response is retried immediately with a smaller page."""
+        mock_graphql.return_value.execute.side_effect = [
+            json.dumps({"errors": [{"message": "Query cost is 2000",
+                                    "extensions": {"code": "MAX_COST_EXCEEDED",
+                                                   "cost": 2000, "maxCost": 1000}}]}),
+            json.dumps({"data": {"products": {"edges": []}},
+                        "extensions": {"cost": cost_extension(requested=500, available=1000)}}),
+        ]
+        stream = Products()
+        query_params = {"first": 250, "query": ""}
+        stream.call_api(query_params, query="query")
+
+        self.assertEqual(mock_graphql.return_value.execute.call_count, 2)
+        second_call_variables = mock_graphql.return_value.execute.call_args.kwargs["variables"]
+        self.assertEqual(second_call_variables["first"], 112)
+        # The successful page was cheap enough to grow the next one
+        self.assertEqual(stream.results_per_page, 201)
+
+    def test_stream_max_page_size(self, mock_graphql):
+        """Cheap pages never grow a stream past its own maximum page size."""
+        mock_graphql.return_value.execute.return_value = json.dumps(
+            {"data": {"fulfillmentOrders": {"edges": []}},
+             "extensions": {"cost": cost_extension(requested=60, available=1000)}})
+        stream = FulfillmentOrders()
+        self.assertEqual(stream.results_per_page, 30)
+
+        stream.call_api({"first": 30, "query": ""}, query="query")
+
+        self.assertEqual(stream.page_sizer.max_size, 30)
+        self.assertEqual(stream.results_per_page, 30)
@@ -0,0 +1,76 @@
+import json
+import unittest
+from unittest.mock import patch
+
+from tap_shopify.response_reader import ResponseReader
+
+PATH = ("data", "orders", "edges")
+
+PAGE = {"data": {"orders": {
+    "edges": [{"node": {"id": "gid://shopify/Order/{}".format(i), "name": "café ☃ {}".format(i),
+                        "total": 1.5e3 * i, "test": i % 2 == 0, "note": None,
+                        "lineItems": {"edges": [{"node": {"title": "]}, {"}}]}},
+               "cursor": "c{}".format(i)} for i in range(5)],
+    "pageInfo": {"endCursor": "c4", "hasNextPage": True}}},
+        "extensions": {"cost": {"requestedQueryCost": 12, "actualQueryCost": 10}}}
+
+
+def split(body, size):
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+
+def read_page(chunks, path=PATH):
+    reader = ResponseReader(chunks, path)
+    edges = list(reader)
+    connection = reader.get(*path[:-1])
+    if isinstance(connection, dict) and path[-1] in connection:
+        connection[path[-1]] = edges
+    return reader, edges
+
+
+class TestResponseReader(unittest.TestCase):
+
+    def test_same_as_json_loads(self):
+        """Any split of the body, even inside a character, decodes to the same response."""
+        bodies = [json.dumps(PAGE), json.dumps(PAGE, indent=2, ensure_ascii=False),
+                  json.dumps({"errors": [{"message": "Throttled"}], "data": None}),
+                  json.dumps({"data": {"orders": {"pageInfo": {"hasNextPage": False},
+                                                  "edges": [1, 23, 456]}}}),
+                  json.dumps({"data": {"orders": {"edges": []}}}), "{}"]
+        for body in bodies:
+            encoded = body.encode("utf-8")
+            for size in (1, 2, 3, 7, 100, len(encoded)):
+                with self.subTest(body=body[:30], size=size):
+                    reader, _edges = read_page(split(encoded, size))
+                    self.assertEqual(reader.response, json.loads(body))
+
+    @patch("tap_shopify.response_reader.READ_AHEAD", 64)
+    def test_edges_yielded_while_reading(self):
+        """Each edge is yielded once complete, pageInfo and cost are known at the end."""
+        encoded = json.dumps(PAGE).encode("utf-8")
+        chunks = split(encoded, 16)
+        read = []
+
+        def body():
+            for chunk in chunks:
+                read.append(chunk)
+                yield chunk
+
+        reader = ResponseReader(body(), PATH)
+        edges = iter(reader)
+        self.assertEqual(next(edges)["cursor"], "c0")
+        self.assertLess(len(read), len(chunks))
+        self.assertIsNone(reader.get("data", "orders", "pageInfo"))
+
+        self.assertEqual([edge["cursor"] for edge in edges], ["c1", "c2", "c3", "c4"])
+        self.assertEqual(len(read), len(chunks))
+        self.assertEqual(reader.get("data", "orders", "pageInfo"),
+                         {"endCursor": "c4", "hasNextPage": True})
+        self.assertEqual(reader.get("extensions", "cost", "requestedQueryCost"), 12)
+        self.assertEqual(reader.get("data", "orders", "edges"), [])
+
+    def test_truncated_body(self):
+        encoded = json.dumps(PAGE).encode("utf-8")
+        for end in (len(encoded) // 2, len(encoded) - 1):
+            with self.assertRaises(ValueError):
+                read_page(split(encoded[:end], 64))
@@ -0,0 +1,290 @@
+import decimal
+import io
+import json
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import shopify
+
+import tap_shopify
+from tap_shopify import output
+from tap_shopify.context import Context
+from tap_shopify.streams.base import Stream
+
+
+def catalog_entry(stream_id):
+    return {"tap_stream_id": stream_id,
+            "schema": {"type": "object", "properties": {"id": {"type": "integer"}}},
+            "key_properties": ["id"],
+            "replication_key": "id",
+            "metadata": [{"breadcrumb": [], "metadata": {"selected": True}}]}
+
+
+class FakeStream():
+    """Writes a bookmark after each record, `fail_after` records raise an error."""
+    barrier = None
+    fail_after = None
+
+    def __init__(self, name):
+        self.name = name
+
+    def sync(self):
+        if self.barrier is not None:
+            # Every stream is in flight before the first record
+            self.barrier.wait(timeout=5)
+        for i in range(1, 21):
+            if self.fail_after is not None and i > self.fail_after:
+                raise RuntimeError("{} failed".format(self.name))
+            yield {"id": i}
+            with output.state_lock:
+                Context.state["bookmarks"][self.name] = {"id": i}
+                output.write_state(Context.state)
+
+
+def stream_class(name, fail_after=None, barrier=None):
+    return type(name, (FakeStream,), {"__init__": lambda self: FakeStream.__init__(self, name),
+                                      "fail_after": fail_after,
+                                      "barrier": barrier})
+
+
+class WaitingStream(Stream):
+    """Waits for a bulk operation that never completes, until it is stopped."""
+    barrier = None
+
+    def sync(self):
+        self.barrier.wait(timeout=5)
+        while True:
+            self.wait(3600)
+        yield
+
+
+class RequestingStream(Stream):
+    """Requests a page of the API from its stream worker thread."""
+
+    def sync(self):
+        shopify.GraphQL().execute("{ shop { id } }")
+        yield {"id": 1}
+
+
+class TestSync(unittest.TestCase):
+
+    def setUp(self):
+        self.stdout = io.StringIO()
+        patcher = patch("sys.stdout", self.stdout)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("tap_shopify.initialize_shopify_client",
+                        return_value={"name": "shop", "id": 1, "myshopify_domain": "shop"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.original = (Context.config, Context.state, Context.catalog, Context.stream_objects,
+                         Context.stream_map)
+        Context.stream_map = {}
+        Context.catalog = {"streams": [catalog_entry(name) for name in ("a", "b", "c")]}
+        Context.state = {"bookmarks": {}}
+        Context.counts = {}
+
+    def tearDown(self):
+        (Context.config, Context.state, Context.catalog, Context.stream_objects,
+         Context.stream_map) = self.original
+
+    def messages(self):
+        return [json.loads(line) for line in self.stdout.getvalue().splitlines()]
+
+    def test_concurrent_sync(self):
+        """Streams run together, each STATE message follows the records it bookmarks."""
+        barrier = threading.Barrier(3)
+        Context.stream_objects = {name: stream_class(name, barrier=barrier)
+                                  for name in ("a", "b", "c")}
+        Context.config = {"stream_workers": 3}
+
+        tap_shopify.sync()
+
+        messages = self.messages()
+        self.assertEqual(Context.counts, {"a": 20, "b": 20, "c": 20})
+        written = {"a": 0, "b": 0, "c": 0}
+        in_flight = set()
+        for message in messages:
+            if message["type"] == "RECORD":
+                written[message["stream"]] = message["record"]["id"]
+            elif message["type"] == "STATE":
+                bookmarks = message["value"]["bookmarks"]
+                for name in written:
+                    if name in bookmarks:
+                        self.assertLessEqual(bookmarks[name]["id"], written[name])
+                in_flight.add(len(bookmarks.get("currently_sync_streams", [])))
+        self.assertIn(3, in_flight)
+        final = messages[-1]["value"]["bookmarks"]
+        self.assertNotIn("currently_sync_stream", final)
+        self.assertNotIn("currently_sync_streams", final)
+
+    def test_failure_stops_other_streams(self):
+        """A failed stream stops the others and stays in flight for the next sync."""
+        barrier = threading.Barrier(2)
+        Context.stream_objects = {"a": stream_class("a", fail_after=2, barrier=barrier),
+                                  "b": stream_class("b", barrier=barrier),
+                                  "c": stream_class("c")}
+        Context.config = {"stream_workers": 2}
+
+        with self.assertRaises(RuntimeError):
+            tap_shopify.sync()
+
+        self.assertEqual(Context.state["bookmarks"]["currently_sync_stream"], "a")
+        self.assertEqual(Context.state["bookmarks"]["a"], {"id": 2})
+        self.assertIsNone(output._WRITER)
+
+    def test_failure_stops_waiting_streams(self):
+        """A stream waiting for a bulk operation stops as soon as another stream fails."""
+        barrier = threading.Barrier(2)
+        waiting = type("b", (WaitingStream,), {"name": "b", "barrier": barrier})
+        Context.stream_objects = {"a": stream_class("a", fail_after=2, barrier=barrier),
+                                  "b": waiting}
+        Context.catalog = {"streams": [catalog_entry(name) for name in ("a", "b")]}
+        Context.config = {"stream_workers": 2, "start_date": "2025-01-01T00:00:00Z"}
+
+        start = time.monotonic()
+        with self.assertRaises(RuntimeError):
+            tap_shopify.sync()
+
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(Context.counts["b"], 0)
+
+    @patch("tap_shopify.transport.post_json")
+    def test_token_sent_from_stream_threads(self, mock_post_json):
+        """Requests sent from the stream worker threads carry the access token."""
+        Context.stream_objects = {name: type(name, (RequestingStream,), {"name": name})
+                                  for name in ("a", "b", "c")}
+        Context.config = {"stream_workers": 3, "start_date": "2025-01-01T00:00:00Z",
+                          "access_token": "token"}
+        shopify.ShopifyResource.activate_session(
+            shopify.Session("test-shop", "2025-07", "token"))
+        self.addCleanup(shopify.ShopifyResource.clear_session)
+        sent = []
+
+        def post_json(url, data, headers, timeout=None):
+            sent.append((threading.current_thread().name, headers.get("X-Shopify-Access-Token")))
+            return MagicMock(content=b'{"data": {"shop": {"id": 1}}}')
+
+        mock_post_json.side_effect = post_json
+        tap_shopify.sync()
+
+        self.assertEqual(len(sent), 3)
+        self.assertTrue(all(name.startswith("stream") for name, _ in sent))
+        self.assertEqual({token for _, token in sent}, {"token"})
+
+    def test_resume_streams_in_flight(self):
+        """The streams in flight when the previous sync stopped are synced first."""
+        Context.stream_objects = {name: stream_class(name) for name in ("a", "b", "c")}
+        Context.config = {}
+        Context.state = {"bookmarks": {"currently_sync_stream": "c",
+                                       "currently_sync_streams": ["c", "b"]}}
+
+        tap_shopify.sync()
+
+        synced = [message["stream"] for message in self.messages()
+                  if message["type"] == "RECORD"]
+        self.assertEqual(synced[0], "c")
+        self.assertEqual(synced[20], "b")
+        self.assertEqual(synced[40], "a")
+        self.assertEqual(Context.state["bookmarks"], {"a": {"id": 20}, "b": {"id": 20},
+                                                      "c": {"id": 20}})
+
+
+class TestOutputWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(setattr, Context, "config", Context.config)
+        Context.config = {}
+        self.stdout = io.StringIO()
+        patcher = patch("sys.stdout", self.stdout)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(output.flush)
+
+    def test_messages_written_in_order(self):
+        """Messages queued from several threads are written whole and in queue order."""
+        output.start_writer(queue_size=5)
+        try:
+            threads = [threading.Thread(target=lambda name=name: [
+                output.write_record(name, {"id": i}) for i in range(100)]) for name in "xyz"]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            output.stop_writer()
+
+        records = [json.loads(line) for line in self.stdout.getvalue().splitlines()]
+        self.assertEqual(len(records), 300)
+        for name in "xyz":
+            self.assertEqual([rec["record"]["id"] for rec in records if rec["stream"] == name],
+                             list(range(100)))
+
+    def test_buffer_written_with_state(self):
+        """Records are held until a STATE message, which is written right after them."""
+        Context.config = {"output_buffer_size": 1000000, "output_flush_interval": 3600}
+        for i in range(10):
+            output.write_record("x", {"id": i})
+        self.assertEqual(self.stdout.getvalue(), "")
+
+        output.write_state({"bookmarks": {"x": {"id": 9}}})
+        messages = [json.loads(line) for line in self.stdout.getvalue().splitlines()]
+        self.assertEqual([message["type"] for message in messages], ["RECORD"] * 10 + ["STATE"])
+
+        output.write_record("x", {"id": 10})
+        output.flush()
+        self.assertEqual(len(self.stdout.getvalue().splitlines()), 12)
+
+    def test_buffer_written_when_full(self):
+        Context.config = {"output_buffer_size": 200, "output_flush_interval": 3600}
+        for i in range(10):
+            output.write_record("x", {"id": i})
+
+        lines = self.stdout.getvalue().splitlines()
+        self.assertGreater(len(lines), 0)
+        self.assertLess(len(lines), 10)
+        self.assertEqual([json.loads(line)["record"]["id"] for line in lines],
+                         list(range(len(lines))))
+
+    def test_writer_flushes_idle_buffer(self):
+        """The writer thread writes a buffer no message completes after its interval."""
+        Context.config = {"output_flush_interval": 0.05}
+        output.start_writer()
+        try:
+            output.write_record("x", {"id": 1})
+            deadline = time.monotonic() + 5
+            while not self.stdout.getvalue() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(json.loads(self.stdout.getvalue())["record"], {"id": 1})
+        finally:
+            output.stop_writer()
+
+    def test_idle_buffer_flushed_without_writer(self):
+        """Without a writer thread a timer writes the buffer after its interval."""
+        Context.config = {"output_flush_interval": 0.05}
+        output.write_record("x", {"id": 1})
+        self.assertEqual(self.stdout.getvalue(), "")
+
+        # The stream sleeps, e.g. polling a bulk operation, no other message comes
+        deadline = time.monotonic() + 5
+        while not self.stdout.getvalue() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(json.loads(self.stdout.getvalue())["record"], {"id": 1})
+
+    def test_orjson_encoder(self):
+        """orjson writes the same messages, values it can not serialize fall back to simplejson."""
+        Context.config = {"output_json_encoder": "orjson"}
+        records = [{"id": 1, "name": "caf\u00e9", "price": 1.5, "tags": [None, True]},
+                   {"id": 2, "amount": decimal.Decimal("10.10")}]
+        for record in records:
+            output.write_record("x", record)
+        output.flush()
+
+        lines = self.stdout.getvalue().splitlines()
+        self.assertEqual([json.loads(line)["record"] for line in lines],
+                         [{"id": 1, "name": "caf\u00e9", "price": 1.5, "tags": [None, True]},
+                          {"id": 2, "amount": 10.1}])
+        self.assertIn('"amount": 10.10', lines[1])
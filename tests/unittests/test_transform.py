@@ -0,0 +1,109 @@
+import copy
+import json
+import unittest
+
+import singer
+from singer import Transformer
+from singer.transform import SchemaMismatch
+
+from tap_shopify.transform import RecordTransformer
+
+NULLABLE_DATETIME = {"type": ["null", "string"], "format": "date-time"}
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": ["null", "integer"]},
+        "name": {"type": ["null", "string"]},
+        "secret": {"type": ["null", "string"]},
+        "createdAt": NULLABLE_DATETIME,
+        "updatedAt": {"type": "string", "format": "date-time"},
+        "test": {"type": ["null", "boolean"]},
+        "amount": {"type": ["null", "string"], "format": "singer.decimal"},
+        "rate": {"type": ["null", "number"]},
+        "value": {"anyOf": [{"type": "object"}, {"type": ["null", "string"]}]},
+        "untyped": {},
+        "attributes": {"type": ["null", "object"],
+                       "patternProperties": {"^x_": {"type": ["null", "integer"]}}},
+        "lines": {
+            "type": ["null", "array"],
+            "items": {"type": ["null", "object"],
+                      "properties": {"sku": {"type": ["null", "string"]},
+                                     "hidden": {"type": ["null", "string"]},
+                                     "quantity": {"type": ["null", "integer"]},
+                                     "events": {"type": "array", "items": NULLABLE_DATETIME}}}},
+    }
+}
+
+METADATA = {
+    (): {"selected": True},
+    ("properties", "id"): {"inclusion": "automatic", "selected": False},
+    ("properties", "secret"): {"inclusion": "available", "selected": False},
+    ("properties", "lines"): {"inclusion": "available", "selected": True},
+    ("properties", "lines", "items", "properties", "hidden"): {"inclusion": "unsupported"},
+}
+
+RECORDS = [
+    {"id": "1,234", "name": 42, "secret": "s", "createdAt": "2025-01-10T10:20:30Z",
+     "updatedAt": "2025-01-10T10:20:30.5Z", "test": None, "amount": "10.10", "rate": "1,000.5",
+     "value": {"any": "thing"}, "untyped": [1, {"a": None}],
+     "attributes": {"x_count": "3", "other": 1},
+     "lines": [{"sku": "a", "hidden": "h", "quantity": "2", "extra": 1,
+                "events": ["2025-01-10T10:20:30.123456Z", "2025-01-10T10:20:30+05:00"]},
+               None]},
+    {"id": 2, "createdAt": "", "updatedAt": 1700000000, "test": "False", "amount": 3.5,
+     "rate": None, "value": 12, "lines": []},
+    {"id": 3, "createdAt": "2025-02-28T10:20:30.000Z", "updatedAt": "1700000000",
+     "test": "yes", "amount": None, "value": None, "lines": None, "unknown": {"a": 1}},
+    {"id": 4, "createdAt": "2025-01-10 10:20:30", "updatedAt": "2025-01-10T10:20:30.1234567Z",
+     "test": 0, "amount": 7, "lines": [{"events": []}]},
+]
+
+SDC_FIELDS = {"_sdc_shop_id": 1}
+
+
+class TestRecordTransformer(unittest.TestCase):
+
+    def transform_both(self, records, schema=SCHEMA, mdata=METADATA):
+        with Transformer(singer.UNIX_SECONDS_INTEGER_DATETIME_PARSING) as transformer:
+            expected = [json.dumps(transformer.transform({**rec, **SDC_FIELDS},
+                                                         copy.deepcopy(schema), mdata))
+                        for rec in copy.deepcopy(records)]
+        compiled = RecordTransformer(copy.deepcopy(schema), mdata,
+                                     singer.UNIX_SECONDS_INTEGER_DATETIME_PARSING)
+        actual = []
+        for rec in copy.deepcopy(records):
+            rec.update(SDC_FIELDS)
+            actual.append(json.dumps(compiled.transform_record(rec)))
+        return transformer, compiled, expected, actual
+
+    def test_same_records_as_singer(self):
+        """Records, filtered and removed paths match singer's Transformer."""
+        transformer, compiled, expected, actual = self.transform_both(RECORDS)
+
+        self.assertEqual(actual, expected)
+        self.assertEqual(compiled.filtered, transformer.filtered)
+        self.assertEqual(compiled.removed, transformer.removed)
+        self.assertIn("lines[].hidden", compiled.filtered)
+        self.assertIn("_sdc_shop_id", compiled.removed)
+
+    def test_same_schema_mismatch_as_singer(self):
+        """A record not matching the schema fails at the same paths as with singer."""
+        record = {"id": "one", "lines": [{"quantity": "many"}], "updatedAt": None,
+                  "createdAt": "2025-02-30T10:20:30Z"}
+        transformer = Transformer()
+        with self.assertRaises(SchemaMismatch):
+            transformer.transform(copy.deepcopy(record), copy.deepcopy(SCHEMA))
+        compiled = RecordTransformer(copy.deepcopy(SCHEMA))
+        with self.assertRaises(SchemaMismatch):
+            compiled.transform_record(copy.deepcopy(record))
+
+        self.assertEqual([error.path for error in compiled.errors],
+                         [error.path for error in transformer.errors])
+        self.assertIn(["lines", 0, "quantity"], [error.path for error in compiled.errors])
+
+    def test_no_metadata(self):
+        _transformer, compiled, expected, actual = self.transform_both(RECORDS, mdata={})
+
+        self.assertEqual(actual, expected)
+        self.assertIsNone(compiled.filter_record)
@@ -0,0 +1,81 @@
+import http.client
+import socket
+import unittest
+import urllib.error
+from urllib.error import URLError
+from unittest.mock import patch, MagicMock
+
+import requests
+from urllib3.exceptions import ReadTimeoutError
+
+from tap_shopify import transport
+from tap_shopify.context import Context
+
+
+class TestTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.original_config = Context.config
+        Context.config = {}
+        transport.close_session()
+
+    def tearDown(self):
+        Context.config = self.original_config
+        transport.close_session()
+
+    def test_session_is_shared(self):
+        """The same pooled session is returned on every call."""
+        self.assertIs(transport.get_session(), transport.get_session())
+
+    def test_pool_size_from_config(self):
+        """`http_pool_size` sizes the connection pool, falsy values use the default."""
+        Context.config = {"http_pool_size": "4"}
+        adapter = transport.get_session().get_adapter("https://test-shop.myshopify.com")
+        self.assertEqual(adapter._pool_maxsize, 4)
+
+        for value in [None, 0, "0", ""]:
+            Context.config = {"http_pool_size": value}
+            self.assertEqual(transport.get_pool_size(), transport.DEFAULT_POOL_SIZE)
+
+    def test_connect_timeout_from_config(self):
+        """`http_connect_timeout` is combined with the read timeout."""
+        Context.config = {"http_connect_timeout": "5"}
+        self.assertEqual(transport.get_timeout(300), (5.0, 300))
+
+    @patch('tap_shopify.transport.requests.Session.post')
+    def test_http_error_is_translated(self, mock_post):
+        """Non-2xx responses are raised as urllib HTTPError with the body and headers."""
+        mock_post.return_value = MagicMock(status_code=401,
+                                           reason="Unauthorized",
+                                           headers={"X-Request-ID": "abc"},
+                                           content=b'{"errors": "Invalid token"}')
+        with self.assertRaises(urllib.error.HTTPError) as err:
+            transport.post_json("https://test-shop.myshopify.com", {}, {})
+
+        self.assertEqual(err.exception.code, 401)
+        self.assertEqual(err.exception.headers.get("X-Request-ID"), "abc")
+        self.assertEqual(err.exception.read(), b'{"errors": "Invalid token"}')
+
+    @patch('tap_shopify.transport.requests.Session.post')
+    def test_transport_errors_are_translated(self, mock_post):
+        """Timeouts and connection errors keep the exception types the retry logic expects."""
+        mock_post.side_effect = requests.exceptions.ReadTimeout("read timeout")
+        with self.assertRaises(socket.timeout):
+            transport.post_json("https://test-shop.myshopify.com", {}, {})
+
+        mock_post.side_effect = requests.exceptions.ConnectionError("Connection reset")
+        with self.assertRaises(URLError):
+            transport.post_json("https://test-shop.myshopify.com", {}, {})
+
+    def test_body_errors_are_translated(self):
+        """Errors reading a streamed body are raised as post_json raises them."""
+        response = MagicMock()
+        response.iter_content.side_effect = requests.exceptions.ConnectionError(
+            ReadTimeoutError(None, "/", "Read timed out."))
+        with self.assertRaises(socket.timeout):
+            list(transport.iter_body(response, 10))
+        response.close.assert_called_once()
+
+        response.iter_content.side_effect = requests.exceptions.ChunkedEncodingError("broken")
+        with self.assertRaises(http.client.IncompleteRead):
+            list(transport.iter_body(response, 10))